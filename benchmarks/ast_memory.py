@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""Bytes per AST node: dict-based nodes vs. slotted nodes vs. PackedProgram.
+
+"Before" rebuilds the parsed tree out of equivalent dataclasses without
+__slots__ and tokens from ReferenceLexer, whose lexemes are not interned,
+which is how nodes and tokens were represented previously. Run from the
+repository root:
+
+    python -m benchmarks.ast_memory [--copies N]
+"""
+import argparse
+import dataclasses
+import glob
+import os
+import sys
+
+from src.lexer import Lexer, ReferenceLexer, Token
+from src.node_store import NODE_CLASSES, PackedProgram
+from src.parser import Parser
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def unslotted(cls):
+    fields = [(field.name, field.type) for field in dataclasses.fields(cls)]
+    return dataclasses.make_dataclass(cls.__name__, fields)
+
+UNSLOTTED = {cls: unslotted(cls) for cls in NODE_CLASSES + [Token]}
+
+def to_unslotted(value):
+    if isinstance(value, list):
+        return [to_unslotted(item) for item in value]
+    mirror = UNSLOTTED.get(type(value))
+    if mirror is None:
+        return value
+    return mirror(*(to_unslotted(getattr(value, field.name))
+                    for field in dataclasses.fields(value)))
+
+def deep_size(root) -> int:
+    """Total bytes reachable from root, counting each object once"""
+    seen = set()
+    stack = [root]
+    total = 0
+    while stack:
+        value = stack.pop()
+        if id(value) in seen or isinstance(value, type) or value is None:
+            continue
+        seen.add(id(value))
+        total += sys.getsizeof(value)
+        if isinstance(value, list):
+            stack.extend(value)
+        elif dataclasses.is_dataclass(value):
+            if hasattr(value, "__dict__"):
+                total += sys.getsizeof(value.__dict__)
+            stack.extend(getattr(value, field.name) for field in dataclasses.fields(value))
+    return total
+
+def count_nodes(statements) -> int:
+    count = 0
+    stack = list(statements)
+    while stack:
+        value = stack.pop()
+        if isinstance(value, list):
+            stack.extend(value)
+        elif type(value) in UNSLOTTED and not isinstance(value, Token):
+            count += 1
+            stack.extend(getattr(value, field.name) for field in dataclasses.fields(value))
+    return count
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--copies", type=int, default=100,
+                            help="times the examples are concatenated (default: 100)")
+    args = arg_parser.parse_args()
+
+    sources = []
+    for path in sorted(glob.glob(os.path.join(ROOT, "examples", "*.mrt"))):
+        with open(path) as file:
+            sources.append(file.read())
+    source = "\n".join(sources) * args.copies
+
+    before = to_unslotted(Parser(ReferenceLexer(source).scan_tokens()).parse())
+    after = Parser(Lexer(source).scan_tokens()).parse()
+    packed = PackedProgram.pack(after)
+    nodes = count_nodes(after)
+
+    print(f"{nodes:,} nodes")
+    for label, size in (("dict-based nodes", deep_size(before)),
+                        ("slotted nodes", deep_size(after)),
+                        ("PackedProgram", packed.nbytes)):
+        print(f"{label:<17} {size / 1024 / 1024:8.2f} MiB  {size / nodes:6.1f} bytes/node")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""Bulk array builtins against the same loops written in MRT.
+
+Run from the repository root:
+
+    python -m benchmarks.bulk_builtins [--size N] [--engine E ...]
+
+Each workload builds a number array of --size elements, then reduces or
+transforms it once with an MRT while loop and once with the builtin.
+Only the second phase is timed.
+"""
+import argparse
+import contextlib
+import io
+import time
+
+from src.__main__ import ENGINES, parse
+from src.bulk import numpy
+from src.resolver import Resolver
+
+SETUP = """
+func double(x) {{ return x * 2; }}
+func big(x) {{ return x > {size} / 4; }}
+var data = [];
+var i = 0;
+while (i < {size}) {{ push(data, i * 0.5); i = i + 1; }}
+"""
+
+# name -> (MRT loop, builtin call)
+WORKLOADS = {
+    "sum": ("""
+var total = 0; i = 0;
+while (i < len(data)) { total = total + data[i]; i = i + 1; }
+""", "var total = sum(data);"),
+    "max": ("""
+var best = data[0]; i = 1;
+while (i < len(data)) { if (data[i] > best) { best = data[i]; } i = i + 1; }
+""", "var best = max(data);"),
+    "map": ("""
+var out = []; i = 0;
+while (i < len(data)) { push(out, double(data[i])); i = i + 1; }
+""", "var out = map(data, double);"),
+    "filter": ("""
+var out = []; i = 0;
+while (i < len(data)) { if (big(data[i])) { push(out, data[i]); } i = i + 1; }
+""", "var out = filter(data, big);"),
+}
+
+def phase_time(engine: str, size: int, body: str) -> float:
+    """Time of `body` alone: the setup is run separately and subtracted"""
+    def run(source: str) -> float:
+        statements = Resolver().resolve(parse(source))
+        interpreter = ENGINES[engine]()
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            interpreter.interpret(statements)
+            elapsed = time.perf_counter() - start
+        if any(line.startswith("Runtime Error") for line in interpreter.output):
+            raise SystemExit(f"{engine}: {interpreter.output[-1]}")
+        return elapsed
+
+    setup = SETUP.format(size=size)
+    return max(run(setup + body) - run(setup), 0.0)
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--size", type=int, default=200_000,
+                            help="elements in the array (default: 200,000)")
+    arg_parser.add_argument("--engine", action="append", choices=sorted(ENGINES),
+                            help="engine to measure, may be repeated (default: vm)")
+    args = arg_parser.parse_args()
+
+    print(f"{args.size:,} elements, NumPy {'available' if numpy else 'not installed'}")
+    print(f"{'engine':<10}{'workload':<10}{'loop':>10}{'builtin':>10}{'speedup':>10}")
+    for engine in args.engine or ["vm"]:
+        for name, (loop, builtin) in WORKLOADS.items():
+            loop_time = phase_time(engine, args.size, loop)
+            builtin_time = phase_time(engine, args.size, builtin)
+            speedup = loop_time / builtin_time if builtin_time else float("inf")
+            print(f"{engine:<10}{name:<10}{loop_time:>9.3f}s{builtin_time:>9.3f}s{speedup:>9.1f}x")
+
+if __name__ == "__main__":
+    main()
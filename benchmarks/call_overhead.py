@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""Calls/sec of call-heavy MRT programs on each execution engine.
+
+Run from the repository root:
+
+    python -m benchmarks.call_overhead [--engine E ...] [--repeat R]
+"""
+import argparse
+import contextlib
+import io
+import time
+
+from src.__main__ import ENGINES, parse
+from src.resolver import Resolver
+
+# name -> (program, number of MRT function calls it makes)
+WORKLOADS = {
+    "fib": ("""
+func fib(n) { if (n < 2) { return n; } return fib(n - 1) + fib(n - 2); }
+print fib(20);
+""", 21891),
+    "loop-call": ("""
+func add(a, b) { return a + b; }
+var i = 0; var total = 0;
+while (i < 20000) { total = add(total, i); i = i + 1; }
+print total;
+""", 20000),
+    "void-call": ("""
+func touch(a, b, c) { var unused = a; }
+var i = 0;
+while (i < 20000) { touch(i, i, i); i = i + 1; }
+""", 20000),
+    "deep-return": ("""
+func depth(n) {
+    var i = 0;
+    while (i < 1) {
+        if (n > 0) { return depth(n - 1) + 1; }
+        i = i + 1;
+    }
+    return 0;
+}
+var round = 0;
+while (round < 100) { depth(40); round = round + 1; }
+""", 4100),
+}
+
+def best_time(engine: str, source: str, repeat: int) -> float:
+    statements = Resolver().resolve(parse(source))
+    best = float("inf")
+    for _ in range(repeat):
+        interpreter = ENGINES[engine]()
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            interpreter.interpret(statements)
+            best = min(best, time.perf_counter() - start)
+        if any(line.startswith("Runtime Error") for line in interpreter.output):
+            raise SystemExit(f"{engine}: {interpreter.output[-1]}")
+    return best
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--engine", action="append", choices=sorted(ENGINES),
+                            help="engine to measure, may be repeated (default: all)")
+    arg_parser.add_argument("--repeat", type=int, default=5,
+                            help="runs per workload; the best is reported (default: 5)")
+    args = arg_parser.parse_args()
+
+    engines = args.engine or sorted(ENGINES)
+    print(f"{'workload':<12}" + "".join(f"{engine:>16}" for engine in engines))
+    for name, (source, calls) in WORKLOADS.items():
+        row = f"{name:<12}"
+        for engine in engines:
+            elapsed = best_time(engine, source, args.repeat)
+            row += f"{calls / elapsed:>11,.0f} c/s"
+        print(row)
+
+if __name__ == "__main__":
+    main()
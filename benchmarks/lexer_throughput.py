@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""Tokens/sec of Lexer against ReferenceLexer on a large generated script.
+
+Run from the repository root:
+
+    python -m benchmarks.lexer_throughput [--copies N] [--repeat R]
+"""
+import argparse
+import glob
+import os
+import time
+
+from src.lexer import Lexer, ReferenceLexer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def build_source(copies: int) -> str:
+    examples = []
+    for path in sorted(glob.glob(os.path.join(ROOT, "examples", "*.mrt"))):
+        with open(path) as file:
+            examples.append(file.read())
+    return "\n".join(examples) * copies
+
+def best_time(lexer_class, source: str, repeat: int):
+    best = float("inf")
+    tokens = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        tokens = lexer_class(source).scan_tokens()
+        best = min(best, time.perf_counter() - start)
+    return best, tokens
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--copies", type=int, default=200,
+                            help="times the examples are concatenated (default: 200)")
+    arg_parser.add_argument("--repeat", type=int, default=5,
+                            help="runs per lexer; the best is reported (default: 5)")
+    args = arg_parser.parse_args()
+
+    source = build_source(args.copies)
+    reference_time, reference_tokens = best_time(ReferenceLexer, source, args.repeat)
+    fast_time, fast_tokens = best_time(Lexer, source, args.repeat)
+
+    if fast_tokens != reference_tokens:
+        raise SystemExit("Token streams differ between Lexer and ReferenceLexer")
+
+    count = len(fast_tokens)
+    print(f"source: {len(source):,} chars, {count:,} tokens")
+    print(f"ReferenceLexer: {reference_time:.3f}s  {count / reference_time:,.0f} tokens/sec")
+    print(f"Lexer:          {fast_time:.3f}s  {count / fast_time:,.0f} tokens/sec")
+    print(f"speedup: {reference_time / fast_time:.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""Memory and speed of NumberArray against list-backed MRT arrays.
+
+Run from the repository root:
+
+    python -m benchmarks.numeric_arrays [--size N] [--script-size N] [--engine E]
+
+The runtime part pushes --size numbers through the push() builtin and
+reports the memory held by the array (measured with tracemalloc in a
+separate pass) and the time taken. The script part runs an MRT program
+that fills and sums an array, once with an all-number array and once
+with an array that already holds a non-number.
+"""
+import argparse
+import contextlib
+import io
+import time
+import tracemalloc
+
+from src.__main__ import ENGINES, parse
+from src.arrays import make_array
+from src.interpreter import MRTBuiltin
+from src.resolver import Resolver
+
+SCRIPT = """
+var data = [{first}];
+var i = 0;
+while (i < {size}) {{ push(data, i * 0.5); i = i + 1; }}
+var total = 0;
+i = 1;
+while (i < len(data)) {{ total = total + data[i]; i = i + 1; }}
+print total;
+"""
+
+def build(first, size: int):
+    push = MRTBuiltin.push
+    array = make_array([first])
+    for i in range(size):
+        push(array, i * 0.5)
+    return array
+
+def array_memory(first, size: int) -> int:
+    tracemalloc.start()
+    array = build(first, size)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del array
+    return memory
+
+def push_time(first, size: int) -> float:
+    start = time.perf_counter()
+    build(first, size)
+    return time.perf_counter() - start
+
+def script_time(engine: str, first: str, size: int) -> float:
+    statements = Resolver().resolve(parse(SCRIPT.format(first=first, size=size)))
+    interpreter = ENGINES[engine]()
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        interpreter.interpret(statements)
+        elapsed = time.perf_counter() - start
+    if interpreter.output[-1].startswith("Runtime Error"):
+        raise SystemExit(interpreter.output[-1])
+    return elapsed
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--size", type=int, default=10_000_000,
+                            help="elements for the runtime measurements (default: 10,000,000)")
+    arg_parser.add_argument("--script-size", type=int, default=1_000_000,
+                            help="elements for the MRT script (default: 1,000,000)")
+    arg_parser.add_argument("--engine", choices=sorted(ENGINES), default="vm",
+                            help="engine running the script (default: vm)")
+    args = arg_parser.parse_args()
+
+    print(f"runtime, {args.size:,} elements")
+    print(f"{'':<14}{'memory':>12}{'push':>10}")
+    for label, first in (("list", True), ("NumberArray", 0.0)):
+        memory = array_memory(first, args.size)
+        push = push_time(first, args.size)
+        print(f"{label:<14}{memory / 2**20:>8.1f} MiB{push:>9.2f}s")
+
+    print(f"\n{args.engine} engine, {args.script_size:,} elements")
+    for label, first in (("list", "true"), ("NumberArray", "0")):
+        elapsed = script_time(args.engine, first, args.script_size)
+        print(f"{label:<14}{elapsed:>8.2f}s")
+
+if __name__ == "__main__":
+    main()
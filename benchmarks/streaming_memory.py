@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""Peak memory of batch vs. streaming execution as script size grows.
+
+Run from the repository root:
+
+    python -m benchmarks.streaming_memory [--sizes 1000 10000 100000]
+"""
+import argparse
+import contextlib
+import io
+import tracemalloc
+
+from src.interpreter import Interpreter
+from src.lexer import Lexer
+from src.parser import Parser
+
+def generate_source(statements: int) -> str:
+    lines = ["var total = 0;"]
+    for i in range(statements):
+        lines.append(f"total = total + {i} * 2 - (total / 3);")
+    lines.append("print total;")
+    return "\n".join(lines)
+
+def batch(source: str):
+    statements = Parser(Lexer(source).scan_tokens()).parse()
+    Interpreter().interpret(statements)
+
+def streaming(source: str):
+    declarations = Parser(Lexer(source).iter_tokens()).declarations()
+    Interpreter().interpret_stream(declarations)
+
+def peak_memory(run, source: str) -> int:
+    tracemalloc.start()
+    with contextlib.redirect_stdout(io.StringIO()):
+        run(source)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000],
+                            help="numbers of generated top-level statements")
+    args = arg_parser.parse_args()
+
+    print(f"{'statements':>10} {'source KiB':>11} {'batch KiB':>10} {'stream KiB':>11}")
+    for size in args.sizes:
+        source = generate_source(size)
+        print(f"{size:>10} {len(source) / 1024:>11.0f} "
+              f"{peak_memory(batch, source) / 1024:>10.0f} "
+              f"{peak_memory(streaming, source) / 1024:>11.0f}")
+    print("Peak memory excludes the source string itself, which both modes hold.")
+
+if __name__ == "__main__":
+    main()
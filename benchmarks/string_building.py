@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""Building a long string with repeated `s = s + line` in MRT.
+
+Run from the repository root:
+
+    python -m benchmarks.string_building [--megabytes N] [--plain-megabytes N] [--engine E]
+
+The MRT program appends 64-character lines until the string holds
+--megabytes of text, then reads it once. It runs with StringBuilder
+concatenation, and again at --plain-megabytes with builders disabled, so
+every `+` copies the whole string as it did before. The plain run is
+quadratic, so keep it small.
+"""
+import argparse
+import contextlib
+import io
+import time
+
+from src import strings
+from src.__main__ import ENGINES, parse
+from src.resolver import Resolver
+
+LINE = "x" * 63 + "."
+SCRIPT = """
+var s = "";
+var i = 0;
+while (i < {count}) {{ s = s + "{line}"; i = i + 1; }}
+print endsWith(s, ".");
+"""
+
+def build_time(engine: str, megabytes: float) -> float:
+    count = int(megabytes * 2**20) // len(LINE)
+    statements = Resolver().resolve(parse(SCRIPT.format(count=count, line=LINE)))
+    interpreter = ENGINES[engine]()
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        interpreter.interpret(statements)
+        elapsed = time.perf_counter() - start
+    if interpreter.output != ["True"]:
+        raise SystemExit(f"{engine}: {interpreter.output[-1]}")
+    return elapsed
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--megabytes", type=float, default=50,
+                            help="size of the string built with StringBuilders (default: 50)")
+    arg_parser.add_argument("--plain-megabytes", type=float, default=2,
+                            help="size of the string built with plain str (default: 2)")
+    arg_parser.add_argument("--engine", choices=sorted(ENGINES), default="vm",
+                            help="engine running the program (default: vm)")
+    args = arg_parser.parse_args()
+
+    builder = build_time(args.engine, args.megabytes)
+    print(f"StringBuilder {args.megabytes:>6g} MB {builder:>8.2f}s"
+          f" {args.megabytes / builder:>8.1f} MB/s")
+
+    threshold = strings.BUILDER_THRESHOLD
+    strings.BUILDER_THRESHOLD = float("inf")
+    try:
+        plain = build_time(args.engine, args.plain_megabytes)
+    finally:
+        strings.BUILDER_THRESHOLD = threshold
+    print(f"plain str     {args.plain_megabytes:>6g} MB {plain:>8.2f}s"
+          f" {args.plain_megabytes / plain:>8.1f} MB/s")
+
+if __name__ == "__main__":
+    main()
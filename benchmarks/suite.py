@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""Per-phase timings and peak memory of the lexer, parser and interpreter.
+
+Run from the repository root:
+
+    python -m benchmarks.suite [--workload W ...] [--engine E] [--repeat R]
+                               [--save PATH] [--baseline PATH] [--threshold F]
+
+Every workload is lexed with Lexer.scan_tokens, parsed with Parser.parse
+and run with interpret() on the chosen engine, --repeat times. The
+median and variance of each phase are reported, along with its peak
+memory, which is measured in one extra run under tracemalloc so tracing
+doesn't slow the timed runs.
+
+--save writes the results as JSON. --baseline compares against such a
+file and exits with status 1 when a phase's median time or peak memory
+grew by more than --threshold (default 0.10, i.e. 10%). Phases under
+a millisecond are never flagged.
+
+Runs on the tree engine are compared against benchmarks/baseline.json
+unless another --baseline (or --no-baseline) is given. After a change
+that makes things faster or slower on purpose, refresh it with
+
+    python -m benchmarks.suite --save benchmarks/baseline.json
+
+and commit the new file along with the change.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Dict
+
+from src.__main__ import ENGINES
+from src.lexer import Lexer
+from src.output import OutputSink
+from src.parser import Parser
+
+PHASES = ["lex", "parse", "interpret"]
+# Phases this short are mostly timer noise, so they're never flagged
+MIN_FLAGGED_MS = 1.0
+# Committed results of the tree engine that runs are compared against
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+def generated_source(functions: int = 2000) -> str:
+    """A long flat program: many small functions, each called once"""
+    lines = []
+    for i in range(functions):
+        lines.append(f"func f{i}(a, b) {{")
+        lines.append(f"    var t = a * {i} + b;")
+        lines.append(f"    if (t > {i}) {{ return t - b; }}")
+        lines.append("    return t;")
+        lines.append("}")
+    lines.append("var total = 0;")
+    lines.extend(f"total = total + f{i}({i}, 2);" for i in range(functions))
+    lines.append("print total;")
+    return "\n".join(lines) + "\n"
+
+WORKLOADS = {
+    "recursion": """
+func fib(n) { if (n < 2) { return n; } return fib(n - 1) + fib(n - 2); }
+func depth(n) { if (n == 0) { return 0; } return 1 + depth(n - 1); }
+print fib(18);
+var i = 0;
+var total = 0;
+while (i < 200) { total = total + depth(50); i = i + 1; }
+print total;
+""",
+    "arrays": """
+var data = [];
+var i = 0;
+while (i < 20000) { push(data, i * 3); i = i + 1; }
+var total = 0;
+i = 0;
+while (i < len(data)) { total = total + data[i]; data[i] = data[i] / 2; i = i + 1; }
+print total;
+print len(slice(data, 100, 5000));
+print indexOf(data, 300);
+print sum(sort(data));
+var names = [];
+i = 0;
+while (i < 5000) { push(names, "item" + i); i = i + 1; }
+print join(slice(names, 0, 3), ",");
+""",
+    "strings": """
+var words = split("the quick brown fox jumps over the lazy dog", " ");
+var report = "";
+var round = 0;
+while (round < 600) {
+    var j = 0;
+    while (j < len(words)) {
+        var word = words[j];
+        if (startsWith(word, "t")) { word = toUpper(word); }
+        report = report + replace(word, "o", "0") + " ";
+        j = j + 1;
+    }
+    round = round + 1;
+}
+print len(split(trim(report), " "));
+print contains(report, "f0x");
+""",
+    "deep-scopes": """
+func make(n) {
+    var base = n;
+    func level1(a) {
+        var x = a + base;
+        func level2(b) {
+            var y = b + x;
+            { var z = y + 1; { var w = z + base; return w; } }
+        }
+        return level2(a);
+    }
+    return level1;
+}
+var f = make(1);
+var i = 0;
+var total = 0;
+while (i < 20000) { { var k = i; { total = total + f(k); } } i = i + 1; }
+print total;
+""",
+    "generated": generated_source(),
+}
+
+def run_phases(source: str, engine: str) -> Dict[str, float]:
+    start = time.perf_counter()
+    tokens = Lexer(source).scan_tokens()
+    lexed = time.perf_counter()
+    statements = Parser(tokens).parse()
+    parsed = time.perf_counter()
+    interpreter = ENGINES[engine](output_sink=OutputSink(capture=1, echo=False))
+    interpreter.interpret(statements)
+    finished = time.perf_counter()
+    if interpreter.output and interpreter.output[-1].startswith("Runtime Error"):
+        raise SystemExit(f"{engine}: {interpreter.output[-1]}")
+    return {"lex": lexed - start, "parse": parsed - lexed, "interpret": finished - parsed}
+
+def peak_memory(source: str, engine: str) -> Dict[str, int]:
+    """Bytes allocated at the peak of each phase, over what was live before it"""
+    peaks = {}
+    tracemalloc.start()
+    try:
+        def measure(phase, step):
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            result = step()
+            peaks[phase] = tracemalloc.get_traced_memory()[1] - before
+            return result
+
+        tokens = measure("lex", lambda: Lexer(source).scan_tokens())
+        statements = measure("parse", lambda: Parser(tokens).parse())
+        interpreter = ENGINES[engine](output_sink=OutputSink(capture=1, echo=False))
+        measure("interpret", lambda: interpreter.interpret(statements))
+    finally:
+        tracemalloc.stop()
+    return peaks
+
+def measure_workload(source: str, engine: str, repeat: int) -> Dict[str, dict]:
+    samples = {phase: [] for phase in PHASES}
+    for _ in range(repeat):
+        for phase, seconds in run_phases(source, engine).items():
+            samples[phase].append(seconds * 1000)
+    peaks = peak_memory(source, engine)
+    return {phase: {
+        "median_ms": statistics.median(samples[phase]),
+        "variance_ms2": statistics.variance(samples[phase]) if repeat > 1 else 0.0,
+        "peak_bytes": peaks[phase],
+    } for phase in PHASES}
+
+def compare(current: dict, baseline: dict, threshold: float) -> Dict[str, str]:
+    """Change against the baseline per "workload/phase", marking regressions with '!'"""
+    changes = {}
+    for workload, phases in current["workloads"].items():
+        for phase, result in phases.items():
+            old = baseline.get("workloads", {}).get(workload, {}).get(phase)
+            if not old:
+                continue
+            notes = []
+            for key, label in (("median_ms", "time"), ("peak_bytes", "mem")):
+                if old[key] <= 0:
+                    continue
+                change = result[key] / old[key] - 1
+                noise = key == "median_ms" and max(result[key], old[key]) < MIN_FLAGGED_MS
+                mark = "!" if change > threshold and not noise else ""
+                notes.append(f"{label} {change:+.1%}{mark}")
+            changes[f"{workload}/{phase}"] = "  ".join(notes)
+    return changes
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--workload", action="append", choices=sorted(WORKLOADS),
+                            help="workload to run, may be repeated (default: all)")
+    arg_parser.add_argument("--engine", choices=sorted(ENGINES), default="tree",
+                            help="engine for the interpret phase (default: tree)")
+    arg_parser.add_argument("--repeat", type=int, default=5,
+                            help="timed runs per workload (default: 5)")
+    arg_parser.add_argument("--save", metavar="PATH", help="write the results as JSON")
+    arg_parser.add_argument("--baseline", metavar="PATH", default=DEFAULT_BASELINE,
+                            help="JSON from an earlier --save to compare against "
+                                 "(default: benchmarks/baseline.json)")
+    arg_parser.add_argument("--no-baseline", dest="baseline", action="store_const", const=None,
+                            help="don't compare against any baseline")
+    arg_parser.add_argument("--threshold", type=float, default=0.10,
+                            help="relative growth counted as a regression (default: 0.10)")
+    args = arg_parser.parse_args()
+
+    results = {"engine": args.engine, "repeat": args.repeat, "workloads": {}}
+    for name in args.workload or list(WORKLOADS):
+        results["workloads"][name] = measure_workload(WORKLOADS[name], args.engine, args.repeat)
+
+    changes = {}
+    note = None
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        if baseline.get("engine") == args.engine:
+            changes = compare(results, baseline, args.threshold)
+        else:
+            note = f"not compared: the baseline is for the {baseline.get('engine')} engine"
+
+    print(f"engine {args.engine}, {args.repeat} runs")
+    if note:
+        print(note)
+    print(f"{'workload':<13}{'phase':<11}{'median':>11}{'stdev':>10}{'peak mem':>12}  baseline")
+    for name, phases in results["workloads"].items():
+        for phase, result in phases.items():
+            print(f"{name:<13}{phase:<11}{result['median_ms']:>8.2f} ms"
+                  f"{result['variance_ms2'] ** 0.5:>7.2f} ms"
+                  f"{result['peak_bytes'] / 1024:>8.0f} KiB  {changes.get(f'{name}/{phase}', '')}")
+
+    if args.save:
+        with open(args.save, "w") as file:
+            json.dump(results, file, indent=2)
+    if any("!" in change for change in changes.values()):
+        print(f"regressions over {args.threshold:.0%} are marked with '!'")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,12 @@
+import re
 from setuptools import setup, find_packages
 
+with open("src/__init__.py") as f:
+    version = re.search(r'__version__ = "([^"]+)"', f.read()).group(1)
+
 setup(
     name="mrt-lang",
-    version="0.1.0",
+    version=version,
     description="MRT Programming Language - A modern, expressive programming language",
     long_description=open("README.md").read(),
     long_description_content_type="text/markdown",
@@ -11,6 +15,9 @@ setup(
     url="https://github.com/yourusername/mrt",
     packages=find_packages(),
     install_requires=[],
+    extras_require={
+        "numpy": ["numpy"],  # vectorized sum/min/max/sort of large number arrays
+    },
     python_requires=">=3.10",  # We use match statements which require Python 3.10+
     entry_points={
         "console_scripts": [
@@ -1,32 +1,218 @@
+import argparse
+import json
 import sys
-from .lexer import Lexer
-from .parser import Parser
+from functools import partial
+from typing import Optional
+from .cache import load_program
+from .lexer import Lexer, pragmas
+from .memo import DEFAULT_SIZE, format_stats
+from .parser import ParseError, Parser
+from .profiler import ProfilingInterpreter, format_profile
+from .inline_cache import format_cache_stats
 from .interpreter import Interpreter
+from .jit import format_jit_stats
+from .optimizer import Optimizer
+from .output import DEFAULT_BUFFER, OutputSink
+from .resolver import Resolver
+from .transpiler import PythonInterpreter, TranspileError
+from .vm import VM
 
-def run_file(path: str):
+ENGINES = {
+    "tree": Interpreter,
+    "vm": VM,
+    "closure": partial(Interpreter, compile_closures=True),
+    "jit": partial(Interpreter, jit=True),
+    "python": PythonInterpreter,
+}
+
+def run_file(path: str, engine: str = "tree", use_cache: bool = True,
+             optimizer: Optional[Optimizer] = None, memo_size: int = 0,
+             output_sink: Optional[OutputSink] = None) -> Interpreter:
+    if use_cache:
+        return execute(load_program(path, parse), engine, optimizer, memo_size, output_sink)
+
+    with open(path, 'r') as file:
+        source = file.read()
+        return run(source, engine, optimizer, memo_size, output_sink)
+
+def run_stream(path: str, engine: str = "tree", optimizer: Optional[Optimizer] = None,
+               output_sink: Optional[OutputSink] = None) -> Interpreter:
     with open(path, 'r') as file:
         source = file.read()
-        run(source)
 
-def run(source: str):
+    # Tokens, statements and execution are chained generators, so neither
+    # the token list nor the full AST is ever materialized.
+    declarations = Parser(Lexer(source).iter_tokens()).declarations()
+    if optimizer:
+        # Hoisting needs to see the whole program, so only the per-statement
+        # passes apply while streaming.
+        optimizer.level = min(optimizer.level, 1)
+        declarations = (optimized for declaration in declarations
+                        for optimized in optimizer.optimize([declaration]))
+    interpreter = ENGINES[engine](output_sink=output_sink)
+    interpreter.interpret_stream(declarations)
+    return interpreter
+
+def parse(source: str, strict: bool = False):
     # Create lexer and generate tokens
     lexer = Lexer(source)
     tokens = lexer.scan_tokens()
 
-    # Parse tokens into AST
+    # Parse tokens into AST. The parser skips declarations with a syntax
+    # error; strict callers get the first error raised instead.
     parser = Parser(tokens)
     statements = parser.parse()
+    if strict and parser.errors:
+        raise ParseError(parser.errors[0])
+    return statements
+
+def run(source: str, engine: str = "tree", optimizer: Optional[Optimizer] = None,
+        memo_size: int = 0, output_sink: Optional[OutputSink] = None) -> Interpreter:
+    return execute(parse(source), engine, optimizer, memo_size, output_sink)
+
+def execute(statements, engine: str = "tree", optimizer: Optional[Optimizer] = None,
+            memo_size: int = 0, output_sink: Optional[OutputSink] = None) -> Interpreter:
+    if optimizer:
+        statements = optimizer.optimize(statements)
 
     # Interpret the AST
-    interpreter = Interpreter()
+    interpreter = ENGINES[engine](memo_size=memo_size, output_sink=output_sink)
     interpreter.interpret(statements)
+    return interpreter
 
-def main():
-    if len(sys.argv) != 2:
-        print("Usage: python -m mrt <script>")
+def profile_file(path: str, optimizer: Optional[Optimizer] = None, memo_size: int = 0,
+                 output_sink: Optional[OutputSink] = None) -> ProfilingInterpreter:
+    with open(path, 'r') as file:
+        source = file.read()
+    # Parsed here rather than loaded from the cache to get statement lines
+    lines = {}
+    statements = Parser(Lexer(source).scan_tokens(), lines).parse()
+    if optimizer:
+        statements = optimizer.optimize(statements)
+    interpreter = ProfilingInterpreter(lines, source, memo_size=memo_size, output_sink=output_sink)
+    interpreter.interpret(statements)
+    return interpreter
+
+def emit_python(path: str, optimizer: Optional[Optimizer] = None):
+    with open(path, 'r') as file:
+        statements = parse(file.read())
+    if optimizer:
+        statements = optimizer.optimize(statements)
+    statements = Resolver().resolve(statements)
+    try:
+        print(PythonInterpreter().transpile(statements), end="")
+    except TranspileError as e:
+        print(f"Cannot transpile {path}: {e}", file=sys.stderr)
         sys.exit(1)
 
-    run_file(sys.argv[1])
+def main():
+    if sys.argv[1:2] == ["batch"]:
+        # `mrt batch ...` runs many scripts in worker processes
+        from .batch import main as batch_main
+        return batch_main(sys.argv[2:])
+    if sys.argv[1:2] == ["serve"]:
+        # `mrt serve ...` runs programs sent over a socket
+        from .serve import main as serve_main
+        return serve_main(sys.argv[2:])
+
+    arg_parser = argparse.ArgumentParser(prog="mrt", description="Run an MRT program.")
+    arg_parser.add_argument("script", help="path to the .mrt file to run")
+    arg_parser.add_argument("--engine", choices=sorted(ENGINES), default="tree",
+                            help="execution engine (default: tree)")
+    arg_parser.add_argument("--emit-python", action="store_true",
+                            help="print the Python code generated for the script and exit")
+    arg_parser.add_argument("--stream", action="store_true",
+                            help="execute top-level statements while the rest of the "
+                                 "script is still being parsed (bypasses the cache)")
+    arg_parser.add_argument("--no-cache", action="store_true",
+                            help="always lex and parse the script instead of using __mrtcache__")
+    arg_parser.add_argument("-O", dest="opt_level", type=int, choices=[0, 1, 2], default=0,
+                            help="optimization level: -O1 folds constants and removes dead "
+                                 "code, -O2 also hoists loop invariants (default: 0)")
+    arg_parser.add_argument("--opt-report", action="store_true",
+                            help="print the changes made by the optimizer to stderr")
+    arg_parser.add_argument("--memoize", action="store_true",
+                            help="cache results of pure functions (also enabled by a "
+                                 "'// @memoize' line in the script)")
+    arg_parser.add_argument("--memo-size", type=int, default=DEFAULT_SIZE, metavar="N",
+                            help=f"entries kept per memoized function (default: {DEFAULT_SIZE})")
+    arg_parser.add_argument("--memo-stats", action="store_true",
+                            help="print memoization hits, misses and evictions to stderr")
+    arg_parser.add_argument("--jit-stats", action="store_true",
+                            help="print which loops the jit engine compiled, and how often "
+                                 "their type guards failed, to stderr")
+    arg_parser.add_argument("--inline-cache-stats", action="store_true",
+                            help="print the hit rates of the inline caches on operators and "
+                                 "calls to stderr, busiest 20 sites first")
+    arg_parser.add_argument("--output-buffer", type=int, default=None, metavar="CHARS",
+                            help="characters of output collected before writing to stdout; "
+                                 "0 writes every line (default: 0 on a terminal, "
+                                 f"{DEFAULT_BUFFER} otherwise)")
+    arg_parser.add_argument("--profile", action="store_true",
+                            help="print time and call counts per function and line to stderr "
+                                 "(runs on the tree engine)")
+    arg_parser.add_argument("--profile-json", metavar="PATH",
+                            help="write the profile as JSON to PATH")
+    arg_parser.add_argument("--profile-limit", type=int, default=20, metavar="N",
+                            help="rows shown per profile table (default: 20)")
+    args = arg_parser.parse_args()
+    profiling = args.profile or args.profile_json
+    if profiling and (args.engine != "tree" or args.stream or args.emit_python):
+        arg_parser.error("--profile works only with the tree engine, without --stream or --emit-python")
+
+    optimizer = Optimizer(args.opt_level) if args.opt_level else None
+    memo_size = 0
+    if not args.stream and args.memo_size > 0:
+        # Purity analysis needs the whole program, so streaming never memoizes
+        with open(args.script, 'r') as file:
+            if args.memoize or "memoize" in pragmas(file.read()):
+                memo_size = args.memo_size
+
+    # The command line never reads the captured lines, so don't keep any
+    output_sink = OutputSink(args.output_buffer, capture=0)
+    interpreter = None
+    try:
+        if args.emit_python:
+            emit_python(args.script, optimizer)
+        elif profiling:
+            interpreter = profile_file(args.script, optimizer, memo_size, output_sink)
+        elif args.stream:
+            interpreter = run_stream(args.script, args.engine, optimizer, output_sink)
+        else:
+            interpreter = run_file(args.script, args.engine, not args.no_cache, optimizer,
+                                   memo_size, output_sink)
+    finally:
+        if optimizer and args.opt_report:
+            print(optimizer.report(), file=sys.stderr)
+    if profiling and interpreter:
+        profile = interpreter.profile()
+        if args.profile:
+            print(format_profile(profile, args.profile_limit), file=sys.stderr)
+        if args.profile_json:
+            with open(args.profile_json, 'w') as file:
+                json.dump(profile, file, indent=2)
+    if interpreter and args.memo_stats:
+        caches = list(interpreter.memo_caches.values())
+        if args.stream:
+            message = "memoize: off while streaming (purity analysis needs the whole program)"
+        elif not memo_size:
+            message = "memoize: off (enable with --memoize or a '// @memoize' line)"
+        else:
+            message = format_stats(caches) if caches else "memoize: no pure functions were called"
+        print(message, file=sys.stderr)
+    if interpreter and args.inline_cache_stats:
+        if interpreter.inline_caches:
+            message = format_cache_stats(interpreter.inline_caches.values(), limit=20)
+        else:
+            message = "inline caches: none (used by the tree and jit engines)"
+        print(message, file=sys.stderr)
+    if interpreter and args.jit_stats:
+        if interpreter.jit is None:
+            message = "jit: off (enable with --engine jit)"
+        else:
+            stats = interpreter.jit.stats()
+            message = format_jit_stats(stats) if stats else "jit: no loops were run"
+        print(message, file=sys.stderr)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,63 @@
+from array import array
+from typing import Any, Iterator, List, Union
+
+class NumberArray:
+    """An MRT array holding only numbers, stored as a contiguous buffer of
+    doubles instead of a list of boxed floats.
+
+    It behaves exactly like a list-backed array. The first time a
+    non-number is stored, the buffer is converted to a list in place, so
+    every reference to the array sees the change.
+    """
+    __slots__ = ("items",)
+
+    def __init__(self, items: Union[array, List[Any], None] = None):
+        self.items = array("d") if items is None else items
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self.items)
+
+    def __getitem__(self, index: Any) -> Any:
+        if isinstance(index, slice):
+            return NumberArray(self.items[index])
+        return self.items[index]
+
+    def __setitem__(self, index: int, value: Any):
+        items = self.items
+        if type(value) is not float and type(items) is array:
+            items = self.items = items.tolist()
+        items[index] = value
+
+    def append(self, value: Any):
+        items = self.items
+        if type(value) is not float and type(items) is array:
+            items = self.items = items.tolist()
+        items.append(value)
+
+    def pop(self) -> Any:
+        return self.items.pop()
+
+    def index(self, value: Any) -> int:
+        return self.items.index(value)
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, ARRAY_TYPES):
+            return len(self.items) == len(other) and all(a == b for a, b in zip(self.items, other))
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return repr(self.items if type(self.items) is list else self.items.tolist())
+
+ARRAY_TYPES = (list, NumberArray)
+
+def make_array(values: List[Any]) -> Union[NumberArray, List[Any]]:
+    """The runtime value of an array literal (or any new array)"""
+    for value in values:
+        if type(value) is not float:
+            return values
+    return NumberArray(array("d", values))
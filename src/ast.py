@@ -1,98 +1,133 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
 from typing import List, Any, Optional
 
-# Base class for all AST nodes
+# Base class for all AST nodes. Every node class is slotted (including
+# these bases, which would otherwise add a per-instance __dict__), so a
+# node costs a fixed-size record instead of a dict of its fields.
 class Expr:
-    pass
+    __slots__ = ()
 
 class Stmt:
-    pass
+    __slots__ = ()
 
-@dataclass
+@dataclass(slots=True)
 class Binary(Expr):
     left: Expr
     operator: 'Token'
     right: Expr
 
-@dataclass
+@dataclass(slots=True)
 class Grouping(Expr):
     expression: Expr
 
-@dataclass
+@dataclass(slots=True)
 class Literal(Expr):
     value: Any
 
-@dataclass
+@dataclass(slots=True)
 class Unary(Expr):
     operator: 'Token'
     right: Expr
 
-@dataclass
+# Variable and Assign carry the (depth, slot) pair filled in by the
+# Resolver. depth counts frame hops outward from the current frame; None
+# means the name is looked up in the globals.
+@dataclass(slots=True)
 class Variable(Expr):
     name: 'Token'
+    depth: Optional[int] = None
+    slot: int = 0
 
-@dataclass
+@dataclass(slots=True)
 class Assign(Expr):
     name: 'Token'
     value: Expr
+    depth: Optional[int] = None
+    slot: int = 0
 
-@dataclass
+@dataclass(slots=True)
 class Call(Expr):
     callee: Expr
     paren: 'Token'
     arguments: List[Expr]
 
-@dataclass
+@dataclass(slots=True)
 class Array(Expr):
     elements: List[Expr]
 
-@dataclass
+@dataclass(slots=True)
 class ArrayAccess(Expr):
     array: Expr
     index: Expr
 
-@dataclass
+@dataclass(slots=True)
 class ArrayAssign(Expr):
     array: Expr
     index: Expr
     value: Expr
 
 # Statement nodes
-@dataclass
+@dataclass(slots=True)
 class Expression(Stmt):
     expression: Expr
 
-@dataclass
+@dataclass(slots=True)
 class Function(Stmt):
     name: 'Token'
     params: List['Token']
     body: List[Stmt]
+    slot: Optional[int] = None  # None for globals
+    frame_size: int = 0         # parameters plus body-level locals
+    pure: bool = False          # set by purity.mark_pure_functions
 
-@dataclass
+@dataclass(slots=True)
 class If(Stmt):
     condition: Expr
     then_branch: Stmt
     else_branch: Optional[Stmt]
 
-@dataclass
+@dataclass(slots=True)
 class Return(Stmt):
     keyword: 'Token'
     value: Optional[Expr]
+    tail_call: bool = False  # value is a call whose frame can replace ours
 
-@dataclass
+@dataclass(slots=True)
 class While(Stmt):
     condition: Expr
     body: Stmt
+    counted: bool = False  # a `for` loop stepping a counter only it assigns
 
-@dataclass
+@dataclass(slots=True)
 class Block(Stmt):
     statements: List[Stmt]
+    frame_size: int = 0  # 0 means the block runs in the enclosing frame
 
-@dataclass
+@dataclass(slots=True)
 class Print(Stmt):
     expression: Expr
 
-@dataclass
+@dataclass(slots=True)
 class Var(Stmt):
     name: 'Token'
     initializer: Optional[Expr]
+    slot: Optional[int] = None  # None for globals
+
+def children(node) -> List[Any]:
+    """The Expr and Stmt nodes directly below node, in field order"""
+    result = []
+    for field in fields(node):
+        value = getattr(node, field.name)
+        if isinstance(value, (Expr, Stmt)):
+            result.append(value)
+        elif isinstance(value, list):
+            result.extend(item for item in value if isinstance(item, (Expr, Stmt)))
+    return result
+
+def walk(nodes: List[Any]):
+    """Yield every node reachable from nodes, depth first"""
+    stack = list(reversed(nodes))
+    while stack:
+        node = stack.pop()
+        yield node
+        stack.extend(reversed(children(node)))
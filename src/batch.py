@@ -0,0 +1,204 @@
+import argparse
+import glob
+import json
+import os
+import signal
+import sys
+import time
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+from .__main__ import ENGINES, parse
+from .cache import load_program
+from .lexer import pragmas
+from .memo import DEFAULT_SIZE
+from .optimizer import Optimizer
+from .output import OutputSink
+
+# Jobs handed to each worker ahead of time, so workers never sit idle
+# waiting for the parent to submit the next script
+JOBS_PER_WORKER = 2
+# Run by every worker when it starts, so the first real job doesn't pay
+# for lazy imports and first-call setup
+WARM_UP = """
+func square(x) { return x * x; }
+var total = 0;
+var i = 0;
+while (i < 100) { total = total + square(i); i = i + 1; }
+"""
+
+class JobTimeout(BaseException):
+    """Raised in a worker by SIGALRM. A BaseException, so the
+    interpreter's own `except Exception` doesn't swallow it."""
+
+# Settings of this worker process, set by start_worker()
+settings: Dict[str, Any] = {}
+
+def start_worker(engine: str, opt_level: int, use_cache: bool):
+    settings.update(engine=engine, opt_level=opt_level, use_cache=use_cache)
+    if hasattr(signal, "setitimer"):
+        signal.signal(signal.SIGALRM, alarm)
+    ENGINES[engine](output_sink=OutputSink(capture=0, echo=False)).interpret(parse(WARM_UP))
+
+def alarm(signum, frame):
+    raise JobTimeout()
+
+def run_job(index: int, path: str, timeout: Optional[float]) -> Dict[str, Any]:
+    """Run one script in this worker and describe how it went"""
+    output_sink = OutputSink(capture=None, echo=False)
+    result = {"index": index, "script": path, "status": "ok", "output": "", "error": None}
+    timed = bool(timeout) and hasattr(signal, "setitimer")
+    start = time.perf_counter()
+    try:
+        # The alarm is cancelled inside the try, so one going off just
+        # before it is cancelled is still caught below
+        try:
+            if timed:
+                signal.setitimer(signal.ITIMER_REAL, timeout)
+            with open(path, 'r') as file:
+                source = file.read()
+            # A syntax error is raised, reported as an error and never cached
+            strict_parse = partial(parse, strict=True)
+            if settings["use_cache"]:
+                statements = load_program(path, strict_parse)
+            else:
+                statements = strict_parse(source)
+            if settings["opt_level"]:
+                statements = Optimizer(settings["opt_level"]).optimize(statements)
+            memo_size = DEFAULT_SIZE if "memoize" in pragmas(source) else 0
+            interpreter = ENGINES[settings["engine"]](memo_size=memo_size, output_sink=output_sink)
+            interpreter.interpret(statements)
+            if interpreter.error is not None:
+                # The last captured line is the "Runtime Error: ..." report
+                output_sink.captured.pop()
+                result.update(status="error", error=interpreter.error)
+        finally:
+            if timed:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+    except JobTimeout:
+        result.update(status="timeout", error=f"Timed out after {timeout:g}s.")
+    except Exception as e:
+        result.update(status="error", error=str(e))
+    result["output"] = output_sink.text()
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+def crashed(index: int, path: str) -> Dict[str, Any]:
+    return {"index": index, "script": path, "status": "crashed", "output": "",
+            "error": "The worker process running the script exited.", "seconds": None}
+
+def run_batch(paths: List[str], workers: Optional[int] = None, timeout: Optional[float] = None,
+              engine: str = "tree", opt_level: int = 0, use_cache: bool = True) -> Iterator[Dict[str, Any]]:
+    """Run the scripts in a pool of worker processes, yielding each one's
+    result as it finishes (so not in the order given).
+
+    A worker that dies (killed, out of memory, a crash in Python itself)
+    takes down the pool, failing every script in flight. Those scripts
+    are rerun in a new pool one at a time, so only the one that kills
+    its worker again is reported as crashed.
+    """
+    workers = workers or os.cpu_count() or 1
+    # (index, path, suspect): suspects were in flight when a worker died
+    queue = deque((index, path, False) for index, path in enumerate(paths))
+    while queue:
+        with ProcessPoolExecutor(workers, initializer=start_worker,
+                                 initargs=(engine, opt_level, use_cache)) as executor:
+            running = {}
+            broken = False
+            while queue or running:
+                while queue and not broken:
+                    # Suspects run alone, so a crash points at one script
+                    isolate = queue[0][2] or any(job[2] for job in running.values())
+                    if running and (isolate or len(running) >= workers * JOBS_PER_WORKER):
+                        break
+                    index, path, _ = queue[0]
+                    try:
+                        future = executor.submit(run_job, index, path, timeout)
+                    except BrokenProcessPool:
+                        broken = True
+                        break
+                    running[future] = queue.popleft()
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                alone = len(running) == 1
+                for future in done:
+                    index, path, _ = running.pop(future)
+                    try:
+                        result = future.result()
+                    except BrokenProcessPool:
+                        broken = True
+                        if not alone:
+                            queue.appendleft((index, path, True))
+                            continue
+                        result = crashed(index, path)
+                    yield result
+                if broken and not running:
+                    break
+
+def expand(patterns: Iterable[str]) -> List[str]:
+    """Paths named by the patterns, globs (including **) expanded in order"""
+    paths = []
+    for pattern in patterns:
+        if glob.has_magic(pattern):
+            paths.extend(sorted(glob.glob(pattern, recursive=True)))
+        else:
+            paths.append(pattern)
+    return paths
+
+def format_summary(counts: Counter, elapsed: float) -> str:
+    total = sum(counts.values())
+    rate = total / elapsed if elapsed else 0.0
+    return (f"batch: {total} scripts in {elapsed:.2f}s ({rate:.1f} scripts/sec): "
+            f"{counts['ok']} ok, {counts['error']} errors, {counts['timeout']} timed out, "
+            f"{counts['crashed']} crashed")
+
+def main(argv: Optional[List[str]] = None):
+    arg_parser = argparse.ArgumentParser(
+        prog="mrt batch",
+        description="Run many MRT programs in a pool of worker processes, writing one JSON "
+                    "result per script (index, script, status, output, error, seconds) as each "
+                    "finishes, and a throughput summary to stderr.")
+    arg_parser.add_argument("scripts", nargs="*",
+                            help="paths of .mrt files, or glob patterns such as 'jobs/**/*.mrt'")
+    arg_parser.add_argument("--list", metavar="FILE",
+                            help="also run the paths listed in FILE, one per line ('-' for stdin)")
+    arg_parser.add_argument("--workers", type=int, default=None, metavar="N",
+                            help="worker processes (default: one per CPU)")
+    arg_parser.add_argument("--timeout", type=float, default=None, metavar="SECONDS",
+                            help="stop a script after this long and report it as timed out "
+                                 "(needs SIGALRM, so not on Windows)")
+    arg_parser.add_argument("--engine", choices=sorted(ENGINES), default="tree",
+                            help="execution engine (default: tree)")
+    arg_parser.add_argument("-O", dest="opt_level", type=int, choices=[0, 1, 2], default=0,
+                            help="optimization level (default: 0)")
+    arg_parser.add_argument("--no-cache", action="store_true",
+                            help="always lex and parse the scripts instead of using __mrtcache__")
+    arg_parser.add_argument("--results", metavar="PATH",
+                            help="write the results to PATH instead of stdout")
+    args = arg_parser.parse_args(argv)
+
+    paths = expand(args.scripts)
+    if args.list:
+        with (sys.stdin if args.list == "-" else open(args.list, 'r')) as file:
+            paths.extend(line.strip() for line in file if line.strip())
+    if not paths:
+        arg_parser.error("no scripts to run")
+
+    out = open(args.results, 'w') if args.results else sys.stdout
+    counts = Counter()
+    start = time.perf_counter()
+    try:
+        for result in run_batch(paths, args.workers, args.timeout, args.engine,
+                                args.opt_level, not args.no_cache):
+            counts[result["status"]] += 1
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(format_summary(counts, time.perf_counter() - start), file=sys.stderr)
+    if counts["ok"] != len(paths):
+        sys.exit(1)
@@ -0,0 +1,155 @@
+import builtins
+from array import array
+from functools import cmp_to_key, reduce as fold
+from operator import add
+from typing import Any, Callable, List, Union
+from .arrays import ARRAY_TYPES, NumberArray, make_array
+from .strings import flatten
+
+try:
+    import numpy
+except ImportError:  # NumPy is optional; everything works without it
+    numpy = None
+
+# Builtins that call a function argument, so calling them can run user code
+CALLBACK_BUILTINS = {"map", "filter", "reduce", "sort"}
+
+# NumberArrays shorter than this aren't worth handing to NumPy
+NUMPY_THRESHOLD = 1024
+SUM_CHUNK = 65536
+
+class BulkBuiltins:
+    """Array builtins that run their loop in Python instead of MRT code.
+
+    Function arguments may be MRT functions of any engine or builtins;
+    builtins are called directly. Big NumberArrays are reduced and sorted
+    with NumPy when it is installed, giving exactly the same results as
+    the plain Python path.
+    """
+    def __init__(self, interpreter: 'Interpreter'):
+        self.interpreter = interpreter
+
+    def callback(self, name: str, value: Any) -> Callable:
+        function = self.interpreter.native_callable(value)
+        if function is None:
+            raise RuntimeError(f"Second argument to {name}() must be a function.")
+        return function
+
+    def map(self, *args):
+        if len(args) != 2:
+            raise RuntimeError("map() takes exactly two arguments.")
+        values = snapshot("map", args[0])
+        return make_array(list(map(self.callback("map", args[1]), values)))
+
+    def filter(self, *args):
+        if len(args) != 2:
+            raise RuntimeError("filter() takes exactly two arguments.")
+        values = snapshot("filter", args[0])
+        function = self.callback("filter", args[1])
+        kept = []
+        for value in values:
+            result = function(value)
+            if result is not None and result is not False:
+                kept.append(value)
+        return make_array(kept)
+
+    def reduce(self, *args):
+        if len(args) not in [2, 3]:
+            raise RuntimeError("reduce() takes 2 or 3 arguments.")
+        values = snapshot("reduce", args[0])
+        function = self.callback("reduce", args[1])
+        if len(args) == 3:
+            return fold(function, values, args[2])
+        if not values:
+            raise RuntimeError("reduce() of an empty array needs an initial value.")
+        return fold(function, values)
+
+    @staticmethod
+    def sum(*args):
+        if len(args) != 1:
+            raise RuntimeError("sum() takes exactly one argument.")
+        items = numbers("sum", args[0])
+        # Added left to right, like a loop in MRT would, so results don't
+        # depend on NumPy being installed or on the Python version.
+        if use_numpy(items):
+            total = 0.0
+            data = numpy.frombuffer(items)
+            for start in range(0, len(data), SUM_CHUNK):
+                block = data[start:start + SUM_CHUNK].copy()
+                block[0] += total
+                total = float(numpy.cumsum(block, out=block)[-1])
+            return total
+        return fold(add, items, 0.0)
+
+    @staticmethod
+    def min(*args):
+        return extreme("min", args, builtins.min, numpy and numpy.argmin)
+
+    @staticmethod
+    def max(*args):
+        return extreme("max", args, builtins.max, numpy and numpy.argmax)
+
+    def sort(self, *args):
+        if len(args) not in [1, 2]:
+            raise RuntimeError("sort() takes 1 or 2 arguments.")
+        if len(args) == 2:
+            values = snapshot("sort", args[0])
+            compare = self.callback("sort", args[1])
+
+            def order(a, b):
+                result = compare(a, b)
+                if type(result) is not float:
+                    raise RuntimeError("sort() comparison function must return a number.")
+                return result
+            return make_array(sorted(values, key=cmp_to_key(order)))
+
+        source = args[0]
+        if not isinstance(source, ARRAY_TYPES):
+            raise RuntimeError("First argument to sort() must be an array.")
+        if type(source) is NumberArray and type(source.items) is array:
+            items = source.items
+            if use_numpy(items):
+                data = numpy.frombuffer(items)
+                if not numpy.isnan(data).any():
+                    return NumberArray(array("d", numpy.sort(data, kind="stable").tobytes()))
+            return NumberArray(array("d", sorted(items)))
+        values = list(flatten(tuple(source)))
+        kinds = {type(value) for value in values}
+        if len(kinds) > 1 or not kinds <= {float, str}:
+            raise RuntimeError("sort() without a comparison function needs all numbers or all strings.")
+        return make_array(sorted(values))
+
+def snapshot(name: str, value: Any) -> List[Any]:
+    """The elements of an array argument, copied so a callback changing
+    the array doesn't affect the loop"""
+    if not isinstance(value, ARRAY_TYPES):
+        raise RuntimeError(f"First argument to {name}() must be an array.")
+    return list(value)
+
+def numbers(name: str, value: Any) -> Union[array, List[float]]:
+    """The elements of an array argument that must hold only numbers"""
+    if type(value) is NumberArray and type(value.items) is array:
+        return value.items
+    if not isinstance(value, ARRAY_TYPES):
+        raise RuntimeError(f"{name}() argument must be an array.")
+    for item in value:
+        if type(item) is not float:
+            raise RuntimeError(f"{name}() argument must be an array of numbers.")
+    return value.items if type(value) is NumberArray else value
+
+def use_numpy(items: Union[array, List[float]]) -> bool:
+    return numpy is not None and type(items) is array and len(items) >= NUMPY_THRESHOLD
+
+def extreme(name: str, args: tuple, pick: Callable, arg_pick: Callable) -> float:
+    if len(args) != 1:
+        raise RuntimeError(f"{name}() takes exactly one argument.")
+    items = numbers(name, args[0])
+    if not items:
+        raise RuntimeError(f"{name}() of an empty array.")
+    if use_numpy(items):
+        data = numpy.frombuffer(items)
+        # argmin/argmax pick the first extreme, as min()/max() do; with a
+        # NaN present Python's result depends on order, so let it decide.
+        if not numpy.isnan(data).any():
+            return items[int(arg_pick(data))]
+    return pick(items)
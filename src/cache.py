@@ -0,0 +1,86 @@
+import hashlib
+import os
+import pickle
+import tempfile
+from typing import Callable, List, Optional
+from . import __version__
+from .ast import Stmt
+from .resolver import Resolver
+
+# Compiled-program cache, laid out like __pycache__: the resolved AST of
+# dir/script.mrt is stored in dir/__mrtcache__/script.<tag>.mrtc.
+#
+# File format:
+#   magic (4 bytes) | format (1 byte) | tag length (1 byte) | tag
+#   | sha256 of the source (32 bytes) | pickled List[Stmt]
+#
+# The tag embeds the interpreter version, so upgrading MRT never loads a
+# stale tree. Any mismatch or unreadable payload is treated as a miss and
+# the entry is rewritten.
+
+CACHE_DIR = "__mrtcache__"
+MAGIC = b"MRTC"
+FORMAT = 6
+TAG = f"mrt-{__version__}"
+
+def cache_path(script_path: str) -> str:
+    directory, filename = os.path.split(os.path.abspath(script_path))
+    stem = os.path.splitext(filename)[0]
+    return os.path.join(directory, CACHE_DIR, f"{stem}.{TAG}.mrtc")
+
+def source_hash(source: str) -> bytes:
+    return hashlib.sha256(source.encode("utf-8")).digest()
+
+def header(digest: bytes) -> bytes:
+    tag = TAG.encode("ascii")
+    return MAGIC + bytes([FORMAT, len(tag)]) + tag + digest
+
+def read_cache(path: str, digest: bytes) -> Optional[List[Stmt]]:
+    expected = header(digest)
+    try:
+        with open(path, "rb") as file:
+            if file.read(len(expected)) != expected:
+                return None
+            return pickle.load(file)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError, TypeError):
+        return None
+
+def write_cache(path: str, digest: bytes, statements: List[Stmt]):
+    """Atomically replace the cache entry; failures are silently ignored"""
+    try:
+        payload = pickle.dumps(statements, protocol=pickle.HIGHEST_PROTOCOL)
+    except (pickle.PicklingError, RecursionError):
+        return
+
+    directory = os.path.dirname(path)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    except OSError:
+        return
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(header(digest))
+            file.write(payload)
+        os.replace(temp_path, path)
+    except OSError:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+
+def load_program(script_path: str, parse: Callable[[str], List[Stmt]]) -> List[Stmt]:
+    """Return the resolved AST for a script, from the cache when it's fresh.
+    Whatever parse() raises (a syntax error) is passed on, uncached."""
+    with open(script_path, "r") as file:
+        source = file.read()
+
+    digest = source_hash(source)
+    path = cache_path(script_path)
+    statements = read_cache(path, digest)
+    if statements is not None:
+        return statements
+
+    statements = Resolver().resolve(parse(source))
+    write_cache(path, digest, statements)
+    return statements
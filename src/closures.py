@@ -0,0 +1,430 @@
+from typing import Any, Callable, List, Optional
+from .arrays import ARRAY_TYPES, NumberArray, make_array
+from .ast import *
+from .inline_cache import FLOAT_OPERATIONS
+from .interpreter import Frame, TailCall, new_frame
+from .memo import MemoCache
+from .lexer import Token, TokenType
+from .resolver import loop_counter
+from .strings import TEXT_TYPES, concat
+
+# Compiled statements take the current frame and return None to continue,
+# a one-element tuple holding the value of an executed return, or a
+# TailCall for a return of a call in tail position.
+StmtFn = Callable[[Optional[Frame]], Optional[tuple]]
+ExprFn = Callable[[Optional[Frame]], Any]
+
+class CompiledFunction:
+    """An MRT function whose body was compiled to closures"""
+    def __init__(self, declaration: Function, body: StmtFn, closure: Optional[Frame],
+                 memo: Optional[MemoCache] = None):
+        self.declaration = declaration
+        self.body = body
+        self.closure = closure
+        self.memo = memo
+        self.arity = len(declaration.params)
+        self.locals = [None] * (declaration.frame_size - self.arity)
+
+    def invoke(self, arguments: List[Any]) -> Any:
+        frame = [self.closure, *arguments, *self.locals]
+        if self.memo is not None:
+            return self.memo.call(arguments, lambda: self.run(frame))
+        return self.run(frame)
+
+    def run(self, frame: Frame) -> Any:
+        # Tail calls are run in place and skip the callee's memo cache
+        function = self
+        while True:
+            result = function.body(frame)
+            if type(result) is not TailCall:
+                return result[0] if result is not None else None
+            function, frame = result.function, result.frame
+
+    def __str__(self):
+        return f"<function {self.declaration.name.lexeme}>"
+
+class ClosureCompiler:
+    """Turns a resolved AST into a tree of specialized Python closures.
+
+    All dispatch on node types and operators happens once, here; running
+    the result is a chain of direct calls.
+    """
+    def __init__(self, interpreter: 'Interpreter'):
+        self.interpreter = interpreter
+        self.globals = interpreter.globals
+
+    def compile_program(self, statements: List[Stmt]) -> Callable[[], None]:
+        # Same entry semantics as Interpreter.execute_program
+        functions = [self.statement(stmt) for stmt in statements if isinstance(stmt, Function)]
+        if any(stmt.name.lexeme == "main" for stmt in statements if isinstance(stmt, Function)):
+            main = self.expression(Call(Variable(Token(TokenType.IDENTIFIER, "main", None, 1)), None, []))
+            body = self.sequence(functions + [self.expression_statement(main)])
+        else:
+            rest = [self.statement(stmt) for stmt in statements if not isinstance(stmt, Function)]
+            body = self.sequence(functions + rest)
+        return lambda: body(None)
+
+    def sequence(self, statements: List[StmtFn]) -> StmtFn:
+        if len(statements) == 1:
+            return statements[0]
+
+        def run_sequence(frame):
+            for statement in statements:
+                result = statement(frame)
+                if result is not None:
+                    return result
+            return None
+        return run_sequence
+
+    def expression_statement(self, expression: ExprFn) -> StmtFn:
+        def run_expression(frame):
+            expression(frame)
+        return run_expression
+
+    def statement(self, stmt: Stmt) -> StmtFn:
+        match stmt:
+            case Block():
+                body = self.sequence([self.statement(s) for s in stmt.statements])
+                size = stmt.frame_size
+                if not size:
+                    return body
+
+                def run_block(frame):
+                    return body(new_frame(frame, size))
+                return run_block
+            case Expression():
+                return self.expression_statement(self.expression(stmt.expression))
+            case Function():
+                declaration = stmt
+                body = self.sequence([self.statement(s) for s in stmt.body])
+                define = self.definer(stmt.slot, stmt.name)
+                memo = self.interpreter.memo_cache(stmt)
+
+                def declare_function(frame):
+                    define(frame, CompiledFunction(declaration, body, frame, memo))
+                return declare_function
+            case If():
+                condition = self.expression(stmt.condition)
+                then_branch = self.statement(stmt.then_branch)
+                if stmt.else_branch is None:
+                    def run_if(frame):
+                        value = condition(frame)
+                        if value is not None and value is not False:
+                            return then_branch(frame)
+                        return None
+                    return run_if
+
+                else_branch = self.statement(stmt.else_branch)
+
+                def run_if_else(frame):
+                    value = condition(frame)
+                    if value is not None and value is not False:
+                        return then_branch(frame)
+                    return else_branch(frame)
+                return run_if_else
+            case Print():
+                expression = self.expression(stmt.expression)
+                print_function = self.interpreter.print_function
+
+                def run_print(frame):
+                    print_function(expression(frame))
+                return run_print
+            case Return():
+                if stmt.tail_call:
+                    return self.tail_call(stmt.value)
+                if not stmt.value:
+                    return lambda frame: (None,)
+                value = self.expression(stmt.value)
+                return lambda frame: (value(frame),)
+            case Var():
+                define = self.definer(stmt.slot, stmt.name)
+                if not stmt.initializer:
+                    return lambda frame: define(frame, None)
+                initializer = self.expression(stmt.initializer)
+
+                def run_var(frame):
+                    define(frame, initializer(frame))
+                return run_var
+            case While():
+                if stmt.counted:
+                    return self.counted_loop(stmt)
+                condition = self.expression(stmt.condition)
+                body = self.statement(stmt.body)
+
+                def run_while(frame):
+                    while True:
+                        value = condition(frame)
+                        if value is None or value is False:
+                            return None
+                        result = body(frame)
+                        if result is not None:
+                            return result
+                return run_while
+        raise RuntimeError(f"Cannot compile statement {type(stmt).__name__}.")
+
+    def counted_loop(self, loop: While) -> StmtFn:
+        """A loop the Resolver marked as counted, keeping the counter in a
+        Python local while it is a number (see Interpreter.counted_loop)"""
+        slot, comparison, limit, step, body = loop_counter(loop)
+        compare = FLOAT_OPERATIONS[comparison]
+        condition = self.expression(loop.condition)
+        limit = self.expression(limit)
+        body = self.statement(body)
+        increment = self.statement(loop.body.statements[1])
+
+        def run_counted(frame):
+            counter = frame[slot]
+            if type(counter) is float:
+                while compare(counter, float(limit(frame))):
+                    result = body(frame)
+                    if result is not None:
+                        return result
+                    counter += step
+                    frame[slot] = counter
+                return None
+            while True:
+                value = condition(frame)
+                if value is None or value is False:
+                    return None
+                result = body(frame)
+                if result is not None:
+                    return result
+                increment(frame)
+        return run_counted
+
+    def definer(self, slot: Optional[int], name: Token) -> Callable[[Optional[Frame], Any], None]:
+        if slot is None:
+            values = self.globals.values
+            lexeme = name.lexeme
+
+            def define_global(frame, value):
+                values[lexeme] = value
+            return define_global
+
+        def define_local(frame, value):
+            frame[slot] = value
+        return define_local
+
+    def expression(self, expr: Expr) -> ExprFn:
+        match expr:
+            case Array():
+                elements = [self.expression(element) for element in expr.elements]
+                return lambda frame: make_array([element(frame) for element in elements])
+            case ArrayAccess():
+                array_fn = self.expression(expr.array)
+                index_fn = self.expression(expr.index)
+
+                def array_access(frame):
+                    array = array_fn(frame)
+                    index = index_fn(frame)
+                    if not isinstance(array, ARRAY_TYPES):
+                        raise RuntimeError("Can only index into arrays.")
+                    if not isinstance(index, (int, float)):
+                        raise RuntimeError("Array index must be a number.")
+                    index = int(index)
+                    if index < 0 or index >= len(array):
+                        raise RuntimeError("Array index out of bounds.")
+                    return array.items[index] if type(array) is NumberArray else array[index]
+                return array_access
+            case ArrayAssign():
+                array_fn = self.expression(expr.array)
+                index_fn = self.expression(expr.index)
+                value_fn = self.expression(expr.value)
+
+                def array_assign(frame):
+                    array = array_fn(frame)
+                    index = index_fn(frame)
+                    if not isinstance(array, ARRAY_TYPES):
+                        raise RuntimeError("Can only index into arrays.")
+                    if not isinstance(index, (int, float)):
+                        raise RuntimeError("Array index must be a number.")
+                    index = int(index)
+                    if index < 0 or index >= len(array):
+                        raise RuntimeError("Array index out of bounds.")
+                    value = value_fn(frame)
+                    array[index] = value
+                    return value
+                return array_assign
+            case Assign():
+                return self.assignment(expr)
+            case Binary():
+                return self.binary(expr)
+            case Call():
+                return self.call(expr)
+            case Grouping():
+                return self.expression(expr.expression)
+            case Literal():
+                value = expr.value
+                return lambda frame: value
+            case Unary():
+                right = self.expression(expr.right)
+                if expr.operator.type == TokenType.MINUS:
+                    return lambda frame: -float(right(frame))
+
+                def unsupported(frame):
+                    right(frame)
+                    return None
+                return unsupported
+            case Variable():
+                return self.variable(expr)
+        raise RuntimeError(f"Cannot compile expression {type(expr).__name__}.")
+
+    def variable(self, expr: Variable) -> ExprFn:
+        slot = expr.slot
+        if expr.depth is None:
+            values = self.globals.values
+            get = self.globals.get
+            name = expr.name
+            lexeme = name.lexeme
+
+            def global_variable(frame):
+                try:
+                    return values[lexeme]
+                except KeyError:
+                    return get(name)
+            return global_variable
+        if expr.depth == 0:
+            return lambda frame: frame[slot]
+        if expr.depth == 1:
+            return lambda frame: frame[0][slot]
+        depth = expr.depth
+
+        def outer_variable(frame):
+            for _ in range(depth):
+                frame = frame[0]
+            return frame[slot]
+        return outer_variable
+
+    def assignment(self, expr: Assign) -> ExprFn:
+        value_fn = self.expression(expr.value)
+        slot = expr.slot
+        if expr.depth is None:
+            assign = self.globals.assign
+            name = expr.name
+
+            def assign_global(frame):
+                value = value_fn(frame)
+                assign(name, value)
+                return value
+            return assign_global
+        depth = expr.depth
+
+        def assign_local(frame):
+            value = value_fn(frame)
+            target = frame
+            for _ in range(depth):
+                target = target[0]
+            target[slot] = value
+            return value
+        return assign_local
+
+    def binary(self, expr: Binary) -> ExprFn:
+        left = self.expression(expr.left)
+        right = self.expression(expr.right)
+        is_equal = self.interpreter.is_equal
+
+        # Operands are always both evaluated before either is coerced, as
+        # in Interpreter.evaluate, so errors surface in the same order.
+        match expr.operator.type:
+            case TokenType.PLUS:
+                def add(frame):
+                    a = left(frame)
+                    b = right(frame)
+                    if isinstance(a, TEXT_TYPES) or isinstance(b, TEXT_TYPES):
+                        return concat(a, b)
+                    return float(a) + float(b)
+                return add
+            case TokenType.MINUS:
+                def subtract(frame):
+                    a = left(frame)
+                    b = right(frame)
+                    return float(a) - float(b)
+                return subtract
+            case TokenType.MULTIPLY:
+                def multiply(frame):
+                    a = left(frame)
+                    b = right(frame)
+                    return float(a) * float(b)
+                return multiply
+            case TokenType.DIVIDE:
+                def divide(frame):
+                    a = left(frame)
+                    b = right(frame)
+                    if float(b) == 0:
+                        raise RuntimeError("Division by zero.")
+                    return float(a) / float(b)
+                return divide
+            case TokenType.EQUALS:
+                def equal(frame):
+                    a = left(frame)
+                    return is_equal(a, right(frame))
+                return equal
+            case TokenType.NOT_EQUALS:
+                def not_equal(frame):
+                    a = left(frame)
+                    return not is_equal(a, right(frame))
+                return not_equal
+            case TokenType.GREATER:
+                def greater(frame):
+                    a = left(frame)
+                    b = right(frame)
+                    return float(a) > float(b)
+                return greater
+            case TokenType.GREATER_EQUAL:
+                def greater_equal(frame):
+                    a = left(frame)
+                    b = right(frame)
+                    return float(a) >= float(b)
+                return greater_equal
+            case TokenType.LESS:
+                def less(frame):
+                    a = left(frame)
+                    b = right(frame)
+                    return float(a) < float(b)
+                return less
+            case TokenType.LESS_EQUAL:
+                def less_equal(frame):
+                    a = left(frame)
+                    b = right(frame)
+                    return float(a) <= float(b)
+                return less_equal
+
+        def unsupported(frame):
+            left(frame)
+            right(frame)
+            return None
+        return unsupported
+
+    def call(self, expr: Call) -> ExprFn:
+        callee_fn = self.expression(expr.callee)
+        argument_fns = [self.expression(argument) for argument in expr.arguments]
+        argc = len(argument_fns)
+
+        def call(frame):
+            callee = callee_fn(frame)
+            arguments = [argument(frame) for argument in argument_fns]
+            if type(callee) is CompiledFunction:
+                if argc != callee.arity:
+                    raise RuntimeError(f"Expected {callee.arity} arguments but got {argc}.")
+                return callee.invoke(arguments)
+            if callable(callee):
+                return callee(*arguments)
+            raise RuntimeError("Can only call functions.")
+        return call
+
+    def tail_call(self, expr: Call) -> StmtFn:
+        callee_fn = self.expression(expr.callee)
+        argument_fns = [self.expression(argument) for argument in expr.arguments]
+        argc = len(argument_fns)
+
+        def tail_call(frame):
+            callee = callee_fn(frame)
+            arguments = [argument(frame) for argument in argument_fns]
+            if type(callee) is CompiledFunction:
+                if argc != callee.arity:
+                    raise RuntimeError(f"Expected {callee.arity} arguments but got {argc}.")
+                return TailCall(callee, [callee.closure, *arguments, *callee.locals])
+            if callable(callee):
+                return (callee(*arguments),)
+            raise RuntimeError("Can only call functions.")
+        return tail_call
@@ -0,0 +1,311 @@
+import math
+from enum import IntEnum
+from typing import Any, Dict, List, Optional
+from .ast import *
+from .lexer import Token, TokenType
+
+class OpCode(IntEnum):
+    CONSTANT = 0       # idx            -> push constants[idx]
+    NIL = 1            #                -> push None
+    POP = 2            #                -> discard top of stack
+    GET_GLOBAL = 3     # idx            -> push value of global constants[idx]
+    SET_GLOBAL = 4     # idx            -> assign top of stack (left in place)
+    DEFINE_GLOBAL = 5  # idx            -> pop and define global constants[idx]
+    PUSH_SCOPE = 6     # size           -> enter a new block frame
+    POP_SCOPE = 7      #                -> leave the current block frame
+    ADD = 8
+    SUBTRACT = 9
+    MULTIPLY = 10
+    DIVIDE = 11
+    EQUAL = 12
+    NOT_EQUAL = 13
+    GREATER = 14
+    GREATER_EQUAL = 15
+    LESS = 16
+    LESS_EQUAL = 17
+    NEGATE = 18
+    JUMP = 19          # target         -> continue at code[target]
+    JUMP_IF_FALSE = 20 # target         -> pop, jump when not truthy
+    CALL = 21          # argc           -> call stack[-argc - 1] with argc args
+    RETURN = 22        #                -> return top of stack to the caller
+    CLOSURE = 23       # idx            -> push a function for proto constants[idx]
+    BUILD_ARRAY = 24   # count          -> pop count values into a new array
+    INDEX_GET = 25     #                -> array, index -> array[index]
+    CHECK_INDEX = 26   #                -> validate array, index (left in place)
+    INDEX_SET = 27     #                -> array, index, value -> value
+    PRINT = 28         #                -> pop and print
+    GET_LOCAL = 29     # slot           -> push frame[slot]
+    SET_LOCAL = 30     # slot           -> frame[slot] = top (left in place)
+    DEFINE_LOCAL = 31  # slot           -> pop into frame[slot]
+    GET_OUTER = 32     # depth slot     -> push slot of the frame depth hops out
+    SET_OUTER = 33     # depth slot     -> assign that slot (left in place)
+    TAIL_CALL = 34     # argc           -> like CALL, but reuses the caller's call frame
+    LOOP = 35          # target         -> jump back to code[target] (a loop's back-edge)
+
+# Number of operands following each opcode in the flat code list
+OPERAND_COUNTS = {
+    OpCode.CONSTANT: 1,
+    OpCode.GET_GLOBAL: 1,
+    OpCode.SET_GLOBAL: 1,
+    OpCode.DEFINE_GLOBAL: 1,
+    OpCode.PUSH_SCOPE: 1,
+    OpCode.GET_LOCAL: 1,
+    OpCode.SET_LOCAL: 1,
+    OpCode.DEFINE_LOCAL: 1,
+    OpCode.GET_OUTER: 2,
+    OpCode.SET_OUTER: 2,
+    OpCode.JUMP: 1,
+    OpCode.JUMP_IF_FALSE: 1,
+    OpCode.LOOP: 1,
+    OpCode.CALL: 1,
+    OpCode.TAIL_CALL: 1,
+    OpCode.CLOSURE: 1,
+    OpCode.BUILD_ARRAY: 1,
+}
+
+BINARY_OPS = {
+    TokenType.PLUS: OpCode.ADD,
+    TokenType.MINUS: OpCode.SUBTRACT,
+    TokenType.MULTIPLY: OpCode.MULTIPLY,
+    TokenType.DIVIDE: OpCode.DIVIDE,
+    TokenType.EQUALS: OpCode.EQUAL,
+    TokenType.NOT_EQUALS: OpCode.NOT_EQUAL,
+    TokenType.GREATER: OpCode.GREATER,
+    TokenType.GREATER_EQUAL: OpCode.GREATER_EQUAL,
+    TokenType.LESS: OpCode.LESS,
+    TokenType.LESS_EQUAL: OpCode.LESS_EQUAL,
+}
+
+class Chunk:
+    """A flat sequence of opcodes and operands with its constant pool"""
+    def __init__(self):
+        self.code: List[int] = []
+        self.constants: List[Any] = []
+        self._constant_index: Dict[Any, int] = {}
+
+    def emit(self, *values: int) -> int:
+        self.code.extend(int(value) for value in values)
+        return len(self.code) - 1
+
+    def add_constant(self, value: Any) -> int:
+        # Tokens are pooled by name and plain values by type and value, so
+        # 1.0 and True never share a slot even though they compare equal.
+        # Zeros are keyed by sign too, as 0.0 == -0.0.
+        if isinstance(value, Token):
+            key = ("name", value.lexeme)
+        elif type(value) is float and value == 0:
+            key = (float, math.copysign(1, value), value)
+        else:
+            key = (type(value), value)
+        try:
+            return self._constant_index[key]
+        except (KeyError, TypeError):
+            pass
+        self.constants.append(value)
+        index = len(self.constants) - 1
+        try:
+            self._constant_index[key] = index
+        except TypeError:
+            pass
+        return index
+
+    def disassemble(self, name: str = "<script>") -> str:
+        lines = [f"== {name} =="]
+        offset = 0
+        while offset < len(self.code):
+            op = OpCode(self.code[offset])
+            count = OPERAND_COUNTS.get(op, 0)
+            operands = self.code[offset + 1:offset + 1 + count]
+            text = f"{offset:04d} {op.name:<14}"
+            if operands:
+                text += " " + " ".join(str(operand) for operand in operands)
+                if op in (OpCode.CONSTANT, OpCode.GET_GLOBAL, OpCode.SET_GLOBAL,
+                          OpCode.DEFINE_GLOBAL, OpCode.CLOSURE):
+                    constant = self.constants[operands[0]]
+                    text += f" ({constant.lexeme if isinstance(constant, Token) else constant!r})"
+            lines.append(text)
+            offset += 1 + count
+        return "\n".join(lines)
+
+class FunctionProto:
+    """Compiled form of a Function declaration"""
+    def __init__(self, name: str, params: List[Token], chunk: Chunk, frame_size: int = 0,
+                 declaration: Optional[Function] = None):
+        self.name = name
+        self.declaration = declaration
+        self.params = params
+        self.arity = len(params)
+        self.chunk = chunk
+        self.frame_size = frame_size
+
+    def __repr__(self):
+        return f"<proto {self.name}>"
+
+class Compiler:
+    """Compiles a resolved MRT program into bytecode for the VM"""
+    def __init__(self):
+        self.chunk = Chunk()
+
+    def compile(self, statements: List[Stmt]) -> FunctionProto:
+        # Mirror Interpreter.execute_program: define all top-level
+        # functions first, then either call main or run the remaining
+        # statements in order.
+        functions = [stmt for stmt in statements if isinstance(stmt, Function)]
+        for function in functions:
+            self.statement(function)
+
+        if any(function.name.lexeme == "main" for function in functions):
+            main_token = Token(TokenType.IDENTIFIER, "main", None, 1)
+            self.chunk.emit(OpCode.GET_GLOBAL, self.chunk.add_constant(main_token))
+            self.chunk.emit(OpCode.CALL, 0)
+            self.chunk.emit(OpCode.POP)
+        else:
+            for statement in statements:
+                if not isinstance(statement, Function):
+                    self.statement(statement)
+
+        self.chunk.emit(OpCode.NIL)
+        self.chunk.emit(OpCode.RETURN)
+        return FunctionProto("<script>", [], self.chunk)
+
+    def compile_statements(self, statements: List[Stmt]) -> FunctionProto:
+        """Compile statements to run in order, with no main() handling"""
+        for statement in statements:
+            self.statement(statement)
+        self.chunk.emit(OpCode.NIL)
+        self.chunk.emit(OpCode.RETURN)
+        return FunctionProto("<script>", [], self.chunk)
+
+    def compile_function(self, stmt: Function) -> FunctionProto:
+        compiler = Compiler()
+        for statement in stmt.body:
+            compiler.statement(statement)
+        compiler.chunk.emit(OpCode.NIL)
+        compiler.chunk.emit(OpCode.RETURN)
+        return FunctionProto(stmt.name.lexeme, stmt.params, compiler.chunk, stmt.frame_size, stmt)
+
+    def statement(self, stmt: Stmt):
+        chunk = self.chunk
+        match stmt:
+            case Block():
+                if stmt.frame_size:
+                    chunk.emit(OpCode.PUSH_SCOPE, stmt.frame_size)
+                for statement in stmt.statements:
+                    self.statement(statement)
+                if stmt.frame_size:
+                    chunk.emit(OpCode.POP_SCOPE)
+            case Expression():
+                self.expression(stmt.expression)
+                chunk.emit(OpCode.POP)
+            case Function():
+                proto = self.compile_function(stmt)
+                chunk.emit(OpCode.CLOSURE, chunk.add_constant(proto))
+                self.define(stmt.slot, stmt.name)
+            case If():
+                self.expression(stmt.condition)
+                else_jump = chunk.emit(OpCode.JUMP_IF_FALSE, 0)
+                self.statement(stmt.then_branch)
+                if stmt.else_branch:
+                    end_jump = chunk.emit(OpCode.JUMP, 0)
+                    self.patch_jump(else_jump)
+                    self.statement(stmt.else_branch)
+                    self.patch_jump(end_jump)
+                else:
+                    self.patch_jump(else_jump)
+            case Print():
+                self.expression(stmt.expression)
+                chunk.emit(OpCode.PRINT)
+            case Return():
+                if stmt.tail_call:
+                    call = stmt.value
+                    self.expression(call.callee)
+                    for argument in call.arguments:
+                        self.expression(argument)
+                    # Native callees leave their result for the RETURN
+                    chunk.emit(OpCode.TAIL_CALL, len(call.arguments))
+                elif stmt.value:
+                    self.expression(stmt.value)
+                else:
+                    chunk.emit(OpCode.NIL)
+                chunk.emit(OpCode.RETURN)
+            case Var():
+                if stmt.initializer:
+                    self.expression(stmt.initializer)
+                else:
+                    chunk.emit(OpCode.NIL)
+                self.define(stmt.slot, stmt.name)
+            case While():
+                loop_start = len(chunk.code)
+                self.expression(stmt.condition)
+                exit_jump = chunk.emit(OpCode.JUMP_IF_FALSE, 0)
+                self.statement(stmt.body)
+                chunk.emit(OpCode.LOOP, loop_start)
+                self.patch_jump(exit_jump)
+
+    def expression(self, expr: Expr):
+        chunk = self.chunk
+        match expr:
+            case Array():
+                for element in expr.elements:
+                    self.expression(element)
+                chunk.emit(OpCode.BUILD_ARRAY, len(expr.elements))
+            case ArrayAccess():
+                self.expression(expr.array)
+                self.expression(expr.index)
+                chunk.emit(OpCode.INDEX_GET)
+            case ArrayAssign():
+                self.expression(expr.array)
+                self.expression(expr.index)
+                # Bounds are checked before the value is evaluated, as in
+                # the tree-walking interpreter.
+                chunk.emit(OpCode.CHECK_INDEX)
+                self.expression(expr.value)
+                chunk.emit(OpCode.INDEX_SET)
+            case Assign():
+                self.expression(expr.value)
+                if expr.depth is None:
+                    chunk.emit(OpCode.SET_GLOBAL, chunk.add_constant(expr.name))
+                elif expr.depth == 0:
+                    chunk.emit(OpCode.SET_LOCAL, expr.slot)
+                else:
+                    chunk.emit(OpCode.SET_OUTER, expr.depth, expr.slot)
+            case Binary():
+                self.expression(expr.left)
+                self.expression(expr.right)
+                op = BINARY_OPS.get(expr.operator.type)
+                if op is None:
+                    raise RuntimeError(f"Unsupported operator '{expr.operator.lexeme}'.")
+                chunk.emit(op)
+            case Call():
+                self.expression(expr.callee)
+                for argument in expr.arguments:
+                    self.expression(argument)
+                chunk.emit(OpCode.CALL, len(expr.arguments))
+            case Grouping():
+                self.expression(expr.expression)
+            case Literal():
+                if expr.value is None:
+                    chunk.emit(OpCode.NIL)
+                else:
+                    chunk.emit(OpCode.CONSTANT, chunk.add_constant(expr.value))
+            case Unary():
+                self.expression(expr.right)
+                if expr.operator.type != TokenType.MINUS:
+                    raise RuntimeError(f"Unsupported operator '{expr.operator.lexeme}'.")
+                chunk.emit(OpCode.NEGATE)
+            case Variable():
+                if expr.depth is None:
+                    chunk.emit(OpCode.GET_GLOBAL, chunk.add_constant(expr.name))
+                elif expr.depth == 0:
+                    chunk.emit(OpCode.GET_LOCAL, expr.slot)
+                else:
+                    chunk.emit(OpCode.GET_OUTER, expr.depth, expr.slot)
+
+    def define(self, slot: Optional[int], name: Token):
+        if slot is None:
+            self.chunk.emit(OpCode.DEFINE_GLOBAL, self.chunk.add_constant(name))
+        else:
+            self.chunk.emit(OpCode.DEFINE_LOCAL, slot)
+
+    def patch_jump(self, operand_offset: int):
+        self.chunk.code[operand_offset] = len(self.chunk.code)
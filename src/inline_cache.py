@@ -0,0 +1,103 @@
+import operator
+from typing import Any, Callable, Dict, Iterable, Optional
+from .lexer import TokenType
+from .strings import TEXT_TYPES, concat
+
+def divide(left: float, right: float) -> float:
+    if right == 0:
+        raise RuntimeError("Division by zero.")
+    return left / right
+
+# What a Binary node computes when both operands are floats, which
+# needs none of the float() coercions of the generic path
+FLOAT_OPERATIONS: Dict[TokenType, Callable] = {
+    TokenType.PLUS: operator.add,
+    TokenType.MINUS: operator.sub,
+    TokenType.MULTIPLY: operator.mul,
+    TokenType.DIVIDE: divide,
+    TokenType.GREATER: operator.gt,
+    TokenType.GREATER_EQUAL: operator.ge,
+    TokenType.LESS: operator.lt,
+    TokenType.LESS_EQUAL: operator.le,
+}
+
+def binary_operation(operator_type: TokenType, left: type, right: type) -> Optional[Callable]:
+    """The function computing a Binary node for operands of these types,
+    or None when only the generic path knows how"""
+    # Python's == gives Interpreter.is_equal's result for any two values
+    if operator_type == TokenType.EQUALS:
+        return operator.eq
+    if operator_type == TokenType.NOT_EQUALS:
+        return operator.ne
+    if left is float and right is float:
+        return FLOAT_OPERATIONS.get(operator_type)
+    if operator_type == TokenType.PLUS and (issubclass(left, TEXT_TYPES) or issubclass(right, TEXT_TYPES)):
+        return concat
+    return None
+
+class InlineCache:
+    """Type feedback for one Binary or Call node, kept by the interpreter
+    evaluating it (Interpreter.inline_caches).
+
+    The first evaluation that misses fills in `entry`: (left type, right
+    type, operation) for a Binary node, the callee's Function declaration
+    or the builtin called for a Call node. While later evaluations see the
+    same types or callee (a monomorphic site), the interpreter takes a
+    fast path using the entry. The first evaluation that doesn't makes
+    the site polymorphic, and it takes the generic path from then on.
+    Sites whose first values have no fast path stay generic.
+
+    The cache holds on to its node, as caches are looked up by node id: a
+    node freed while its cache lived on (interpret_stream frees statements
+    once they have run) could otherwise hand its id, and its entry, to a
+    new node.
+    """
+    __slots__ = ("node", "line", "site", "entry", "state", "hits", "misses")
+
+    def __init__(self, node: Any, line: int, site: str):
+        self.node = node
+        self.line = line
+        self.site = site
+        self.entry: Any = None
+        self.state = "uninitialized"
+        self.hits = 0
+        self.misses = 0
+
+    def miss(self, entry: Any):
+        """Record an evaluation that took the generic path; `entry` is what
+        the values just seen would have cached (None if nothing)"""
+        self.misses += 1
+        if self.state == "uninitialized":
+            self.entry = entry
+            self.state = "generic" if entry is None else "monomorphic"
+        elif self.state == "monomorphic":
+            self.entry = None
+            self.state = "polymorphic"
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "line": self.line,
+            "site": self.site,
+            "state": self.state,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+def format_cache_stats(caches: Iterable[InlineCache], limit: Optional[int] = None) -> str:
+    """A table of the most evaluated sites, after an overall hit rate"""
+    caches = sorted(caches, key=lambda cache: cache.hits + cache.misses, reverse=True)
+    hits = sum(cache.hits for cache in caches)
+    total = hits + sum(cache.misses for cache in caches)
+    columns = ["line", "site", "state", "hits", "misses", "hit rate"]
+    rows = [[str(stats["line"]), stats["site"], stats["state"], str(stats["hits"]),
+             str(stats["misses"]), f"{stats['hit_rate']:.1%}"]
+            for stats in (cache.stats() for cache in caches[:limit])]
+    widths = [max(len(column), *(len(row[i]) for row in rows)) for i, column in enumerate(columns)]
+    lines = [f"inline caches: {len(caches)} sites, {hits} of {total} evaluations hit "
+             f"({hits / total if total else 0:.1%})"]
+    lines += ["  ".join(cell.ljust(width) if i in (1, 2) else cell.rjust(width)
+                        for i, (cell, width) in enumerate(zip(row, widths))).rstrip()
+              for row in [columns] + rows]
+    return "\n".join(lines)
@@ -1,30 +1,70 @@
-from typing import Any, Dict, List, Optional
+import queue
+import threading
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+from .arrays import ARRAY_TYPES, NumberArray, make_array
 from .ast import *
+from .bulk import BulkBuiltins
+from .inline_cache import FLOAT_OPERATIONS, InlineCache, binary_operation
 from .lexer import Token, TokenType
+from .memo import MemoCache
+from .output import OutputSink
+from .purity import mark_pure_functions
+from .resolver import Resolver, loop_counter
+from .strings import TEXT_TYPES, concat, flatten
+
+# Local scopes are compact lists laid out as [enclosing, slot1, slot2, ...]
+# with slots assigned by the Resolver. None stands for the global scope,
+# which stays a name-keyed Environment.
+Frame = List[Any]
+
+def new_frame(enclosing: Optional[Frame], size: int) -> Frame:
+    frame = [None] * (size + 1)
+    frame[0] = enclosing
+    return frame
 
 class MRTFunction:
-    def __init__(self, declaration: Function, closure: 'Environment'):
+    def __init__(self, declaration: Function, closure: Optional[Frame],
+                 memo: Optional[MemoCache] = None):
         self.declaration = declaration
         self.closure = closure
+        self.memo = memo
+        # Everything a call needs is looked up once here instead of per call
+        self.body = declaration.body
+        self.arity = len(declaration.params)
+        self.locals = [None] * (declaration.frame_size - self.arity)
 
     def call(self, interpreter: 'Interpreter', arguments: List[Any]) -> Any:
-        environment = Environment(self.closure)
-        for param, arg in zip(self.declaration.params, arguments):
-            environment.define(param.lexeme, arg)
-
-        try:
-            interpreter.execute_block(self.declaration.body, environment)
-            return None
-        except Return as return_value:
-            return return_value.value
+        return self.invoke(interpreter, [self.closure, *arguments, *self.locals])
+
+    def invoke(self, interpreter: 'Interpreter', frame: Frame) -> Any:
+        """Run the body in a frame already holding the closure and arguments"""
+        if self.memo is not None:
+            return self.memo.call(frame[1:self.arity + 1], lambda: self.run(interpreter, frame))
+        return self.run(interpreter, frame)
+
+    def run(self, interpreter: 'Interpreter', frame: Frame) -> Any:
+        # Tail calls are run in place and skip the callee's memo cache, so
+        # they never grow the Python stack.
+        function = self
+        while True:
+            result = interpreter.execute_block(function.body, frame)
+            if type(result) is not TailCall:
+                return result[0] if result else None
+            # The body ended in `return g(...)`: run g here instead of
+            # nesting another Python call, so tail recursion uses no stack.
+            function, frame = result.function, result.frame
 
     def __str__(self):
         return f"<function {self.declaration.name.lexeme}>"
 
-class Return(Exception):
-    def __init__(self, value: Any):
-        self.value = value
-        super().__init__()
+class TailCall:
+    """Returned by a `return f(...)` in tail position instead of a (value,)
+    tuple: the caller's invoke() loop runs the call in place."""
+    __slots__ = ("function", "frame")
+
+    def __init__(self, function: Any, frame: Frame):
+        self.function = function
+        self.frame = frame
 
 class Environment:
     def __init__(self, enclosing: Optional['Environment'] = None):
@@ -59,7 +99,7 @@ class MRTBuiltin:
     def len(*args):
         if len(args) != 1:
             raise RuntimeError("len() takes exactly one argument.")
-        if not isinstance(args[0], list):
+        if not isinstance(args[0], ARRAY_TYPES):
             raise RuntimeError("len() argument must be an array.")
         return float(len(args[0]))
 
@@ -67,16 +107,19 @@ class MRTBuiltin:
     def push(*args):
         if len(args) != 2:
             raise RuntimeError("push() takes exactly two arguments.")
-        if not isinstance(args[0], list):
+        if not isinstance(args[0], ARRAY_TYPES):
             raise RuntimeError("First argument to push() must be an array.")
-        args[0].append(args[1])
+        if type(args[0]) is NumberArray and type(args[1]) is float:
+            args[0].items.append(args[1])
+        else:
+            args[0].append(args[1])
         return args[1]
 
     @staticmethod
     def pop(*args):
         if len(args) != 1:
             raise RuntimeError("pop() takes exactly one argument.")
-        if not isinstance(args[0], list):
+        if not isinstance(args[0], ARRAY_TYPES):
             raise RuntimeError("pop() argument must be an array.")
         if not args[0]:
             raise RuntimeError("Cannot pop from empty array.")
@@ -86,7 +129,7 @@ class MRTBuiltin:
     def slice(*args):
         if len(args) not in [2, 3]:
             raise RuntimeError("slice() takes 2 or 3 arguments.")
-        if not isinstance(args[0], list):
+        if not isinstance(args[0], ARRAY_TYPES):
             raise RuntimeError("First argument to slice() must be an array.")
         
         arr = args[0]
@@ -104,7 +147,7 @@ class MRTBuiltin:
     def join(*args):
         if len(args) not in [1, 2]:
             raise RuntimeError("join() takes 1 or 2 arguments.")
-        if not isinstance(args[0], list):
+        if not isinstance(args[0], ARRAY_TYPES):
             raise RuntimeError("First argument to join() must be an array.")
             
         separator = str(args[1]) if len(args) > 1 else ""
@@ -114,7 +157,7 @@ class MRTBuiltin:
     def indexOf(*args):
         if len(args) != 2:
             raise RuntimeError("indexOf() takes exactly 2 arguments.")
-        if not isinstance(args[0], list):
+        if not isinstance(args[0], ARRAY_TYPES):
             raise RuntimeError("First argument to indexOf() must be an array.")
             
         try:
@@ -124,6 +167,7 @@ class MRTBuiltin:
 
     @staticmethod
     def split(*args):
+        args = flatten(args)
         if len(args) not in [1, 2]:
             raise RuntimeError("split() takes 1 or 2 arguments.")
         if not isinstance(args[0], str):
@@ -134,6 +178,7 @@ class MRTBuiltin:
 
     @staticmethod
     def substring(*args):
+        args = flatten(args)
         if len(args) not in [2, 3]:
             raise RuntimeError("substring() takes 2 or 3 arguments.")
         if not isinstance(args[0], str):
@@ -152,6 +197,7 @@ class MRTBuiltin:
 
     @staticmethod
     def toUpper(*args):
+        args = flatten(args)
         if len(args) != 1:
             raise RuntimeError("toUpper() takes exactly one argument.")
         if not isinstance(args[0], str):
@@ -160,6 +206,7 @@ class MRTBuiltin:
 
     @staticmethod
     def toLower(*args):
+        args = flatten(args)
         if len(args) != 1:
             raise RuntimeError("toLower() takes exactly one argument.")
         if not isinstance(args[0], str):
@@ -168,6 +215,7 @@ class MRTBuiltin:
 
     @staticmethod
     def trim(*args):
+        args = flatten(args)
         if len(args) != 1:
             raise RuntimeError("trim() takes exactly one argument.")
         if not isinstance(args[0], str):
@@ -176,6 +224,7 @@ class MRTBuiltin:
 
     @staticmethod
     def replace(*args):
+        args = flatten(args)
         if len(args) != 3:
             raise RuntimeError("replace() takes exactly 3 arguments.")
         if not isinstance(args[0], str):
@@ -184,6 +233,7 @@ class MRTBuiltin:
 
     @staticmethod
     def startsWith(*args):
+        args = flatten(args)
         if len(args) != 2:
             raise RuntimeError("startsWith() takes exactly 2 arguments.")
         if not isinstance(args[0], str):
@@ -192,6 +242,7 @@ class MRTBuiltin:
 
     @staticmethod
     def endsWith(*args):
+        args = flatten(args)
         if len(args) != 2:
             raise RuntimeError("endsWith() takes exactly 2 arguments.")
         if not isinstance(args[0], str):
@@ -200,6 +251,7 @@ class MRTBuiltin:
 
     @staticmethod
     def contains(*args):
+        args = flatten(args)
         if len(args) != 2:
             raise RuntimeError("contains() takes exactly 2 arguments.")
         if not isinstance(args[0], str):
@@ -207,13 +259,31 @@ class MRTBuiltin:
         return str(args[1]) in args[0]
 
 class Interpreter:
-    def __init__(self):
+    def __init__(self, compile_closures: bool = False, memo_size: int = 0,
+                 output_sink: Optional[OutputSink] = None, jit: bool = False):
+        # When set, programs are compiled to closures up front instead of
+        # being walked node by node.
+        self.compile_closures = compile_closures
+        # With memo_size > 0, results of pure functions are cached (LRU)
+        self.memo_size = memo_size
+        self.memo_caches: Dict[int, MemoCache] = {}
+        # Inline caches of the Binary and Call nodes this interpreter has
+        # evaluated, by node id. Kept here rather than on the nodes, which
+        # interpreters running the same program share.
+        self.inline_caches: Dict[int, InlineCache] = {}
         self.globals = Environment()
-        self.environment = self.globals
-        self.output = []  # Capture output for web playground
+        self.environment: Optional[Frame] = None
+        # Printed lines are buffered, captured and streamed by the sink
+        self.output_sink = output_sink or OutputSink()
+        # Message of the runtime error that ended the last run, if any
+        self.error: Optional[str] = None
+        # With jit set, hot while loops are compiled to Python (see jit.py)
+        self.jit = None
+        if jit:
+            from .jit import LoopJIT
+            self.jit = LoopJIT(self)
         
         # Add built-in functions
-        self.globals.define("print", self.print_function)
         self.globals.define("len", MRTBuiltin.len)
         self.globals.define("push", MRTBuiltin.push)
         self.globals.define("pop", MRTBuiltin.pop)
@@ -230,109 +300,284 @@ class Interpreter:
         self.globals.define("startsWith", MRTBuiltin.startsWith)
         self.globals.define("endsWith", MRTBuiltin.endsWith)
         self.globals.define("contains", MRTBuiltin.contains)
+        # Add print and the bulk array functions
+        self.globals.values.update(self.bound_builtins())
+
+    def bound_builtins(self) -> Dict[str, Callable]:
+        """The builtins that are methods of this interpreter or its
+        BulkBuiltins, so each interpreter needs its own"""
+        bulk = BulkBuiltins(self)
+        return {
+            "print": self.print_function,
+            "map": bulk.map,
+            "filter": bulk.filter,
+            "reduce": bulk.reduce,
+            "sum": bulk.sum,
+            "min": bulk.min,
+            "max": bulk.max,
+            "sort": bulk.sort,
+        }
+
+    def clone(self, output_sink: Optional[OutputSink] = None) -> 'Interpreter':
+        """A new interpreter with this one's settings and a shallow copy of
+        its globals, made without running __init__ (see snapshot.py)"""
+        clone = object.__new__(type(self))
+        clone.__dict__.update(self.__dict__)
+        clone.memo_caches = {}
+        clone.inline_caches = {}
+        clone.globals = Environment()
+        clone.globals.values = values = self.globals.values.copy()
+        clone.environment = None
+        clone.output_sink = output_sink or OutputSink()
+        clone.error = None
+        if self.jit is not None:
+            from .jit import LoopJIT
+            clone.jit = LoopJIT(clone)
+
+        # The clone's own print, map... unless a program replaced them
+        for name, function in clone.bound_builtins().items():
+            owner = getattr(values.get(name), "__self__", None)
+            if owner is self or getattr(owner, "interpreter", None) is self:
+                values[name] = function
+        return clone
 
     def print_function(self, *args):
         """Custom print function that captures output"""
-        output_str = " ".join(str(arg) for arg in args)
-        self.output.append(output_str)
-        print(output_str)  # Also print to console for local execution
+        self.output_sink.write(" ".join(str(arg) for arg in args))
+
+    @property
+    def output(self) -> List[str]:
+        """Captured output lines (see OutputSink for limits)"""
+        return self.output_sink.lines
 
     def get_output(self):
         """Get captured output for web playground"""
-        return "\n".join(self.output)
+        return self.output_sink.text()
 
     def clear_output(self):
         """Clear captured output"""
-        self.output = []
+        self.output_sink.clear()
 
     def interpret(self, statements: List[Stmt]):
+        self.error = None
+        try:
+            self.clear_output()
+            Resolver().resolve(statements)
+            if self.memo_size:
+                mark_pure_functions(statements)
+            self.execute_program(statements)
+        except Exception as e:
+            self.error = str(e)
+            error_msg = f"Runtime Error: {str(e)}"
+            self.output_sink.write(error_msg)
+        finally:
+            self.output_sink.flush()
+
+    def interpret_stream(self, statements: Iterable[Stmt]):
+        """Execute top-level declarations one by one as they are produced.
+
+        Meant for Parser.declarations(), so execution starts before the
+        whole file is parsed and finished statements can be freed. Unlike
+        interpret(), top-level statements run in source order as they
+        arrive, and main() (if declared) is called after the last one.
+        """
+        self.error = None
         try:
             self.clear_output()
-            # First pass: define all functions
+            resolver = Resolver()
             for statement in statements:
-                if isinstance(statement, Function):
-                    self.execute(statement)
-            
-            # Second pass: look for and execute main function
-            main_func = None
-            try:
+                resolver.resolve([statement])
+                if self.execute_top_level(statement):
+                    return
+
+            if isinstance(self.globals.values.get("main"), self.function_types()):
                 main_token = Token(TokenType.IDENTIFIER, "main", None, 1)
-                main_func = self.environment.get(main_token)
-            except RuntimeError:
-                pass
-            
-            if main_func and isinstance(main_func, MRTFunction):
-                main_func.call(self, [])
-            else:
-                # If no main function, execute all non-function statements
-                for statement in statements:
-                    if not isinstance(statement, Function):
-                        self.execute(statement)
-                        
+                self.execute_top_level(Expression(Call(Variable(main_token), None, [])))
         except Exception as e:
+            self.error = str(e)
             error_msg = f"Runtime Error: {str(e)}"
-            self.output.append(error_msg)
-            print(error_msg)
+            self.output_sink.write(error_msg)
+        finally:
+            self.output_sink.flush()
+
+    def iter_output(self, statements: List[Stmt]) -> Iterator[str]:
+        """Run interpret(statements) on a background thread and yield the
+        output in chunks as the sink writes them, while the program runs"""
+        chunks: queue.Queue = queue.Queue()
+        finished = object()
 
-    def execute(self, stmt: Stmt):
+        def run():
+            try:
+                self.interpret(statements)
+            finally:
+                chunks.put(finished)
+
+        self.output_sink.subscribe(chunks.put)
+        try:
+            thread = threading.Thread(target=run, daemon=True)
+            thread.start()
+            while (chunk := chunks.get()) is not finished:
+                yield chunk
+            thread.join()
+        finally:
+            self.output_sink.unsubscribe(chunks.put)
+
+    def execute_top_level(self, statement: Stmt) -> Optional[tuple]:
+        """Run one top-level statement; a (value,) result means it returned"""
+        if self.compile_closures:
+            from .closures import ClosureCompiler
+            return ClosureCompiler(self).statement(statement)(None)
+        return self.execute(statement)
+
+    def memo_cache(self, declaration: Function) -> Optional[MemoCache]:
+        """The result cache shared by every closure of a pure function, or
+        None when memoization is off or the function isn't pure"""
+        if not (self.memo_size and declaration.pure):
+            return None
+        cache = self.memo_caches.get(id(declaration))
+        if cache is None:
+            cache = MemoCache(declaration.name.lexeme, self.memo_size)
+            self.memo_caches[id(declaration)] = cache
+        return cache
+
+    def function_types(self) -> tuple:
+        """Classes of the MRT function values this engine creates"""
+        if self.compile_closures:
+            from .closures import CompiledFunction
+            return (CompiledFunction,)
+        return (MRTFunction,)
+
+    def execute_program(self, statements: List[Stmt]):
+        if self.compile_closures:
+            from .closures import ClosureCompiler
+            ClosureCompiler(self).compile_program(statements)()
+            return
+
+        # First pass: define all functions
+        for statement in statements:
+            if isinstance(statement, Function):
+                self.execute(statement)
+
+        # Second pass: look for and execute main function
+        main_func = None
+        try:
+            main_token = Token(TokenType.IDENTIFIER, "main", None, 1)
+            main_func = self.globals.get(main_token)
+        except RuntimeError:
+            pass
+
+        if main_func and isinstance(main_func, MRTFunction):
+            main_func.call(self, [])
+        else:
+            # If no main function, execute all non-function statements
+            for statement in statements:
+                if not isinstance(statement, Function) and self.execute(statement):
+                    return
+
+    def execute(self, stmt: Stmt) -> Optional[tuple]:
+        """Execute a statement. Returns None to carry on, or a one-tuple
+        holding the value when a return statement ran, so returns unwind
+        through ordinary Python returns instead of exceptions."""
         match stmt:
             case Block():
-                self.execute_block(stmt.statements, Environment(self.environment))
+                if stmt.frame_size:
+                    return self.execute_block(stmt.statements, new_frame(self.environment, stmt.frame_size))
+                for statement in stmt.statements:
+                    result = self.execute(statement)
+                    if result:
+                        return result
             case Expression():
                 self.evaluate(stmt.expression)
             case Function():
-                function = MRTFunction(stmt, self.environment)
-                self.environment.define(stmt.name.lexeme, function)
+                function = MRTFunction(stmt, self.environment, self.memo_cache(stmt))
+                self.define(stmt.slot, stmt.name, function)
             case If():
                 if self.is_truthy(self.evaluate(stmt.condition)):
-                    self.execute(stmt.then_branch)
+                    return self.execute(stmt.then_branch)
                 elif stmt.else_branch:
-                    self.execute(stmt.else_branch)
+                    return self.execute(stmt.else_branch)
             case Print():
                 value = self.evaluate(stmt.expression)
                 self.print_function(value)
             case Return():
+                if stmt.tail_call:
+                    call = stmt.value
+                    callee = self.evaluate(call.callee)
+                    if type(callee) is MRTFunction:
+                        return TailCall(callee, self.bind_arguments(callee, call.arguments))
+                    return (self.call_native(callee, call.arguments),)
                 value = None
                 if stmt.value:
                     value = self.evaluate(stmt.value)
-                raise Return(value)
+                return (value,)
             case Var():
                 value = None
                 if stmt.initializer:
                     value = self.evaluate(stmt.initializer)
-                self.environment.define(stmt.name.lexeme, value)
+                self.define(stmt.slot, stmt.name, value)
             case While():
-                while self.is_truthy(self.evaluate(stmt.condition)):
-                    self.execute(stmt.body)
-
-    def execute_block(self, statements: List[Stmt], environment: Environment):
+                if self.jit is not None:
+                    return self.jit.run(stmt)
+                if stmt.counted:
+                    return self.counted_loop(stmt)
+                return self.while_loop(stmt)
+
+    def while_loop(self, loop: While) -> Optional[tuple]:
+        while self.is_truthy(self.evaluate(loop.condition)):
+            result = self.execute(loop.body)
+            if result:
+                return result
+
+    def counted_loop(self, loop: While) -> Optional[tuple]:
+        """Run a loop the Resolver marked as counted. Only the increment
+        assigns the counter, so while it is a number it can live in a
+        Python local, stepped and compared natively, and is just stored
+        to its slot each iteration for the body to read."""
+        slot, comparison, limit, step, body = loop_counter(loop)
+        frame = self.environment
+        counter = frame[slot]
+        if type(counter) is not float:
+            return self.while_loop(loop)
+        compare = FLOAT_OPERATIONS[comparison]
+        evaluate = self.evaluate
+        execute = self.execute
+        while compare(counter, float(evaluate(limit))):
+            result = execute(body)
+            if result:
+                return result
+            counter += step
+            frame[slot] = counter
+
+    def execute_block(self, statements: List[Stmt], frame: Frame) -> Optional[tuple]:
         previous = self.environment
         try:
-            self.environment = environment
+            self.environment = frame
             for statement in statements:
-                self.execute(statement)
+                result = self.execute(statement)
+                if result:
+                    return result
         finally:
             self.environment = previous
 
     def evaluate(self, expr: Expr) -> Any:
         match expr:
             case Array():
-                return [self.evaluate(element) for element in expr.elements]
+                return make_array([self.evaluate(element) for element in expr.elements])
             case ArrayAccess():
                 array = self.evaluate(expr.array)
                 index = self.evaluate(expr.index)
-                if not isinstance(array, list):
+                if not isinstance(array, ARRAY_TYPES):
                     raise RuntimeError("Can only index into arrays.")
                 if not isinstance(index, (int, float)):
                     raise RuntimeError("Array index must be a number.")
                 index = int(index)
                 if index < 0 or index >= len(array):
                     raise RuntimeError("Array index out of bounds.")
-                return array[index]
+                return array.items[index] if type(array) is NumberArray else array[index]
             case ArrayAssign():
                 array = self.evaluate(expr.array)
                 index = self.evaluate(expr.index)
-                if not isinstance(array, list):
+                if not isinstance(array, ARRAY_TYPES):
                     raise RuntimeError("Can only index into arrays.")
                 if not isinstance(index, (int, float)):
                     raise RuntimeError("Array index must be a number.")
@@ -344,45 +589,38 @@ class Interpreter:
                 return value
             case Assign():
                 value = self.evaluate(expr.value)
-                self.environment.assign(expr.name, value)
+                if expr.depth is None:
+                    self.globals.assign(expr.name, value)
+                else:
+                    frame = self.environment
+                    for _ in range(expr.depth):
+                        frame = frame[0]
+                    frame[expr.slot] = value
                 return value
             case Binary():
                 left = self.evaluate(expr.left)
                 right = self.evaluate(expr.right)
-
-                match expr.operator.type:
-                    case TokenType.PLUS:
-                        # Handle string concatenation
-                        if isinstance(left, str) or isinstance(right, str):
-                            return str(left) + str(right)
-                        return float(left) + float(right)
-                    case TokenType.MINUS:
-                        return float(left) - float(right)
-                    case TokenType.MULTIPLY:
-                        return float(left) * float(right)
-                    case TokenType.DIVIDE:
-                        if float(right) == 0:
-                            raise RuntimeError("Division by zero.")
-                        return float(left) / float(right)
-                    case TokenType.EQUALS:
-                        return self.is_equal(left, right)
-                    case TokenType.GREATER:
-                        return float(left) > float(right)
-                    case TokenType.LESS:
-                        return float(left) < float(right)
+                cache = self.inline_caches.get(id(expr))
+                if cache is not None:
+                    entry = cache.entry
+                    if entry is not None and type(left) is entry[0] and type(right) is entry[1]:
+                        cache.hits += 1
+                        return entry[2](left, right)
+                return self.binary(expr, left, right)
             case Call():
                 callee = self.evaluate(expr.callee)
-                arguments = [self.evaluate(arg) for arg in expr.arguments]
-                
-                if isinstance(callee, MRTFunction):
-                    if len(arguments) != len(callee.declaration.params):
-                        raise RuntimeError(f"Expected {len(callee.declaration.params)} arguments but got {len(arguments)}.")
-                    return callee.call(self, arguments)
-                
-                if callable(callee):
-                    return callee(*arguments)
-                    
-                raise RuntimeError("Can only call functions.")
+                cache = self.inline_caches.get(id(expr))
+                if cache is not None and (entry := cache.entry) is not None:
+                    # Arity was checked when the callee was cached
+                    if type(callee) is MRTFunction:
+                        if callee.declaration is entry:
+                            cache.hits += 1
+                            return callee.invoke(self, [callee.closure, *map(self.evaluate, expr.arguments),
+                                                        *callee.locals])
+                    elif callee is entry:
+                        cache.hits += 1
+                        return callee(*map(self.evaluate, expr.arguments))
+                return self.call(expr, callee)
             case Grouping():
                 return self.evaluate(expr.expression)
             case Literal():
@@ -393,7 +631,102 @@ class Interpreter:
                 if expr.operator.type == TokenType.MINUS:
                     return -float(right)
             case Variable():
-                return self.environment.get(expr.name)
+                if expr.depth is None:
+                    return self.globals.get(expr.name)
+                frame = self.environment
+                for _ in range(expr.depth):
+                    frame = frame[0]
+                return frame[expr.slot]
+
+    def binary(self, expr: Binary, left: Any, right: Any) -> Any:
+        """Evaluate a Binary node the generic way, updating its inline cache"""
+        operator_type = expr.operator.type
+        cache = self.inline_caches.get(id(expr))
+        if cache is None:
+            cache = InlineCache(expr, expr.operator.line, expr.operator.lexeme)
+            self.inline_caches[id(expr)] = cache
+        operation = binary_operation(operator_type, type(left), type(right))
+        cache.miss(None if operation is None else (type(left), type(right), operation))
+
+        match operator_type:
+            case TokenType.PLUS:
+                # Handle string concatenation
+                if isinstance(left, TEXT_TYPES) or isinstance(right, TEXT_TYPES):
+                    return concat(left, right)
+                return float(left) + float(right)
+            case TokenType.MINUS:
+                return float(left) - float(right)
+            case TokenType.MULTIPLY:
+                return float(left) * float(right)
+            case TokenType.DIVIDE:
+                if float(right) == 0:
+                    raise RuntimeError("Division by zero.")
+                return float(left) / float(right)
+            case TokenType.EQUALS:
+                return self.is_equal(left, right)
+            case TokenType.NOT_EQUALS:
+                return not self.is_equal(left, right)
+            case TokenType.GREATER:
+                return float(left) > float(right)
+            case TokenType.GREATER_EQUAL:
+                return float(left) >= float(right)
+            case TokenType.LESS:
+                return float(left) < float(right)
+            case TokenType.LESS_EQUAL:
+                return float(left) <= float(right)
+
+    def call(self, expr: Call, callee: Any) -> Any:
+        """Evaluate a Call node the generic way, updating its inline cache"""
+        cache = self.inline_caches.get(id(expr))
+        if cache is None:
+            name = expr.callee.name.lexeme if type(expr.callee) is Variable else "<expression>"
+            cache = InlineCache(expr, expr.paren.line if expr.paren else 0, f"{name}()")
+            self.inline_caches[id(expr)] = cache
+        if type(callee) is MRTFunction:
+            cache.miss(callee.declaration if callee.arity == len(expr.arguments) else None)
+            return callee.invoke(self, self.bind_arguments(callee, expr.arguments))
+        cache.miss(callee if callable(callee) else None)
+        return self.call_native(callee, expr.arguments)
+
+    def bind_arguments(self, function: MRTFunction, arguments: List[Expr]) -> Frame:
+        # Arguments are evaluated straight into the callee's frame
+        frame = [function.closure, *map(self.evaluate, arguments)]
+        if len(frame) - 1 != function.arity:
+            raise RuntimeError(f"Expected {function.arity} arguments but got {len(frame) - 1}.")
+        frame += function.locals
+        return frame
+
+    def call_native(self, callee: Any, arguments: List[Expr]) -> Any:
+        arguments = [self.evaluate(arg) for arg in arguments]
+        if callable(callee):
+            return callee(*arguments)
+        raise RuntimeError("Can only call functions.")
+
+    def native_callable(self, value: Any) -> Optional[Callable]:
+        """A Python callable running the function value `value`, for
+        builtins taking functions as arguments; None if it isn't one"""
+        if type(value) is MRTFunction:
+            def call_mrt(*arguments):
+                if len(arguments) != value.arity:
+                    raise RuntimeError(f"Expected {value.arity} arguments but got {len(arguments)}.")
+                return value.call(self, arguments)
+            return call_mrt
+        if self.compile_closures:
+            from .closures import CompiledFunction
+            if type(value) is CompiledFunction:
+                def call_compiled(*arguments):
+                    if len(arguments) != value.arity:
+                        raise RuntimeError(f"Expected {value.arity} arguments but got {len(arguments)}.")
+                    return value.invoke(arguments)
+                return call_compiled
+        # Builtins, and functions of the python engine, are called directly
+        return value if callable(value) else None
+
+    def define(self, slot: Optional[int], name: Token, value: Any):
+        if slot is None:
+            self.globals.define(name.lexeme, value)
+        else:
+            self.environment[slot] = value
 
     def is_equal(self, a: Any, b: Any) -> bool:
         """Check equality between two values"""
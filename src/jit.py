@@ -0,0 +1,586 @@
+import operator
+from array import array
+from math import isfinite
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+from .arrays import NumberArray
+from .ast import *
+from .bulk import CALLBACK_BUILTINS
+from .interpreter import Environment, Frame, MRTFunction, TailCall
+from .lexer import Token, TokenType
+from .profiler import format_table, token_line
+from .transpiler import HELPERS
+
+# Iterations a loop runs in the interpreter before it is considered hot
+HOT_LOOP_ITERATIONS = 64
+# Iterations whose variable types are recorded before the loop is compiled
+RECORDED_ITERATIONS = 4
+# Guard failures after which a loop is recompiled without type guards
+MAX_GUARD_FAILURES = 8
+
+# Returned by compiled loops whose guards failed; the interpreter then
+# runs the rest of the loop from the same iteration.
+DEOPT = object()
+
+# Operators applied to two floats: their Python symbol and function
+OPERATORS = {
+    TokenType.MINUS: ("-", "sub"),
+    TokenType.MULTIPLY: ("*", "mul"),
+    TokenType.GREATER: (">", "gt"),
+    TokenType.GREATER_EQUAL: (">=", "ge"),
+    TokenType.LESS: ("<", "lt"),
+    TokenType.LESS_EQUAL: ("<=", "le"),
+}
+
+# Types variables can be specialized to. NumberArray stands for a
+# NumberArray still backed by an array of doubles, whose elements are
+# therefore all floats.
+TYPE_NAMES = {float: "number", bool: "boolean", NumberArray: "number array"}
+
+# A variable seen from inside the loop: ("global", name), ("outer", hops
+# from the loop's frame, slot), or ("block", id(block), slot) for locals
+# of a block inside the loop, which get a new frame every iteration.
+Key = tuple
+
+class CompileError(Exception):
+    pass
+
+def _call(interpreter: 'Interpreter', callee: Any, *arguments) -> Any:
+    if type(callee) is MRTFunction:
+        if len(arguments) != callee.arity:
+            raise RuntimeError(f"Expected {callee.arity} arguments but got {len(arguments)}.")
+        return callee.invoke(interpreter, [callee.closure, *arguments, *callee.locals])
+    if callable(callee):
+        return callee(*arguments)
+    raise RuntimeError("Can only call functions.")
+
+def _tail_call(interpreter: 'Interpreter', callee: Any, *arguments) -> Any:
+    if type(callee) is MRTFunction:
+        if len(arguments) != callee.arity:
+            raise RuntimeError(f"Expected {callee.arity} arguments but got {len(arguments)}.")
+        return TailCall(callee, [callee.closure, *arguments, *callee.locals])
+    if callable(callee):
+        return (callee(*arguments),)
+    raise RuntimeError("Can only call functions.")
+
+def _store(target: Any, key: Any, value: Any) -> Any:
+    target[key] = value
+    return value
+
+def _assign_global(environment: Environment, name: Token, value: Any) -> Any:
+    environment.assign(name, value)
+    return value
+
+def _coerced(function: Callable, left: Any, right: Any) -> Any:
+    return function(float(left), float(right))
+
+def _number_item(numbers: NumberArray, index: float) -> float:
+    index = int(index)
+    items = numbers.items
+    if index < 0 or index >= len(items):
+        raise RuntimeError("Array index out of bounds.")
+    return items[index]
+
+def kind_of(value: Any) -> type:
+    """The type recorded for a variable holding value"""
+    kind = type(value)
+    if kind is NumberArray and type(value.items) is not array:
+        return list
+    return kind
+
+def coerce(code: str, kind: Optional[type]) -> str:
+    return code if kind is float else f"float({code})"
+
+def simple(expr: Expr) -> bool:
+    """Whether evaluating expr can neither fail nor have side effects"""
+    return type(expr) is Literal or (type(expr) is Variable and expr.depth is not None)
+
+class LoopCompiler:
+    """Generates a Python function running a While loop of a resolved
+    program, from the condition check of some iteration to the end.
+
+    The function works on the interpreter's frames directly and takes
+    the types the loop's variables were seen with: variables that provably
+    keep such a type through the loop are specialized (arithmetic on two
+    floats needs no float() coercion, say), behind guards checked at the
+    top of every iteration. A failed guard returns DEOPT before anything
+    of that iteration ran.
+    """
+    def __init__(self, loop: While, interpreter: 'Interpreter'):
+        self.loop = loop
+        self.interpreter = interpreter
+        self.globals = interpreter.globals.values
+        self.names: Dict[Key, str] = {}
+        self.reads: Set[Key] = set()
+        # (variable, value or None, enclosing blocks) for every assignment
+        self.assignments: List[Tuple[Key, Optional[Expr], tuple]] = []
+        # Values stored into arrays, by index or push(), which must all be
+        # numbers for number arrays to stay number arrays
+        self.array_stores: List[Tuple[Expr, tuple]] = []
+        self.builtins: Set[str] = set()
+        # Whether the loop can run MRT code that might change its variables
+        self.calls = False
+        self.statement_scan(loop, ())
+        assigned = {key for key, _, _ in self.assignments}
+        if any(("global", name) in assigned for name in self.builtins):
+            self.calls = True
+        self.source = ""
+
+    def key(self, depth: Optional[int], slot: int, name: Token, stack: tuple) -> Key:
+        if depth is None:
+            key = ("global", name.lexeme)
+        elif depth < len(stack):
+            key = ("block", id(stack[-1 - depth]), slot)
+        else:
+            key = ("outer", depth - len(stack), slot)
+        self.names.setdefault(key, name.lexeme)
+        return key
+
+    def declared(self, stmt: Var, stack: tuple) -> Key:
+        if stmt.slot is None:
+            return self.key(None, 0, stmt.name, stack)
+        return self.key(0, stmt.slot, stmt.name, stack)
+
+    def is_builtin(self, callee: Expr) -> bool:
+        if type(callee) is not Variable or callee.depth is not None:
+            return False
+        name = callee.name.lexeme
+        value = self.globals.get(name)
+        return (name not in CALLBACK_BUILTINS and callable(value)
+                and not isinstance(value, MRTFunction))
+
+    def statement_scan(self, stmt: Stmt, stack: tuple):
+        match stmt:
+            case Block():
+                if stmt.frame_size:
+                    stack = stack + (stmt,)
+                for statement in stmt.statements:
+                    self.statement_scan(statement, stack)
+            case Function():
+                raise CompileError("it declares a function")
+            case Var():
+                if stmt.initializer:
+                    self.expression_scan(stmt.initializer, stack)
+                self.assignments.append((self.declared(stmt, stack), stmt.initializer, stack))
+            case _:
+                for child in children(stmt):
+                    if isinstance(child, Stmt):
+                        self.statement_scan(child, stack)
+                    else:
+                        self.expression_scan(child, stack)
+
+    def expression_scan(self, expr: Expr, stack: tuple):
+        match expr:
+            case Variable():
+                self.reads.add(self.key(expr.depth, expr.slot, expr.name, stack))
+            case Assign():
+                key = self.key(expr.depth, expr.slot, expr.name, stack)
+                self.assignments.append((key, expr.value, stack))
+            case ArrayAssign():
+                self.array_stores.append((expr.value, stack))
+            case Call():
+                if self.is_builtin(expr.callee):
+                    self.builtins.add(expr.callee.name.lexeme)
+                    if expr.callee.name.lexeme == "push" and len(expr.arguments) == 2:
+                        self.array_stores.append((expr.arguments[1], stack))
+                else:
+                    self.calls = True
+            case Unary():
+                if expr.operator.type != TokenType.MINUS:
+                    raise CompileError(f"unsupported operator '{expr.operator.lexeme}'")
+            case Binary():
+                if expr.operator.type not in OPERATORS and expr.operator.type not in (
+                        TokenType.PLUS, TokenType.DIVIDE, TokenType.EQUALS, TokenType.NOT_EQUALS):
+                    raise CompileError(f"unsupported operator '{expr.operator.lexeme}'")
+        for child in children(expr):
+            self.expression_scan(child, stack)
+
+    def static_type(self, expr: Expr, stack: tuple, types: Dict[Key, type]) -> Optional[type]:
+        """The type expr always evaluates to given `types`, or None"""
+        match expr:
+            case Literal():
+                kind = type(expr.value)
+                return kind if kind is float or kind is bool else None
+            case Grouping():
+                return self.static_type(expr.expression, stack, types)
+            case Variable():
+                return types.get(self.key(expr.depth, expr.slot, expr.name, stack))
+            case Assign() | ArrayAssign():
+                return self.static_type(expr.value, stack, types)
+            case Unary():
+                return float
+            case Binary():
+                operator = expr.operator.type
+                if operator == TokenType.PLUS:
+                    left = self.static_type(expr.left, stack, types)
+                    right = self.static_type(expr.right, stack, types)
+                    return float if left is float and right is float else None
+                if operator in (TokenType.MINUS, TokenType.MULTIPLY, TokenType.DIVIDE):
+                    return float
+                return bool
+            case Array():
+                numbers = all(self.static_type(element, stack, types) is float
+                              for element in expr.elements)
+                return NumberArray if numbers and expr.elements else None
+            case ArrayAccess():
+                if self.static_type(expr.array, stack, types) is NumberArray:
+                    return float
+        return None
+
+    def infer(self, observed: Dict[Key, type]) -> Dict[Key, type]:
+        """The variables that keep their type throughout the loop"""
+        types = {}
+        if not self.calls:
+            # Anything called could change variables outside the loop
+            types.update((key, kind) for key, kind in observed.items() if key in self.reads)
+        # Block locals take the type of their declaration, which is dropped
+        # like every other type if a later assignment breaks it
+        declared = set()
+        for key, value, stack in self.assignments:
+            if key[0] == "block" and key not in declared:
+                declared.add(key)
+                kind = self.static_type(value, stack, types) if value else None
+                if kind is not None:
+                    types[key] = kind
+        while True:
+            broken = {key for key, value, stack in self.assignments if key in types
+                      and (value is None or self.static_type(value, stack, types) is not types[key])}
+            if NumberArray in types.values() and any(
+                    self.static_type(value, stack, types) is not float
+                    for value, stack in self.array_stores):
+                broken.update(key for key, kind in types.items() if kind is NumberArray)
+            if not broken:
+                return types
+            for key in broken:
+                del types[key]
+
+    def compile(self, observed: Dict[Key, type]) -> Tuple[Callable, List[str]]:
+        """The loop function and the "name: type" of each guarded variable"""
+        self.types = self.infer(observed)
+        self.lines: List[str] = []
+        self.constants: List[Any] = []
+        self.indent = 3
+        self.frames = ["f0"]
+        self.stack: List[Block] = []
+        self.blocks = 0
+        self.hops = 0
+
+        guards, guarded = [], []
+        for key in sorted(self.types, key=str):
+            if key[0] != "block" and key in self.reads:
+                location = self.location(key, self.names[key])
+                kind = self.types[key]
+                guarded.append(f"{self.names[key]}: {TYPE_NAMES[kind]}")
+                if kind is NumberArray:
+                    guards.append(f"type({location}) is not NumberArray or type({location}.items) is not array")
+                else:
+                    guards.append(f"type({location}) is not {kind.__name__}")
+        if guards:
+            # A builtin replaced by an MRT function could change anything
+            guards += [f"g[{name!r}] is not {self.constant(self.globals[name])}"
+                       for name in sorted(self.builtins)]
+            self.emit(f"if {' or '.join(guards)}:")
+            self.emit("    return DEOPT")
+        self.emit(f"if not {self.condition(self.loop.condition)}:")
+        self.emit("    return None")
+        self.emit("iterations += 1")
+        self.statement(self.loop.body)
+
+        prologue = ["def loop(interp, f0, state):", "    g = interp.globals.values"]
+        prologue += [f"    o{hops} = {'f0' if hops == 1 else f'o{hops - 1}'}[0]"
+                     for hops in range(1, self.hops + 1)]
+        prologue += ["    iterations = 0", "    try:", "        while True:"]
+        epilogue = ["    finally:", "        state.compiled_iterations += iterations"]
+        self.source = "\n".join(prologue + self.lines + epilogue) + "\n"
+
+        namespace = dict(HELPERS, _call=_call, _tail_call=_tail_call, _store=_store,
+                         _assign_global=_assign_global, _number_item=_number_item,
+                         _coerced=_coerced, operator=operator, _print=self.interpreter.print_function, K=self.constants,
+                         DEOPT=DEOPT, NumberArray=NumberArray, array=array)
+        exec(compile(self.source, f"<jit loop line {token_line(self.loop)}>", "exec"), namespace)
+        return namespace["loop"], guarded
+
+    def emit(self, line: str):
+        self.lines.append("    " * self.indent + line)
+
+    def constant(self, value: Any) -> str:
+        self.constants.append(value)
+        return f"K[{len(self.constants) - 1}]"
+
+    def location(self, key: Key, name: str) -> Optional[str]:
+        """Python code for a variable's storage; None for a global that
+        doesn't exist yet"""
+        if key[0] == "global":
+            return f"g[{name!r}]" if name in self.globals else None
+        if key[0] == "block":
+            depth = len(self.stack) - 1 - [id(block) for block in self.stack].index(key[1])
+            return f"{self.frames[-1 - depth]}[{key[2]}]"
+        hops = key[1]
+        self.hops = max(self.hops, hops)
+        return f"{f'o{hops}' if hops else 'f0'}[{key[2]}]"
+
+    def variable_key(self, node: Any) -> Key:
+        return self.key(node.depth, node.slot, node.name, tuple(self.stack))
+
+    def nested(self, stmt: Stmt):
+        self.indent += 1
+        count = len(self.lines)
+        self.statement(stmt)
+        if len(self.lines) == count:
+            self.emit("pass")
+        self.indent -= 1
+
+    def statement(self, stmt: Stmt):
+        match stmt:
+            case Block():
+                if stmt.frame_size:
+                    self.blocks += 1
+                    name = f"b{self.blocks}"
+                    self.emit(f"{name} = [{self.frames[-1]}{', None' * stmt.frame_size}]")
+                    self.frames.append(name)
+                    self.stack.append(stmt)
+                for statement in stmt.statements:
+                    self.statement(statement)
+                if stmt.frame_size:
+                    self.frames.pop()
+                    self.stack.pop()
+            case Expression():
+                if type(stmt.expression) is Assign:
+                    self.emit(self.assignment(stmt.expression))
+                else:
+                    self.emit(self.expression(stmt.expression)[0])
+            case If():
+                self.emit(f"if {self.condition(stmt.condition)}:")
+                self.nested(stmt.then_branch)
+                if stmt.else_branch:
+                    self.emit("else:")
+                    self.nested(stmt.else_branch)
+            case Print():
+                self.emit(f"_print({self.expression(stmt.expression)[0]})")
+            case Return():
+                if stmt.tail_call:
+                    call = stmt.value
+                    arguments = [self.expression(arg)[0] for arg in call.arguments]
+                    callee = self.expression(call.callee)[0]
+                    self.emit(f"return _tail_call(interp, {', '.join([callee] + arguments)})")
+                else:
+                    value = self.expression(stmt.value)[0] if stmt.value else "None"
+                    self.emit(f"return ({value},)")
+            case Var():
+                value = self.expression(stmt.initializer)[0] if stmt.initializer else "None"
+                if stmt.slot is None:
+                    self.emit(f"g[{stmt.name.lexeme!r}] = {value}")
+                else:
+                    self.emit(f"{self.frames[-1]}[{stmt.slot}] = {value}")
+            case While():
+                self.emit(f"while {self.condition(stmt.condition)}:")
+                self.nested(stmt.body)
+            case _:
+                raise CompileError(f"unsupported statement {type(stmt).__name__}")
+
+    def assignment(self, expr: Assign) -> str:
+        """An assignment used as a statement"""
+        value = self.expression(expr.value)[0]
+        location = self.location(self.variable_key(expr), expr.name.lexeme)
+        if location is None:
+            return f"interp.globals.assign({self.constant(expr.name)}, {value})"
+        return f"{location} = {value}"
+
+    def condition(self, expr: Expr) -> str:
+        code, kind = self.expression(expr)
+        return code if kind is bool else f"_truthy({code})"
+
+    def expression(self, expr: Expr) -> Tuple[str, Optional[type]]:
+        """Python code for expr, and its type if it is specialized"""
+        match expr:
+            case Literal():
+                value = expr.value
+                if type(value) is float and isfinite(value):
+                    return (f"({value!r})" if value < 0 else repr(value)), float
+                if value is None or type(value) in (bool, str):
+                    return repr(value), type(value) if type(value) is bool else None
+                return self.constant(value), None
+            case Grouping():
+                return self.expression(expr.expression)
+            case Variable():
+                key = self.variable_key(expr)
+                location = self.location(key, expr.name.lexeme)
+                if location is None:
+                    return f"interp.globals.get({self.constant(expr.name)})", None
+                return location, self.types.get(key)
+            case Assign():
+                value, kind = self.expression(expr.value)
+                key = self.variable_key(expr)
+                location = self.location(key, expr.name.lexeme)
+                if location is None:
+                    return f"_assign_global(interp.globals, {self.constant(expr.name)}, {value})", kind
+                target, index = location[:-1].split("[", 1)
+                return f"_store({target}, {index}, {value})", kind
+            case Array():
+                elements = [self.expression(element)[0] for element in expr.elements]
+                return f"_array([{', '.join(elements)}])", self.static_type(expr, tuple(self.stack), self.types)
+            case ArrayAccess():
+                array_code, array_kind = self.expression(expr.array)
+                index_code, index_kind = self.expression(expr.index)
+                if array_kind is NumberArray and index_kind is float:
+                    return f"_number_item({array_code}, {index_code})", float
+                return f"_get_index({array_code}, {index_code})", None
+            case ArrayAssign():
+                array_code = self.expression(expr.array)[0]
+                index_code = self.expression(expr.index)[0]
+                value, kind = self.expression(expr.value)
+                return f"_set_index(_checked({array_code}, {index_code}), {value})", kind
+            case Binary():
+                return self.binary(expr)
+            case Call():
+                callee = self.expression(expr.callee)[0]
+                arguments = [self.expression(arg)[0] for arg in expr.arguments]
+                return f"_call(interp, {', '.join([callee] + arguments)})", None
+            case Unary():
+                right, kind = self.expression(expr.right)
+                return f"(-{coerce(right, kind)})", float
+        raise CompileError(f"unsupported expression {type(expr).__name__}")
+
+    def binary(self, expr: Binary) -> Tuple[str, Optional[type]]:
+        left, left_kind = self.expression(expr.left)
+        right, right_kind = self.expression(expr.right)
+        floats = left_kind is float and right_kind is float
+        match expr.operator.type:
+            case TokenType.PLUS:
+                return (f"({left} + {right})", float) if floats else (f"_add({left}, {right})", None)
+            case TokenType.DIVIDE:
+                if floats and type(expr.right) is Literal and expr.right.value != 0:
+                    return f"({left} / {right})", float
+                return f"_divide({left}, {right})", float
+            case TokenType.EQUALS:
+                return f"({left} == {right})", bool
+            case TokenType.NOT_EQUALS:
+                return f"(not ({left} == {right}))", bool
+        symbol, function = OPERATORS[expr.operator.type]
+        kind = float if function in ("sub", "mul") else bool
+        if floats:
+            return f"({left} {symbol} {right})", kind
+        # Both operands are evaluated before either is coerced, which
+        # inlined float() calls only preserve for a simple right operand
+        if simple(expr.right):
+            return f"({coerce(left, left_kind)} {symbol} {coerce(right, right_kind)})", kind
+        return f"_coerced(operator.{function}, {left}, {right})", kind
+
+class LoopState:
+    """What the JIT knows about one While statement"""
+    __slots__ = ("loop", "line", "entries", "iterations", "compiled_iterations",
+                 "guard_failures", "observed", "recorded", "compiler", "code", "guards", "status")
+
+    def __init__(self, loop: While):
+        self.loop = loop
+        self.line = token_line(loop)
+        self.entries = 0
+        self.iterations = 0             # run by the interpreter
+        self.compiled_iterations = 0    # run by compiled code
+        self.guard_failures = 0
+        self.observed: Dict[Key, Set[type]] = {}
+        self.recorded = 0
+        self.compiler: Optional[LoopCompiler] = None
+        self.code: Optional[Callable] = None
+        self.guards: List[str] = []
+        self.status = "interpreted"
+
+class LoopJIT:
+    """Compiles the hot While loops of a tree-walking Interpreter.
+
+    Every loop is interpreted at first. Once it has run
+    HOT_LOOP_ITERATIONS iterations, the types of the variables it reads
+    are recorded at the start of the next RECORDED_ITERATIONS iterations,
+    and the loop is compiled with LoopCompiler, specialized to the types
+    that never changed. From then on the loop runs compiled; when a
+    guard fails the interpreter takes over where the compiled code
+    stopped. A loop whose guards fail MAX_GUARD_FAILURES times is
+    recompiled without specializing anything.
+    """
+    def __init__(self, interpreter: 'Interpreter'):
+        self.interpreter = interpreter
+        self.loops: Dict[int, LoopState] = {}
+
+    def run(self, loop: While) -> Optional[tuple]:
+        """Execute a While statement, like Interpreter.execute"""
+        state = self.loops.get(id(loop))
+        if state is None:
+            state = self.loops[id(loop)] = LoopState(loop)
+        state.entries += 1
+        interpreter = self.interpreter
+        if state.code is not None:
+            result = state.code(interpreter, interpreter.environment, state)
+            if result is not DEOPT:
+                return result
+            self.guard_failed(state)
+
+        evaluate = interpreter.evaluate
+        execute = interpreter.execute
+        while True:
+            condition = evaluate(loop.condition)
+            if condition is None or condition is False:
+                return None
+            result = execute(loop.body)
+            if result:
+                return result
+            state.iterations += 1
+            if state.iterations >= HOT_LOOP_ITERATIONS and state.status == "interpreted":
+                self.record(state)
+                if state.code is not None:
+                    result = state.code(interpreter, interpreter.environment, state)
+                    if result is not DEOPT:
+                        return result
+                    self.guard_failed(state)
+
+    def record(self, state: LoopState):
+        """Note the current types of the loop's variables, compiling the
+        loop once enough iterations were recorded"""
+        try:
+            if state.compiler is None:
+                state.compiler = LoopCompiler(state.loop, self.interpreter)
+            for key in state.compiler.reads:
+                if key[0] != "block":
+                    state.observed.setdefault(key, set()).add(kind_of(self.value(key)))
+            state.recorded += 1
+            if state.recorded < RECORDED_ITERATIONS:
+                return
+            observed = {key: kinds.pop() for key, kinds in state.observed.items()
+                        if len(kinds) == 1 and next(iter(kinds)) in TYPE_NAMES}
+            state.code, state.guards = state.compiler.compile(observed)
+            state.status = "compiled"
+        except CompileError as e:
+            state.status = f"not compiled: {e}"
+            state.compiler = None
+        state.observed = {}
+
+    def value(self, key: Key) -> Any:
+        if key[0] == "global":
+            return self.interpreter.globals.values.get(key[1])
+        frame = self.interpreter.environment
+        for _ in range(key[1]):
+            frame = frame[0]
+        return frame[key[2]]
+
+    def guard_failed(self, state: LoopState):
+        state.guard_failures += 1
+        if state.guard_failures >= MAX_GUARD_FAILURES and state.guards:
+            state.code, state.guards = state.compiler.compile({})
+            state.status = "compiled, unspecialized"
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """One entry per loop that ran, in source order"""
+        loops = sorted(self.loops.values(), key=lambda state: state.line or 0)
+        return [{
+            "line": state.line,
+            "status": state.status,
+            "entries": state.entries,
+            "interpreted": state.iterations,
+            "compiled": state.compiled_iterations,
+            "guard_failures": state.guard_failures,
+            "guards": state.guards,
+        } for state in loops]
+
+def format_jit_stats(stats: List[Dict[str, Any]]) -> str:
+    columns = ["line", "entries", "interpreted", "compiled", "guard failures", "status", "guards"]
+    rows = [[loop["line"], loop["entries"], loop["interpreted"], loop["compiled"],
+             loop["guard_failures"], loop["status"], ", ".join(loop["guards"])] for loop in stats]
+    return format_table(columns, rows, left={5, 6})
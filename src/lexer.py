@@ -1,6 +1,8 @@
+import re
+import sys
 from enum import Enum, auto
 from dataclasses import dataclass
-from typing import Optional, List
+from typing import Iterator, List, Optional, Set
 
 class TokenType(Enum):
     # Keywords
@@ -46,14 +48,137 @@ class TokenType(Enum):
     # Special
     EOF = auto()
 
-@dataclass
+@dataclass(slots=True)
 class Token:
     type: TokenType
     lexeme: str
     literal: Optional[object]
     line: int
 
+KEYWORDS = {
+    "func": TokenType.FUNC,
+    "return": TokenType.RETURN,
+    "if": TokenType.IF,
+    "else": TokenType.ELSE,
+    "while": TokenType.WHILE,
+    "for": TokenType.FOR,
+    "print": TokenType.PRINT,
+    "var": TokenType.VAR,
+    "true": TokenType.TRUE,
+    "false": TokenType.FALSE,
+}
+
+OPERATORS = {
+    "(": TokenType.LPAREN,
+    ")": TokenType.RPAREN,
+    "{": TokenType.LBRACE,
+    "}": TokenType.RBRACE,
+    "[": TokenType.LBRACKET,
+    "]": TokenType.RBRACKET,
+    ",": TokenType.COMMA,
+    ";": TokenType.SEMICOLON,
+    "+": TokenType.PLUS,
+    "-": TokenType.MINUS,
+    "*": TokenType.MULTIPLY,
+    "/": TokenType.DIVIDE,
+    ">=": TokenType.GREATER_EQUAL,
+    ">": TokenType.GREATER,
+    "<=": TokenType.LESS_EQUAL,
+    "<": TokenType.LESS,
+    "==": TokenType.EQUALS,
+    "=": TokenType.ASSIGN,
+    "!=": TokenType.NOT_EQUALS,
+}
+
+# One alternation per lexical category; order matters where prefixes
+# overlap (comments before "/", two-character operators before one).
+# Character classes are spelled out instead of using \d or \w so only
+# ASCII letters and digits are accepted, as in ReferenceLexer.
+TOKEN_PATTERN = re.compile(r'''
+    (?P<space>[ \t\r\n]+)
+  | (?P<identifier>[A-Za-z_][A-Za-z0-9_]*)
+  | (?P<number>[0-9]+(?:\.[0-9]+)?)
+  | (?P<line_comment>//[^\n]*)
+  | (?P<block_comment>/\*.*?\*/)
+  | (?P<open_comment>/\*)
+  | (?P<string>"[^"]*")
+  | (?P<open_string>")
+  | (?P<operator>[>=<!]=|[(){}\[\],;+\-*/><=])
+  | (?P<unexpected>.)
+''', re.VERBOSE | re.DOTALL)
+
+# A pragma is a line comment of the form `// @name` on a line of its own
+PRAGMA_PATTERN = re.compile(r'^[ \t]*//[ \t]*@([A-Za-z_][A-Za-z0-9_]*)', re.MULTILINE)
+
+def pragmas(source: str) -> Set[str]:
+    return set(PRAGMA_PATTERN.findall(source))
+
 class Lexer:
+    """Tokenizer driven by a single compiled master regex.
+
+    Produces exactly the same tokens, line numbers and errors as
+    ReferenceLexer, at a fraction of the cost per character.
+    """
+    def __init__(self, source: str):
+        self.source = source
+        self.tokens: List[Token] = []
+        self.line = 1
+
+    def scan_tokens(self) -> List[Token]:
+        self.tokens.extend(self.iter_tokens())
+        return self.tokens
+
+    def iter_tokens(self) -> Iterator[Token]:
+        """Yield tokens lazily, so a consumer never holds more than it needs"""
+        line = 1
+        keywords = KEYWORDS
+        operators = OPERATORS
+        identifier = TokenType.IDENTIFIER
+        intern = sys.intern
+        number = TokenType.NUMBER
+        string = TokenType.STRING
+
+        for match in TOKEN_PATTERN.finditer(self.source):
+            kind = match.lastgroup
+            text = match.group()
+            if kind == "space":
+                line += text.count("\n")
+            elif kind == "identifier":
+                # Interned so repeated names share one string object
+                text = intern(text)
+                token_type = keywords.get(text, identifier)
+                if token_type is TokenType.TRUE:
+                    yield Token(token_type, text, True, line)
+                elif token_type is TokenType.FALSE:
+                    yield Token(token_type, text, False, line)
+                else:
+                    yield Token(token_type, text, None, line)
+            elif kind == "operator":
+                yield Token(operators[text], text, None, line)
+            elif kind == "number":
+                yield Token(number, text, float(text), line)
+            elif kind == "string":
+                line += text.count("\n")
+                yield Token(string, text, text[1:-1], line)
+            elif kind == "line_comment":
+                pass
+            elif kind == "block_comment":
+                line += text.count("\n")
+            elif kind == "open_string":
+                raise Exception(f"Unterminated string starting at line {line}")
+            elif kind == "open_comment":
+                # The reference scanner reports the line it reached at EOF
+                line += self.source.count("\n", match.end())
+                raise Exception(f"Unterminated comment starting at line {line}")
+            else:
+                raise Exception(f"Unexpected character '{text}' at line {line}")
+
+        self.line = line
+        yield Token(TokenType.EOF, "", None, line)
+
+class ReferenceLexer:
+    """Original character-at-a-time scanner, kept as the reference for
+    Lexer's behaviour and as the baseline in benchmarks/"""
     def __init__(self, source: str):
         self.source = source
         self.tokens: List[Token] = []
@@ -0,0 +1,87 @@
+from collections import OrderedDict
+from typing import Any, Callable, Iterable, List, Optional
+from .strings import StringBuilder
+
+DEFAULT_SIZE = 1024
+SCALAR_TYPES = (float, str, bool)
+
+def memo_key(arguments: Iterable[Any]) -> Optional[tuple]:
+    """Hashable key for a call, or None if an argument can't be cached.
+
+    Types are part of the key because true == 1.0 in Python but not in
+    MRT, and zeros are keyed by their text so 0.0 and -0.0 stay apart.
+    Calls passing arrays or functions are never cached.
+    """
+    key = []
+    for argument in arguments:
+        kind = type(argument)
+        if kind is float:
+            if argument == 0:
+                argument = str(argument)
+        elif kind is StringBuilder:
+            kind = str
+            argument = str(argument)
+        elif kind not in SCALAR_TYPES and argument is not None:
+            return None
+        key.append(kind)
+        key.append(argument)
+    return tuple(key)
+
+class MemoCache:
+    """Bounded LRU cache of one pure function's results, with statistics"""
+    def __init__(self, name: str, max_size: int = DEFAULT_SIZE):
+        self.name = name
+        self.max_size = max_size
+        self.entries: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.uncacheable = 0
+
+    def call(self, arguments: Iterable[Any], compute: Callable[[], Any]) -> Any:
+        key = memo_key(arguments)
+        if key is None:
+            self.uncacheable += 1
+            return compute()
+
+        entries = self.entries
+        if key in entries:
+            self.hits += 1
+            entries.move_to_end(key)
+            return entries[key]
+
+        self.misses += 1
+        value = compute()
+        # Arrays and closures are mutable, so each call must return a new one
+        if value is None or type(value) in SCALAR_TYPES:
+            entries[key] = value
+            if len(entries) > self.max_size:
+                entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def wrap(self, function: Callable) -> Callable:
+        """Memoize a plain Python callable (used by the python engine)"""
+        def memoized(*args):
+            return self.call(args, lambda: function(*args))
+        return memoized
+
+    def stats(self) -> dict:
+        return {
+            "function": self.name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "uncacheable": self.uncacheable,
+            "size": len(self.entries),
+        }
+
+def format_stats(caches: List[MemoCache]) -> str:
+    columns = ["function", "hits", "misses", "evictions", "uncacheable", "size"]
+    rows = [[str(cache.stats()[column]) for column in columns] for cache in caches]
+    widths = [max(len(column), *(len(row[i]) for row in rows)) for i, column in enumerate(columns)]
+    lines = [columns] + rows
+    return "\n".join(
+        "  ".join(cell.ljust(width) if i == 0 else cell.rjust(width)
+                  for i, (cell, width) in enumerate(zip(line, widths)))
+        for line in lines)
@@ -0,0 +1,192 @@
+import dataclasses
+import math
+import sys
+import typing
+from array import array
+from typing import Any, Dict, List, Optional, Tuple
+from . import ast
+from .ast import Expr, Stmt
+from .lexer import Token, TokenType
+
+# Field encodings. Every field of every node becomes one or more signed
+# ints in PackedProgram.data; -1 stands for None.
+NODE = 0    # index of another node
+TOKEN = 1   # index into the token table
+LIST = 2    # item count followed by node or token indices
+INT = 3     # resolver annotation, stored as is
+VALUE = 4   # index into the literal value table
+BOOL = 5    # resolver flag, 0 or 1
+
+NODE_CLASSES = [
+    cls for cls in vars(ast).values()
+    if isinstance(cls, type) and issubclass(cls, (Expr, Stmt)) and dataclasses.is_dataclass(cls)
+]
+CLASS_INDEX = {cls: index for index, cls in enumerate(NODE_CLASSES)}
+TOKEN_TYPES = list(TokenType)
+TOKEN_TYPE_INDEX = {token_type: index for index, token_type in enumerate(TOKEN_TYPES)}
+
+def field_kind(annotation: Any) -> Tuple[int, Optional[int]]:
+    """Map a node field's annotation to its encoding (and list item encoding)"""
+    if annotation == "Token":
+        return TOKEN, None
+    origin = typing.get_origin(annotation)
+    if origin is list:
+        item = typing.get_args(annotation)[0]
+        return LIST, TOKEN if isinstance(item, typing.ForwardRef) else NODE
+    if origin is typing.Union:
+        annotation = next(arg for arg in typing.get_args(annotation) if arg is not type(None))
+    if annotation is int:
+        return INT, None
+    if annotation is bool:
+        return BOOL, None
+    if annotation is Any:
+        return VALUE, None
+    return NODE, None
+
+FIELD_KINDS = {
+    cls: [(field.name, field_kind(field.type)) for field in dataclasses.fields(cls)]
+    for cls in NODE_CLASSES
+}
+
+class PackedProgram:
+    """Array-backed store for a parsed program.
+
+    Nodes are packed in post-order into flat typed arrays: one byte of
+    class id and one offset per node, plus a shared stream of int fields.
+    Tokens are stored as (type, lexeme, literal, line) records, and
+    lexemes and literal values are deduplicated into tables. For large
+    programs this takes a fraction of the memory of the object tree.
+    unpack() rebuilds the objects when the program is about to run.
+    """
+    def __init__(self):
+        self.kinds = array("B")
+        self.offsets = array("I")
+        self.data = array("i")
+        self.tokens = array("i")
+        self.strings: List[str] = []
+        self.values: List[Any] = []
+        self.roots = array("I")
+        self._string_index: Dict[str, int] = {}
+        self._value_index: Dict[Tuple[type, Any], int] = {}
+        self._token_index: Dict[int, int] = {}
+
+    @classmethod
+    def pack(cls, statements: List[Stmt]) -> 'PackedProgram':
+        packed = cls()
+        for statement in statements:
+            packed.roots.append(packed.add_node(statement))
+        # The lookup tables are only needed while packing
+        packed._string_index = {}
+        packed._value_index = {}
+        packed._token_index = {}
+        return packed
+
+    def add_node(self, node: Any) -> int:
+        if node is None:
+            return -1
+        fields = []
+        for name, (kind, item_kind) in FIELD_KINDS[type(node)]:
+            value = getattr(node, name)
+            if kind == NODE:
+                fields.append(self.add_node(value))
+            elif kind == TOKEN:
+                fields.append(self.add_token(value))
+            elif kind == LIST:
+                fields.append(len(value))
+                add = self.add_token if item_kind == TOKEN else self.add_node
+                fields.extend(add(item) for item in value)
+            elif kind == INT:
+                fields.append(-1 if value is None else value)
+            elif kind == BOOL:
+                fields.append(int(value))
+            else:
+                fields.append(self.add_value(value))
+
+        self.kinds.append(CLASS_INDEX[type(node)])
+        self.offsets.append(len(self.data))
+        self.data.extend(fields)
+        return len(self.kinds) - 1
+
+    def add_token(self, token: Optional[Token]) -> int:
+        if token is None:
+            return -1
+        index = self._token_index.get(id(token))
+        if index is None:
+            index = len(self.tokens) // 4
+            self.tokens.extend((TOKEN_TYPE_INDEX[token.type], self.add_string(token.lexeme),
+                                self.add_value(token.literal), token.line))
+            self._token_index[id(token)] = index
+        return index
+
+    def add_string(self, text: str) -> int:
+        index = self._string_index.get(text)
+        if index is None:
+            index = self._string_index[text] = len(self.strings)
+            self.strings.append(text)
+        return index
+
+    def add_value(self, value: Any) -> int:
+        if value is None:
+            return -1
+        # Keyed by type so 1.0 and True stay apart, and zeros by sign too,
+        # as 0.0 == -0.0
+        if type(value) is float and value == 0:
+            key = (float, math.copysign(1, value), value)
+        else:
+            key = (type(value), value)
+        index = self._value_index.get(key)
+        if index is None:
+            index = self._value_index[key] = len(self.values)
+            self.values.append(value)
+        return index
+
+    def unpack(self) -> List[Stmt]:
+        # Post-order packing means every child precedes its parent, so a
+        # single forward pass rebuilds the tree without recursion.
+        token_data = self.tokens
+        tokens = [
+            Token(TOKEN_TYPES[token_data[i]], self.strings[token_data[i + 1]],
+                  self.values[token_data[i + 2]] if token_data[i + 2] >= 0 else None,
+                  token_data[i + 3])
+            for i in range(0, len(token_data), 4)
+        ]
+        nodes: List[Any] = []
+        data = self.data
+        for kind, offset in zip(self.kinds, self.offsets):
+            cls = NODE_CLASSES[kind]
+            position = offset
+            arguments = []
+            for _, (field_kind, item_kind) in FIELD_KINDS[cls]:
+                raw = data[position]
+                position += 1
+                if field_kind == LIST:
+                    table = tokens if item_kind == TOKEN else nodes
+                    arguments.append([table[i] for i in data[position:position + raw]])
+                    position += raw
+                elif raw < 0:
+                    arguments.append(None)
+                elif field_kind == NODE:
+                    arguments.append(nodes[raw])
+                elif field_kind == TOKEN:
+                    arguments.append(tokens[raw])
+                elif field_kind == INT:
+                    arguments.append(raw)
+                elif field_kind == BOOL:
+                    arguments.append(bool(raw))
+                else:
+                    arguments.append(self.values[raw])
+            nodes.append(cls(*arguments))
+        return [nodes[root] for root in self.roots]
+
+    @property
+    def node_count(self) -> int:
+        return len(self.kinds)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the arrays and tables (strings counted once)"""
+        total = sum(part.itemsize * len(part) for part in
+                    (self.kinds, self.offsets, self.data, self.tokens, self.roots))
+        total += sys.getsizeof(self.strings) + sum(sys.getsizeof(s) for s in self.strings)
+        total += sys.getsizeof(self.values) + sum(sys.getsizeof(v) for v in self.values)
+        return total
@@ -0,0 +1,385 @@
+import dataclasses
+from typing import Any, Dict, List, Optional, Set
+from .ast import *
+from .bulk import CALLBACK_BUILTINS
+from .interpreter import Interpreter
+from .lexer import Token, TokenType
+from .resolver import counted_loop
+from .strings import StringBuilder
+
+class Optimizer:
+    """AST-to-AST optimization pass run between parsing and execution.
+
+    Level 1 folds constant expressions (using the interpreter's own
+    evaluation, so float and string-concatenation semantics match
+    exactly) and removes dead code: If branches with constant
+    conditions, while (false) loops and statements after a return.
+    Level 2 also hoists loop-invariant expressions out of While loops.
+
+    An expression is hoisted only if it is pure, none of its variables
+    can change inside the loop, and it is evaluated unconditionally before
+    the loop does anything observable. So moving it never introduces an
+    error or changes the order of output. Every change is recorded in
+    self.changes.
+    """
+    def __init__(self, level: int = 1):
+        self.level = level
+        self.changes: List[str] = []
+        self.evaluator = Interpreter()
+        # Builtins taking callbacks can run user code, so don't count them
+        self.builtins = set(self.evaluator.globals.values) - CALLBACK_BUILTINS
+        self.names: Set[str] = set()
+        self.user_declared: Set[str] = set()
+        self.escaping_assigned: Set[str] = set()
+        self.temp_counter = 0
+
+    def optimize(self, statements: List[Stmt]) -> List[Stmt]:
+        if self.level <= 0:
+            return statements
+        if self.level >= 2:
+            self.analyze(statements)
+        return [result for statement in statements
+                for result in self.statement(statement)]
+
+    def report(self) -> str:
+        if not self.changes:
+            return "optimizer: no changes"
+        return "\n".join(f"optimizer: {change}" for change in self.changes)
+
+    # Statements. Each returns the list of statements replacing the input.
+
+    def statement(self, stmt: Stmt) -> List[Stmt]:
+        match stmt:
+            case Block():
+                loop = counted_loop(stmt) if self.level >= 2 else None
+                stmt.statements = self.statement_list(stmt.statements)
+                if (loop is not None and len(stmt.statements) == 2
+                        and type(stmt.statements[1]) is Block and stmt.statements[1].statements[-1] is loop):
+                    # Code hoisted out of a for loop goes between its counter
+                    # and the loop rather than in a block of its own, which
+                    # would hide the counted-loop shape from the Resolver
+                    stmt.statements[1:] = stmt.statements[1].statements
+                return [stmt]
+            case Expression():
+                stmt.expression = self.expression(stmt.expression)
+            case Function():
+                stmt.body = self.statement_list(stmt.body)
+            case If():
+                line = self.line_of(stmt.condition)
+                stmt.condition = self.expression(stmt.condition)
+                if isinstance(stmt.condition, Literal):
+                    if self.evaluator.is_truthy(stmt.condition.value):
+                        self.record(line, "if condition is always true, kept only the then branch")
+                        return self.statement(stmt.then_branch)
+                    self.record(line, "if condition is always false, kept only the else branch")
+                    return self.statement(stmt.else_branch) if stmt.else_branch else []
+                stmt.then_branch = self.single(self.statement(stmt.then_branch))
+                if stmt.else_branch:
+                    stmt.else_branch = self.single(self.statement(stmt.else_branch))
+            case Print():
+                stmt.expression = self.expression(stmt.expression)
+            case Return():
+                if stmt.value:
+                    stmt.value = self.expression(stmt.value)
+            case Var():
+                if stmt.initializer:
+                    stmt.initializer = self.expression(stmt.initializer)
+            case While():
+                line = self.line_of(stmt.condition)
+                stmt.condition = self.expression(stmt.condition)
+                if (isinstance(stmt.condition, Literal)
+                        and not self.evaluator.is_truthy(stmt.condition.value)):
+                    self.record(line, "removed while loop whose condition is always false")
+                    return []
+                stmt.body = self.single(self.statement(stmt.body))
+                if self.level >= 2:
+                    return self.hoist(stmt)
+        return [stmt]
+
+    def statement_list(self, statements: List[Stmt]) -> List[Stmt]:
+        result = []
+        for index, statement in enumerate(statements):
+            result.extend(self.statement(statement))
+            if result and always_returns(result[-1]) and index + 1 < len(statements):
+                removed = len(statements) - index - 1
+                line = result[-1].keyword.line if isinstance(result[-1], Return) else None
+                self.record(line, f"removed {removed} unreachable statement(s) after return")
+                break
+        return result
+
+    def single(self, statements: List[Stmt]) -> Stmt:
+        """Turn a rewritten branch or loop body back into one statement"""
+        return statements[0] if len(statements) == 1 else Block(statements)
+
+    # Expressions
+
+    def expression(self, expr: Expr) -> Expr:
+        match expr:
+            case Array():
+                expr.elements = [self.expression(element) for element in expr.elements]
+            case ArrayAccess():
+                expr.array = self.expression(expr.array)
+                expr.index = self.expression(expr.index)
+            case ArrayAssign():
+                expr.array = self.expression(expr.array)
+                expr.index = self.expression(expr.index)
+                expr.value = self.expression(expr.value)
+            case Assign():
+                expr.value = self.expression(expr.value)
+            case Binary():
+                expr.left = self.expression(expr.left)
+                expr.right = self.expression(expr.right)
+                if isinstance(expr.left, Literal) and isinstance(expr.right, Literal):
+                    return self.fold(expr, expr.operator.line)
+            case Call():
+                expr.callee = self.expression(expr.callee)
+                expr.arguments = [self.expression(argument) for argument in expr.arguments]
+            case Grouping():
+                inner = self.expression(expr.expression)
+                if isinstance(inner, Literal):
+                    return inner
+                expr.expression = inner
+            case Unary():
+                expr.right = self.expression(expr.right)
+                if isinstance(expr.right, Literal):
+                    return self.fold(expr, expr.operator.line)
+        return expr
+
+    def fold(self, expr: Expr, line: int) -> Expr:
+        try:
+            value = self.evaluator.evaluate(expr)
+        except Exception:
+            # Leave it for runtime so the error surfaces as before
+            return expr
+        if value is None:
+            return expr
+        if isinstance(value, StringBuilder):
+            value = str(value)
+        folded = Literal(value)
+        if format_expr(folded) != format_expr(expr):
+            self.record(line, f"folded {format_expr(expr)} to {format_expr(folded)}")
+        return folded
+
+    # Loop-invariant hoisting
+
+    def analyze(self, statements: List[Stmt]):
+        for node in walk(statements):
+            if isinstance(node, Variable):
+                self.names.add(node.name.lexeme)
+            elif isinstance(node, (Var, Function)):
+                self.user_declared.add(node.name.lexeme)
+            if isinstance(node, Function):
+                self.user_declared.update(param.lexeme for param in node.params)
+                # Any name a function assigns may change during a call
+                self.escaping_assigned.update(
+                    inner.name.lexeme for inner in walk(node.body) if isinstance(inner, Assign))
+        self.names |= self.user_declared
+
+    def hoist(self, loop: While) -> List[Stmt]:
+        assigned = {node.name.lexeme for node in walk([loop]) if isinstance(node, Assign)}
+        declared = set()
+        calls_user_code = False
+        for node in walk([loop]):
+            if isinstance(node, (Var, Function)):
+                declared.add(node.name.lexeme)
+            if isinstance(node, Function):
+                declared.update(param.lexeme for param in node.params)
+            if isinstance(node, Call) and not self.is_builtin_call(node):
+                calls_user_code = True
+        clobbered = assigned | declared
+        if calls_user_code:
+            clobbered |= self.escaping_assigned
+
+        condition_candidates: List[Expr] = []
+        self.scan_expression(loop.condition, clobbered, condition_candidates)
+        body_candidates: List[Expr] = []
+        if self.is_pure(loop.condition):
+            self.scan_statement(loop.body, clobbered, body_candidates)
+
+        if not condition_candidates and not body_candidates:
+            return [loop]
+
+        temps: Dict[int, Variable] = {}
+        by_shape: Dict[str, Token] = {}
+        prelude: List[Stmt] = []
+        guarded: List[Stmt] = []
+        for candidates, guard in ((condition_candidates, False), (body_candidates, True)):
+            for candidate in candidates:
+                shape = format_expr(candidate)
+                if shape not in by_shape:
+                    name = self.new_temp()
+                    by_shape[shape] = name
+                    if guard:
+                        prelude.append(Var(name, None))
+                        guarded.append(Expression(Assign(name, candidate)))
+                    else:
+                        prelude.append(Var(name, candidate))
+                    self.record(self.line_of(candidate),
+                                f"hoisted loop-invariant {shape} out of while loop")
+                temps[id(candidate)] = Variable(by_shape[shape])
+
+        replace_nodes(loop, temps)
+        if guarded:
+            # The condition is pure, so checking it once more up front is
+            # unobservable and keeps the hoisted code from running when the
+            # loop body never would.
+            prelude.append(If(copy_node(loop.condition), Block(guarded), None))
+        return [Block(prelude + [loop])]
+
+    def scan_statement(self, stmt: Stmt, clobbered: Set[str], candidates: List[Expr]) -> bool:
+        """Collect candidates from the straight-line prefix of a loop body.
+        Returns False once anything observable or conditional is reached."""
+        match stmt:
+            case Block():
+                for statement in stmt.statements:
+                    if not self.scan_statement(statement, clobbered, candidates):
+                        return False
+                return True
+            case Expression():
+                return self.scan_expression(stmt.expression, clobbered, candidates)
+            case Var():
+                if stmt.initializer:
+                    return self.scan_expression(stmt.initializer, clobbered, candidates)
+                return True
+            case Print():
+                self.scan_expression(stmt.expression, clobbered, candidates)
+        return False
+
+    def scan_expression(self, expr: Expr, clobbered: Set[str], candidates: List[Expr]) -> bool:
+        """Collect maximal invariant pure subexpressions in evaluation order.
+        Returns False once a call that may produce output is reached."""
+        if self.is_invariant(expr, clobbered):
+            candidates.append(expr)
+            return True
+        match expr:
+            case Array():
+                return all(self.scan_expression(element, clobbered, candidates)
+                           for element in expr.elements)
+            case ArrayAccess():
+                return (self.scan_expression(expr.array, clobbered, candidates)
+                        and self.scan_expression(expr.index, clobbered, candidates))
+            case ArrayAssign():
+                return (self.scan_expression(expr.array, clobbered, candidates)
+                        and self.scan_expression(expr.index, clobbered, candidates)
+                        and self.scan_expression(expr.value, clobbered, candidates))
+            case Assign():
+                return self.scan_expression(expr.value, clobbered, candidates)
+            case Binary():
+                return (self.scan_expression(expr.left, clobbered, candidates)
+                        and self.scan_expression(expr.right, clobbered, candidates))
+            case Call():
+                if not (self.scan_expression(expr.callee, clobbered, candidates)
+                        and all(self.scan_expression(argument, clobbered, candidates)
+                                for argument in expr.arguments)):
+                    return False
+                return self.is_builtin_call(expr) and expr.callee.name.lexeme != "print"
+            case Grouping():
+                return self.scan_expression(expr.expression, clobbered, candidates)
+            case Unary():
+                return self.scan_expression(expr.right, clobbered, candidates)
+        return True
+
+    def is_invariant(self, expr: Expr, clobbered: Set[str]) -> bool:
+        if not isinstance(expr, (Binary, Unary)):
+            return False
+        names = set()
+        for node in walk_expression(expr):
+            if isinstance(node, Variable):
+                names.add(node.name.lexeme)
+            elif not isinstance(node, (Binary, Unary, Grouping, Literal)):
+                return False
+        return bool(names) and not (names & clobbered)
+
+    def is_pure(self, expr: Expr) -> bool:
+        return all(isinstance(node, (Binary, Unary, Grouping, Literal, Variable))
+                   for node in walk_expression(expr))
+
+    def is_builtin_call(self, call: Call) -> bool:
+        return (isinstance(call.callee, Variable)
+                and call.callee.name.lexeme in self.builtins
+                and call.callee.name.lexeme not in self.user_declared)
+
+    def new_temp(self) -> Token:
+        while True:
+            self.temp_counter += 1
+            name = f"_inv{self.temp_counter}"
+            if name not in self.names:
+                self.names.add(name)
+                return Token(TokenType.IDENTIFIER, name, None, 0)
+
+    # Reporting
+
+    def record(self, line: Optional[int], message: str):
+        self.changes.append(f"line {line}: {message}" if line else message)
+
+    def line_of(self, expr: Expr) -> Optional[int]:
+        for node in walk_expression(expr):
+            for field in dataclasses.fields(node):
+                value = getattr(node, field.name)
+                if isinstance(value, Token) and value.line:
+                    return value.line
+        return None
+
+def always_returns(stmt: Stmt) -> bool:
+    match stmt:
+        case Return():
+            return True
+        case Block():
+            return any(always_returns(statement) for statement in stmt.statements)
+        case If():
+            return (stmt.else_branch is not None and always_returns(stmt.then_branch)
+                    and always_returns(stmt.else_branch))
+    return False
+
+def walk_expression(expr: Expr):
+    return walk([expr])
+
+def replace_nodes(root: Any, replacements: Dict[int, Expr]):
+    """Swap nodes (matched by identity) anywhere below root"""
+    for node in walk([root]):
+        for field in dataclasses.fields(node):
+            value = getattr(node, field.name)
+            if isinstance(value, Expr) and id(value) in replacements:
+                setattr(node, field.name, replacements[id(value)])
+            elif isinstance(value, list):
+                for index, item in enumerate(value):
+                    if isinstance(item, Expr) and id(item) in replacements:
+                        value[index] = replacements[id(item)]
+
+def copy_node(node: Any) -> Any:
+    if isinstance(node, list):
+        return [copy_node(item) for item in node]
+    if isinstance(node, (Expr, Stmt)):
+        return type(node)(*(copy_node(getattr(node, field.name))
+                            for field in dataclasses.fields(node)))
+    return node
+
+def format_expr(expr: Expr) -> str:
+    """Render an expression as MRT source, for optimizer reports"""
+    match expr:
+        case Literal():
+            if isinstance(expr.value, str):
+                return f'"{expr.value}"'
+            if isinstance(expr.value, bool):
+                return "true" if expr.value else "false"
+            return str(expr.value)
+        case Variable():
+            return expr.name.lexeme
+        case Grouping():
+            return f"({format_expr(expr.expression)})"
+        case Unary():
+            return f"{expr.operator.lexeme}{format_expr(expr.right)}"
+        case Binary():
+            return f"{format_expr(expr.left)} {expr.operator.lexeme} {format_expr(expr.right)}"
+        case Assign():
+            return f"{expr.name.lexeme} = {format_expr(expr.value)}"
+        case Call():
+            arguments = ", ".join(format_expr(argument) for argument in expr.arguments)
+            return f"{format_expr(expr.callee)}({arguments})"
+        case Array():
+            return "[" + ", ".join(format_expr(element) for element in expr.elements) + "]"
+        case ArrayAccess():
+            return f"{format_expr(expr.array)}[{format_expr(expr.index)}]"
+        case ArrayAssign():
+            return f"{format_expr(expr.array)}[{format_expr(expr.index)}] = {format_expr(expr.value)}"
+    return type(expr).__name__
@@ -0,0 +1,82 @@
+import sys
+from collections import deque
+from typing import Callable, List, Optional
+
+# Characters collected before a write when stdout isn't a terminal
+DEFAULT_BUFFER = 8192
+
+class OutputSink:
+    """Where the lines an interpreter prints go.
+
+    Lines are echoed to sys.stdout (looked up at write time, so
+    contextlib.redirect_stdout works) in chunks of at least `buffer_size`
+    characters; 0 writes each line as it is printed, and None picks 0 for
+    a terminal and DEFAULT_BUFFER otherwise. Callbacks registered with
+    subscribe() get every chunk as it is written, echo or not.
+
+    Lines are also captured for Interpreter.output and get_output(): all
+    of them when `capture` is None, only the last `capture` lines when it
+    is a number (older ones are counted in `dropped`), none when it is 0.
+    """
+    def __init__(self, buffer_size: Optional[int] = None, capture: Optional[int] = None,
+                 echo: bool = True):
+        self.buffer_size = buffer_size
+        self.capture = capture
+        self.echo = echo
+        self.callbacks: List[Callable[[str], None]] = []
+        self.pending: List[str] = []
+        self.pending_size = 0
+        self.clear()
+
+    def clear(self):
+        """Drop the captured lines, writing out pending ones first"""
+        self.flush()
+        self.limit = self.buffer_size
+        if self.capture is None:
+            self.captured = []
+        elif self.capture > 0:
+            self.captured = deque(maxlen=self.capture)
+        else:
+            self.captured = None
+        self.dropped = 0
+
+    def subscribe(self, callback: Callable[[str], None]):
+        self.callbacks.append(callback)
+
+    def unsubscribe(self, callback: Callable[[str], None]):
+        self.callbacks.remove(callback)
+
+    def write(self, line: str):
+        captured = self.captured
+        if captured is not None:
+            if len(captured) == self.capture:
+                self.dropped += 1
+            captured.append(line)
+        self.pending.append(line)
+        self.pending_size += len(line) + 1
+        if self.limit is None:
+            self.limit = 0 if sys.stdout.isatty() else DEFAULT_BUFFER
+        if self.pending_size >= self.limit:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        chunk = "\n".join(self.pending) + "\n"
+        self.pending = []
+        self.pending_size = 0
+        if self.echo:
+            sys.stdout.write(chunk)
+            sys.stdout.flush()
+        for callback in self.callbacks:
+            callback(chunk)
+
+    @property
+    def lines(self) -> List[str]:
+        captured = self.captured
+        if captured is None:
+            return []
+        return captured if type(captured) is list else list(captured)
+
+    def text(self) -> str:
+        return "\n".join(self.lines)
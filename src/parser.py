@@ -1,28 +1,42 @@
-from typing import List, Optional
+from typing import Dict, Iterable, Iterator, List, Optional
 from .lexer import Token, TokenType
 from .ast import *
 
 class Parser:
-    def __init__(self, tokens: List[Token]):
-        self.tokens = tokens
-        self.current = 0
+    def __init__(self, tokens: Iterable[Token], lines: Optional[Dict[int, int]] = None):
+        # Tokens are pulled one at a time; the grammar only ever looks at
+        # the current and previous token, so any iterator works and only
+        # those two are held.
+        self.tokens = iter(tokens)
+        self.current_token = next(self.tokens)
+        self.previous_token: Optional[Token] = None
+        # When given, filled with id(statement) -> line the statement
+        # starts on (the profiler needs lines of nodes without tokens)
+        self.lines = lines
+        # Messages of the syntax errors met; the declarations they were
+        # in are skipped and parsing goes on after them
+        self.errors: List[str] = []
 
     def parse(self) -> List[Stmt]:
-        statements = []
+        return list(self.declarations())
+
+    def declarations(self) -> Iterator[Stmt]:
+        """Yield top-level declarations as soon as each one is parsed"""
         while not self.is_at_end():
             stmt = self.declaration()
             if stmt:
-                statements.append(stmt)
-        return statements
+                yield stmt
 
     def declaration(self) -> Optional[Stmt]:
         try:
+            line = self.peek().line
             if self.match(TokenType.FUNC):
-                return self.function("function")
+                return self.located(self.function("function"), line)
             if self.match(TokenType.VAR):
-                return self.var_declaration()
+                return self.located(self.var_declaration(), line)
             return self.statement()
-        except ParseError:
+        except ParseError as e:
+            self.errors.append(str(e))
             self.synchronize()
             return None
 
@@ -46,6 +60,17 @@ class Parser:
         return Function(name, parameters, body)
 
     def statement(self) -> Stmt:
+        if self.lines is not None:
+            line = self.peek().line
+            return self.located(self.unlocated_statement(), line)
+        return self.unlocated_statement()
+
+    def located(self, stmt: Stmt, line: int) -> Stmt:
+        if self.lines is not None:
+            self.lines.setdefault(id(stmt), line)
+        return stmt
+
+    def unlocated_statement(self) -> Stmt:
         if self.match(TokenType.FOR):
             return self.for_statement()
         if self.match(TokenType.IF):
@@ -61,6 +86,7 @@ class Parser:
         return self.expression_statement()
 
     def for_statement(self) -> Stmt:
+        line = self.previous().line
         self.consume(TokenType.LPAREN, "Expect '(' after 'for'.")
         
         # Initializer
@@ -92,7 +118,7 @@ class Parser:
         
         if not condition:
             condition = Literal(True)
-        body = While(condition, body)
+        body = self.located(While(condition, body), line)
         
         if initializer:
             body = Block([initializer, body])
@@ -302,17 +328,18 @@ class Parser:
 
     def advance(self) -> Token:
         if not self.is_at_end():
-            self.current += 1
-        return self.previous()
+            self.previous_token = self.current_token
+            self.current_token = next(self.tokens)
+        return self.previous_token
 
     def is_at_end(self) -> bool:
-        return self.peek().type == TokenType.EOF
+        return self.current_token.type == TokenType.EOF
 
     def peek(self) -> Token:
-        return self.tokens[self.current]
+        return self.current_token
 
     def previous(self) -> Token:
-        return self.tokens[self.current - 1]
+        return self.previous_token
 
     def consume(self, type: TokenType, message: str) -> Token:
         if self.check(type):
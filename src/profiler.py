@@ -0,0 +1,189 @@
+from dataclasses import fields
+from time import perf_counter_ns
+from typing import Any, Dict, List, Optional, Set
+from .ast import *
+from .interpreter import Frame, Interpreter
+from .lexer import Token
+
+class LineStats:
+    __slots__ = ("line", "count", "iterations", "total", "self_time", "active", "is_loop")
+
+    def __init__(self, line: int):
+        self.line = line
+        self.count = 0        # statements (other than blocks) run on this line
+        self.iterations = 0   # loop bodies run by while/for statements here
+        self.total = 0        # ns, including nested statements and calls
+        self.self_time = 0    # ns, excluding them
+        self.active = 0       # nesting depth, so recursion isn't counted twice
+        self.is_loop = False
+
+class FunctionStats:
+    __slots__ = ("name", "line", "calls", "total", "self_time", "active")
+
+    def __init__(self, name: str, line: int):
+        self.name = name
+        self.line = line
+        self.calls = 0
+        self.total = 0        # ns, including functions it calls
+        self.self_time = 0    # ns, excluding them
+        self.active = 0
+
+class ProfilingInterpreter(Interpreter):
+    """Tree-walking interpreter recording, for each MRT function and
+    source line, how often it ran and the total and self time it took.
+
+    Statements are timed in execute(), function calls in execute_block()
+    when it runs a function's body (which includes tail calls). Being a
+    separate engine, it costs the other engines nothing.
+
+    `lines` is the id(statement) -> line map filled in by
+    Parser(tokens, lines); statements missing from it (built by the
+    optimizer, say) use the line of their first token. `source` is only
+    used to show each line's text.
+    """
+    def __init__(self, lines: Optional[Dict[int, int]] = None, source: Optional[str] = None,
+                 **kwargs):
+        super().__init__(**kwargs)
+        self.lines = lines or {}
+        self.source = source
+        self.line_stats: Dict[int, LineStats] = {}
+        self.function_stats: List[FunctionStats] = []
+        self.statement_stats: Dict[int, LineStats] = {}
+        self.bodies: Dict[int, FunctionStats] = {}
+        # [statement, ns spent in nested statements and calls] per running
+        # statement, and ns spent in nested calls per running function
+        self.statements: List[list] = [[None, 0]]
+        self.calls: List[list] = [[0]]
+
+    def interpret(self, statements: List[Stmt]):
+        for statement in statements:
+            self.index(statement, 0)
+        super().interpret(statements)
+
+    def index(self, stmt: Stmt, enclosing_line: int):
+        line = self.lines.get(id(stmt)) or token_line(stmt) or enclosing_line
+        stats = self.line_stats.get(line)
+        if stats is None:
+            stats = self.line_stats[line] = LineStats(line)
+        stats.is_loop = stats.is_loop or isinstance(stmt, While)
+        self.statement_stats[id(stmt)] = stats
+        if isinstance(stmt, Function):
+            function = FunctionStats(stmt.name.lexeme, stmt.name.line)
+            self.function_stats.append(function)
+            self.bodies[id(stmt.body)] = function
+        for child in children(stmt):
+            if isinstance(child, Stmt):
+                self.index(child, line)
+
+    def execute(self, stmt: Stmt) -> Optional[tuple]:
+        stats = self.statement_stats.get(id(stmt))
+        if stats is None:
+            self.index(stmt, 0)
+            stats = self.statement_stats[id(stmt)]
+        statements = self.statements
+        parent = statements[-1][0]
+        if type(parent) is While and parent.body is stmt:
+            self.statement_stats[id(parent)].iterations += 1
+
+        entry = [stmt, 0]
+        statements.append(entry)
+        if type(stmt) is not Block:
+            stats.count += 1
+        stats.active += 1
+        start = perf_counter_ns()
+        try:
+            return super().execute(stmt)
+        finally:
+            elapsed = perf_counter_ns() - start
+            statements.pop()
+            statements[-1][1] += elapsed
+            stats.active -= 1
+            if not stats.active:
+                stats.total += elapsed
+            stats.self_time += elapsed - entry[1]
+
+    def counted_loop(self, loop: While) -> Optional[tuple]:
+        # Run as written, so iterations and increments are timed per line
+        return self.while_loop(loop)
+
+    def execute_block(self, statements: List[Stmt], frame: Frame) -> Optional[tuple]:
+        function = self.bodies.get(id(statements))
+        if function is None:
+            return super().execute_block(statements, frame)
+
+        # The body's statements are timed against the function, not the
+        # line that called it
+        running = self.statements
+        running.append([None, 0])
+        entry = [0]
+        self.calls.append(entry)
+        function.calls += 1
+        function.active += 1
+        start = perf_counter_ns()
+        try:
+            return super().execute_block(statements, frame)
+        finally:
+            elapsed = perf_counter_ns() - start
+            running.pop()
+            running[-1][1] += elapsed
+            self.calls.pop()
+            self.calls[-1][0] += elapsed
+            function.active -= 1
+            if not function.active:
+                function.total += elapsed
+            function.self_time += elapsed - entry[0]
+
+    def profile(self) -> Dict[str, Any]:
+        """The statistics as JSON-ready data, slowest first, in milliseconds"""
+        source_lines = self.source.splitlines() if self.source is not None else []
+        functions = sorted((f for f in self.function_stats if f.calls),
+                           key=lambda f: f.self_time, reverse=True)
+        lines = sorted((s for s in self.line_stats.values() if s.count),
+                       key=lambda s: s.self_time, reverse=True)
+        return {
+            "functions": [{
+                "name": f.name,
+                "line": f.line,
+                "calls": f.calls,
+                "total_ms": f.total / 1e6,
+                "self_ms": f.self_time / 1e6,
+            } for f in functions],
+            "lines": [{
+                "line": s.line,
+                "count": s.count,
+                "iterations": s.iterations if s.is_loop else None,
+                "total_ms": s.total / 1e6,
+                "self_ms": s.self_time / 1e6,
+                "source": (source_lines[s.line - 1].strip()
+                           if 0 < s.line <= len(source_lines) else None),
+            } for s in lines],
+        }
+
+def token_line(node: Any) -> Optional[int]:
+    """The smallest line number of any token under node"""
+    lines = [value.line for child in walk([node]) for field in fields(child)
+             if isinstance(value := getattr(child, field.name), Token)]
+    lines += [param.line for child in walk([node]) if isinstance(child, Function)
+              for param in child.params]
+    return min(lines, default=None)
+
+def format_profile(profile: Dict[str, Any], limit: Optional[int] = None) -> str:
+    """Render profile() as two tables, keeping the `limit` slowest rows"""
+    function_rows = [[f["name"], f["line"], f["calls"], f"{f['total_ms']:.2f}", f"{f['self_ms']:.2f}"]
+                     for f in profile["functions"][:limit]]
+    line_rows = [[s["line"], s["count"], "" if s["iterations"] is None else s["iterations"],
+                  f"{s['total_ms']:.2f}", f"{s['self_ms']:.2f}", s["source"] or ""]
+                 for s in profile["lines"][:limit]]
+    return "\n\n".join([
+        format_table(["function", "line", "calls", "total ms", "self ms"], function_rows, left={0})
+        if function_rows else "no functions were called",
+        format_table(["line", "count", "iterations", "total ms", "self ms", "source"], line_rows, left={5}),
+    ])
+
+def format_table(columns: List[str], rows: List[list], left: Set[int]) -> str:
+    table = [columns] + [[str(cell) for cell in row] for row in rows]
+    widths = [max(len(row[i]) for row in table) for i in range(len(columns))]
+    return "\n".join(
+        "  ".join(cell.ljust(width) if i in left else cell.rjust(width)
+                  for i, (cell, width) in enumerate(zip(row, widths))).rstrip()
+        for row in table)
@@ -0,0 +1,142 @@
+from collections import Counter
+from typing import Dict, List, Set
+from .ast import *
+
+# Builtins that neither mutate their arguments nor produce output
+PURE_BUILTINS = {
+    "len", "slice", "join", "indexOf", "split", "substring", "toUpper",
+    "toLower", "trim", "replace", "startsWith", "endsWith", "contains",
+    "sum", "min", "max",
+}
+
+def mark_pure_functions(statements: List[Stmt]) -> List[Function]:
+    """Set Function.pure on every function whose result depends only on
+    its arguments, and return those functions. Needs a resolved AST.
+
+    A pure function doesn't print, doesn't assign variables outside its
+    own frames, doesn't mutate arrays (index assignment, push or pop) and
+    only calls pure functions and pure builtins. Free variables it reads
+    must be functions or constants: names declared exactly once in the
+    program, never assigned, and (for var) initialized to a constant.
+    Names are matched program-wide, which errs on the side of impurity.
+    """
+    functions: List[Function] = []
+    declarations: Counter = Counter()
+    assigned: Set[str] = set()
+    constant_vars: Set[str] = set()
+    for node in walk(statements):
+        if isinstance(node, Function):
+            functions.append(node)
+            declarations[node.name.lexeme] += 1
+            declarations.update(param.lexeme for param in node.params)
+        elif isinstance(node, Var):
+            declarations[node.name.lexeme] += 1
+            if node.initializer and is_constant(node.initializer):
+                constant_vars.add(node.name.lexeme)
+        elif isinstance(node, Assign):
+            assigned.add(node.name.lexeme)
+
+    def unique(name: str) -> bool:
+        return declarations[name] == 1 and name not in assigned
+
+    by_name: Dict[str, Function] = {
+        function.name.lexeme: function for function in functions if unique(function.name.lexeme)}
+    readable = {name for name in constant_vars if unique(name)} | set(by_name)
+
+    # Check each body on its own, then drop functions calling impure ones
+    # until nothing changes.
+    callees: Dict[int, Set[str]] = {}
+    pure: Dict[int, Function] = {}
+    for function in functions:
+        calls: Set[str] = set()
+        if all(body_is_pure(statement, 0, readable, declarations, calls)
+               for statement in function.body):
+            callees[id(function)] = calls
+            pure[id(function)] = function
+
+    changed = True
+    while changed:
+        changed = False
+        for key, function in list(pure.items()):
+            for name in callees[key]:
+                if name in by_name:
+                    if id(by_name[name]) not in pure:
+                        break
+                elif name not in PURE_BUILTINS or name in declarations:
+                    break
+            else:
+                continue
+            del pure[key]
+            changed = True
+
+    for function in functions:
+        function.pure = id(function) in pure
+    return list(pure.values())
+
+def body_is_pure(node, inside: int, readable: Set[str], declarations: Counter,
+                 calls: Set[str]) -> bool:
+    """Check one statement or expression of a function body. `inside` is
+    the number of block frames between it and the function's own frame."""
+    def check(child, depth=inside):
+        return body_is_pure(child, depth, readable, declarations, calls)
+
+    def is_free(depth) -> bool:
+        return depth is None or depth > inside
+
+    match node:
+        case Block():
+            depth = inside + 1 if node.frame_size else inside
+            return all(check(statement, depth) for statement in node.statements)
+        case Expression():
+            return check(node.expression)
+        case Function():
+            return True  # the body only runs when called
+        case If():
+            return (check(node.condition) and check(node.then_branch)
+                    and (node.else_branch is None or check(node.else_branch)))
+        case Print() | ArrayAssign():
+            return False
+        case Return():
+            return node.value is None or check(node.value)
+        case Var():
+            return node.initializer is None or check(node.initializer)
+        case While():
+            return check(node.condition) and check(node.body)
+        case Array():
+            return all(check(element) for element in node.elements)
+        case ArrayAccess():
+            return check(node.array) and check(node.index)
+        case Assign():
+            return not is_free(node.depth) and check(node.value)
+        case Binary():
+            return check(node.left) and check(node.right)
+        case Call():
+            if not isinstance(node.callee, Variable):
+                return False
+            name = node.callee.name.lexeme
+            if is_free(node.callee.depth) or name in readable:
+                calls.add(name)
+            else:
+                return False  # a parameter or local holding some function
+            return all(check(argument) for argument in node.arguments)
+        case Grouping():
+            return check(node.expression)
+        case Unary():
+            return check(node.right)
+        case Variable():
+            name = node.name.lexeme
+            return (not is_free(node.depth) or name in readable
+                    or (name in PURE_BUILTINS and name not in declarations))
+    return True
+
+def is_constant(expr: Expr) -> bool:
+    match expr:
+        case Literal():
+            return not isinstance(expr.value, list)
+        case Grouping():
+            return is_constant(expr.expression)
+        case Unary():
+            return is_constant(expr.right)
+        case Binary():
+            return is_constant(expr.left) and is_constant(expr.right)
+    return False
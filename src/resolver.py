@@ -0,0 +1,208 @@
+from typing import Dict, List, Optional
+from .ast import *
+from .lexer import TokenType
+
+COMPARISONS = (TokenType.GREATER, TokenType.GREATER_EQUAL, TokenType.LESS, TokenType.LESS_EQUAL)
+
+class Scope:
+    """Compile-time view of one runtime frame"""
+    def __init__(self):
+        self.slots: Dict[str, int] = {}
+        self.pending: List[Function] = []
+        # slot -> number of Assign expressions, anywhere, targeting it
+        self.assignments: Dict[int, int] = {}
+
+    def declare(self, name: str) -> int:
+        # Slot 0 of every frame holds the enclosing frame. Redeclaring a
+        # name reuses its slot, just like Environment.define overwrote it.
+        if name not in self.slots:
+            self.slots[name] = len(self.slots) + 1
+        return self.slots[name]
+
+    @property
+    def size(self) -> int:
+        return len(self.slots)
+
+class Resolver:
+    """Static pass that binds every local variable to a (depth, slot) pair.
+
+    Top-level names stay in the globals dictionary. Function bodies and
+    blocks that declare something get a frame; blocks that declare nothing
+    run in the enclosing frame and are invisible to depth counting.
+    Nested function bodies are resolved when their enclosing scope closes,
+    so sibling functions can call each other regardless of declaration
+    order. Top-level statements are independent of each other, so they can
+    be resolved one at a time as they are parsed.
+    """
+    def __init__(self):
+        self.scopes: List[Scope] = []
+        self.function_depth = 0
+
+    def resolve(self, statements: List[Stmt]) -> List[Stmt]:
+        for statement in statements:
+            self.statement(statement)
+        return statements
+
+    def statement(self, stmt: Stmt):
+        match stmt:
+            case Block():
+                if declares_names(stmt.statements):
+                    scope = self.begin_scope()
+                    for statement in stmt.statements:
+                        self.statement(statement)
+                    self.end_scope()
+                    stmt.frame_size = scope.size
+                    loop = counted_loop(stmt)
+                    if loop:
+                        # Only now are nested function bodies resolved too
+                        slot = stmt.statements[0].slot
+                        loop.counted = (scope.assignments.get(slot) == 1 and loop.condition.left.depth == 0
+                                        and loop.condition.left.slot == slot)
+                else:
+                    stmt.frame_size = 0
+                    for statement in stmt.statements:
+                        self.statement(statement)
+            case Expression():
+                self.expression(stmt.expression)
+            case Function():
+                stmt.slot = self.declare(stmt.name.lexeme)
+                if self.scopes:
+                    self.scopes[-1].pending.append(stmt)
+                else:
+                    # Globals are looked up by name at runtime, so nothing
+                    # declared later can change how this body resolves.
+                    self.function_body(stmt)
+            case If():
+                self.expression(stmt.condition)
+                self.statement(stmt.then_branch)
+                if stmt.else_branch:
+                    self.statement(stmt.else_branch)
+            case Print():
+                self.expression(stmt.expression)
+            case Return():
+                if stmt.value:
+                    self.expression(stmt.value)
+                # Nothing runs after a return, so any returned call inside
+                # a function is in tail position.
+                stmt.tail_call = self.function_depth > 0 and isinstance(stmt.value, Call)
+            case Var():
+                if stmt.initializer:
+                    self.expression(stmt.initializer)
+                stmt.slot = self.declare(stmt.name.lexeme)
+            case While():
+                stmt.counted = False
+                self.expression(stmt.condition)
+                self.statement(stmt.body)
+
+    def expression(self, expr: Expr):
+        match expr:
+            case Array():
+                for element in expr.elements:
+                    self.expression(element)
+            case ArrayAccess():
+                self.expression(expr.array)
+                self.expression(expr.index)
+            case ArrayAssign():
+                self.expression(expr.array)
+                self.expression(expr.index)
+                self.expression(expr.value)
+            case Assign():
+                self.expression(expr.value)
+                expr.depth, expr.slot = self.lookup(expr.name.lexeme)
+                if expr.depth is not None:
+                    assignments = self.scopes[-1 - expr.depth].assignments
+                    assignments[expr.slot] = assignments.get(expr.slot, 0) + 1
+            case Binary():
+                self.expression(expr.left)
+                self.expression(expr.right)
+            case Call():
+                self.expression(expr.callee)
+                for argument in expr.arguments:
+                    self.expression(argument)
+            case Grouping():
+                self.expression(expr.expression)
+            case Unary():
+                self.expression(expr.right)
+            case Variable():
+                expr.depth, expr.slot = self.lookup(expr.name.lexeme)
+
+    def function_body(self, function: Function):
+        self.function_depth += 1
+        scope = self.begin_scope()
+        for param in function.params:
+            scope.declare(param.lexeme)
+        for statement in function.body:
+            self.statement(statement)
+        self.end_scope()
+        self.function_depth -= 1
+        function.frame_size = scope.size
+
+    def begin_scope(self) -> Scope:
+        scope = Scope()
+        self.scopes.append(scope)
+        return scope
+
+    def end_scope(self):
+        scope = self.scopes[-1]
+        # Resolve nested function bodies while this scope is still visible
+        for function in scope.pending:
+            self.function_body(function)
+        scope.pending = []
+        self.scopes.pop()
+
+    def declare(self, name: str) -> Optional[int]:
+        if not self.scopes:
+            return None
+        return self.scopes[-1].declare(name)
+
+    def lookup(self, name: str) -> tuple:
+        for depth, scope in enumerate(reversed(self.scopes)):
+            if name in scope.slots:
+                return depth, scope.slots[name]
+        return None, 0
+
+def declares_names(statements: List[Stmt]) -> bool:
+    return any(isinstance(statement, (Var, Function)) for statement in statements)
+
+def counted_loop(block: Block) -> Optional[While]:
+    """The While of `for (var i = ...; i < limit; i = i + step)`, as
+    Parser.for_statement desugars it into block, if block is one.
+
+    The comparison may be any of < <= > >=, step must be a number literal
+    and `i = i - step` also counts. The Resolver then checks the names
+    bind to the loop's own variable and that nothing else assigns it.
+    Code the Optimizer hoisted out of the loop (temporaries and the If
+    guarding them) may sit between the declaration and the loop.
+    """
+    if len(block.statements) < 2:
+        return None
+    declaration, *hoisted, loop = block.statements
+    if type(declaration) is not Var or type(loop) is not While:
+        return None
+    if not all(type(stmt) in (Var, If) for stmt in hoisted):
+        return None
+    name = declaration.name.lexeme
+    condition, body = loop.condition, loop.body
+    if not (type(condition) is Binary and condition.operator.type in COMPARISONS
+            and type(condition.left) is Variable and condition.left.name.lexeme == name):
+        return None
+    if not (type(body) is Block and len(body.statements) == 2 and not body.frame_size
+            and type(body.statements[1]) is Expression):
+        return None
+    increment = body.statements[1].expression
+    if not (type(increment) is Assign and increment.name.lexeme == name
+            and type(increment.value) is Binary
+            and increment.value.operator.type in (TokenType.PLUS, TokenType.MINUS)):
+        return None
+    step = increment.value
+    if not (type(step.left) is Variable and step.left.name.lexeme == name
+            and type(step.right) is Literal and type(step.right.value) is float):
+        return None
+    return loop
+
+def loop_counter(loop: While) -> tuple:
+    """(slot, comparison, limit, step, body) of a loop marked counted"""
+    body, increment = loop.body.statements
+    step = increment.expression.value
+    delta = step.right.value if step.operator.type == TokenType.PLUS else -step.right.value
+    return loop.condition.left.slot, loop.condition.operator.type, loop.condition.right, delta, body
@@ -0,0 +1,140 @@
+from collections import deque
+from time import perf_counter
+from typing import Any, Dict, List, Optional
+from .ast import Stmt
+from .lexer import Lexer
+from .output import OutputSink
+from .parser import Parser
+from .vm import VM
+
+# Steps (loop iterations and calls) a program runs per turn
+DEFAULT_SLICE = 1000
+
+class Program:
+    """One program run in turns by a Scheduler, on a VM of its own.
+
+    `max_steps` and `max_seconds` are quotas over the whole run; a program
+    exceeding one is stopped with a runtime error. Steps are counted where
+    the VM checks its budget, so a single long builtin call (sorting a
+    huge array, say) can overrun a quota by the time it takes.
+    """
+    def __init__(self, statements: List[Stmt], name: str = "<program>",
+                 max_steps: Optional[int] = None, max_seconds: Optional[float] = None,
+                 memo_size: int = 0, output_sink: Optional[OutputSink] = None):
+        self.name = name
+        self.max_steps = max_steps
+        self.max_seconds = max_seconds
+        self.vm = VM(memo_size=memo_size,
+                     output_sink=output_sink or OutputSink(capture=None, echo=False))
+        self.vm.refill = self.refill
+        self.steps = 0
+        self.seconds = 0.0
+        self.turns = 0
+        # Steps given to the VM in the current turn, and when it started
+        self.granted = 0
+        self.slice = 0
+        self.turn_start = 0.0
+        self.vm.begin(statements)
+
+    @property
+    def finished(self) -> bool:
+        return self.vm.suspended is None
+
+    @property
+    def error(self) -> Optional[str]:
+        return self.vm.error
+
+    @property
+    def output(self) -> List[str]:
+        return self.vm.output
+
+    def turn(self, steps: int) -> bool:
+        """Run for `steps` more steps; True once the program has ended"""
+        self.slice = self.granted = steps
+        self.turn_start = perf_counter()
+        self.turns += 1
+        try:
+            finished = self.vm.step(steps)
+        finally:
+            self.seconds += perf_counter() - self.turn_start
+            self.steps += self.granted - self.vm.budget
+        if not finished and (message := self.over_quota(self.seconds)):
+            self.vm.abort(message)
+        return self.finished
+
+    def refill(self) -> int:
+        # A nested dispatch loop used up its steps: it can't be suspended,
+        # so it goes on with another slice unless a quota is used up
+        self.steps += self.granted + 1
+        message = self.over_quota(self.seconds + perf_counter() - self.turn_start)
+        if message:
+            raise RuntimeError(message)
+        self.granted = self.slice
+        return self.slice
+
+    def over_quota(self, seconds: float) -> Optional[str]:
+        if self.max_steps is not None and self.steps > self.max_steps:
+            return f"Step quota of {self.max_steps} exceeded."
+        if self.max_seconds is not None and seconds > self.max_seconds:
+            return f"Time quota of {self.max_seconds:g}s exceeded."
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "finished": self.finished,
+            "error": self.error,
+            "steps": self.steps,
+            "seconds": self.seconds,
+            "turns": self.turns,
+        }
+
+class Scheduler:
+    """Round-robin scheduler running many programs in one thread.
+
+    Each turn runs the next ready program for `slice_steps` steps, then
+    moves it to the back of the queue, so a program that never ends only
+    slows the others down instead of blocking them.
+    """
+    def __init__(self, slice_steps: int = DEFAULT_SLICE):
+        self.slice_steps = slice_steps
+        self.ready: deque = deque()
+        self.done: List[Program] = []
+
+    def add(self, program: Program) -> Program:
+        if program.finished:
+            self.done.append(program)
+        else:
+            self.ready.append(program)
+        return program
+
+    def spawn(self, source: str, name: str = "<program>", **options) -> Program:
+        """Parse source and schedule it; options are Program's quotas and
+        output settings. A syntax error ends the program right away."""
+        try:
+            parser = Parser(Lexer(source).scan_tokens())
+            statements = parser.parse()
+            error = parser.errors[0] if parser.errors else None
+        except Exception as e:
+            error = str(e)
+        if error is not None:
+            program = Program([], name, **options)
+            program.vm.abort(error)
+            return self.add(program)
+        return self.add(Program(statements, name, **options))
+
+    def run_turn(self) -> bool:
+        """Give the next ready program one turn; False when none is left"""
+        if not self.ready:
+            return False
+        program = self.ready.popleft()
+        if program.turn(self.slice_steps):
+            self.done.append(program)
+        else:
+            self.ready.append(program)
+        return True
+
+    def run(self):
+        """Run turns until every program has ended"""
+        while self.run_turn():
+            pass
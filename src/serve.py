@@ -0,0 +1,354 @@
+import argparse
+import asyncio
+import ctypes
+import json
+import os
+import signal
+import stat
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from .__main__ import ENGINES, parse
+from .ast import Stmt
+from .interpreter import Interpreter
+from .cache import source_hash
+from .lexer import pragmas
+from .memo import DEFAULT_SIZE
+from .optimizer import Optimizer
+from .output import OutputSink
+from .snapshot import Snapshot
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 7717
+# Parsed programs kept in memory
+DEFAULT_CACHE_SIZE = 256
+# Threads running programs; a long program doesn't hold up short ones
+DEFAULT_THREADS = 4
+# Seconds a request may run before it is stopped and answered with a timeout
+DEFAULT_TIMEOUT = 10.0
+# Seconds between the watchdog's checks for requests past their deadline
+WATCHDOG_INTERVAL = 0.05
+# Most recent request latencies the percentiles are computed over
+LATENCY_WINDOW = 10000
+# Longest request line accepted, in bytes
+MAX_REQUEST = 16 * 1024 * 1024
+
+class ProgramCache:
+    """LRU cache of parsed (and optimized) programs, keyed by the sha256
+    of their source, with statistics. Safe to use from several threads."""
+    def __init__(self, max_size: int = DEFAULT_CACHE_SIZE, opt_level: int = 0):
+        self.max_size = max_size
+        self.opt_level = opt_level
+        # source hash -> (statements, memo size)
+        self.entries: OrderedDict = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, source: str) -> Tuple[List[Stmt], int, bool]:
+        """The program's statements and memo size, and whether they were cached"""
+        key = source_hash(source)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.hits += 1
+                self.entries.move_to_end(key)
+                return (*entry, True)
+            self.misses += 1
+
+        # Parsed outside the lock, so a big program doesn't stall the others.
+        # A syntax error is raised, so broken programs are never cached.
+        statements = parse(source, strict=True)
+        if self.opt_level:
+            statements = Optimizer(self.opt_level).optimize(statements)
+        entry = (statements, DEFAULT_SIZE if "memoize" in pragmas(source) else 0)
+        with self.lock:
+            self.entries[key] = entry
+            if len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+        return (*entry, False)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """p50, p90, p99 and max of the samples (nearest rank)"""
+    ordered = sorted(samples)
+    if not ordered:
+        return {"p50": 0.0, "p90": 0.0, "p99": 0.0, "max": 0.0}
+    rank = lambda p: ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+    return {"p50": rank(0.50), "p90": rank(0.90), "p99": rank(0.99), "max": ordered[-1]}
+
+class RequestTimeout(BaseException):
+    """Raised in a worker thread whose request ran past its deadline. A
+    BaseException, so the interpreter's own `except Exception` doesn't
+    swallow it."""
+
+def interrupt(thread_id: int, exception: Optional[type] = RequestTimeout):
+    """Raise the exception in another thread at its next bytecode (CPython
+    only); None clears one raised but not delivered yet. A thread stuck in
+    a single long builtin call only sees it once the call returns."""
+    ctypes.pythonapi.PyThreadState_SetAsyncExc(
+        ctypes.c_ulong(thread_id), ctypes.py_object(exception) if exception else None)
+
+class Server:
+    """Runs MRT programs sent over a socket, one JSON object per line each way.
+
+    A request is {"source": "...", "id": ..., "engine": ...}, where id and
+    engine are optional. The reply echoes the id and holds status ("ok",
+    "error" or "timeout"), output, error, cached (whether the parsed
+    program came from the cache) and ms, the time taken. A {"stats": true}
+    request is answered with the request count, cache hit rate and latency
+    percentiles instead.
+
+    Parsed programs are shared between requests. Every request runs in a
+    new Interpreter of its own, so no globals or output carry over from
+    one request to the next. With a prelude, that interpreter is a clone
+    of a Snapshot that ran the prelude once, per engine.
+
+    A request still running `timeout` seconds after it started is stopped
+    by a watchdog on the event loop, so a program that never ends only
+    holds its thread until then. Stopping the server stops every request
+    still running the same way.
+    """
+    def __init__(self, engine: str = "tree", opt_level: int = 0,
+                 cache_size: int = DEFAULT_CACHE_SIZE, threads: int = DEFAULT_THREADS,
+                 prelude: Optional[str] = None, timeout: Optional[float] = DEFAULT_TIMEOUT):
+        self.engine = engine
+        self.timeout = timeout
+        self.prelude = prelude
+        self.snapshots: Dict[str, Snapshot] = {}
+        if prelude is not None:
+            # Made now so a broken prelude stops the server from starting
+            self.snapshot(engine)
+        self.programs = ProgramCache(cache_size, opt_level)
+        self.executor = ThreadPoolExecutor(threads, thread_name_prefix="mrt-serve")
+        # Worker thread id -> deadline of the request it runs, None once stopped
+        self.running: Dict[int, Optional[float]] = {}
+        self.lock = threading.Lock()
+        self.latencies: deque = deque(maxlen=LATENCY_WINDOW)
+        self.requests = 0
+        self.errors = 0
+
+    def run(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Answer one program request, on an executor thread"""
+        start = time.perf_counter()
+        output_sink = OutputSink(capture=None, echo=False)
+        reply = {"id": request.get("id"), "status": "ok", "output": "", "error": None,
+                 "cached": False}
+        thread_id = threading.get_ident()
+        with self.lock:
+            self.running[thread_id] = start + self.timeout if self.timeout else float("inf")
+        try:
+            source = request.get("source")
+            engine = request.get("engine", self.engine)
+            if not isinstance(source, str):
+                raise ValueError("Request has no 'source' string.")
+            if engine not in ENGINES:
+                raise ValueError(f"Unknown engine '{engine}'.")
+            statements, memo_size, reply["cached"] = self.programs.get(source)
+            interpreter = self.interpreter(engine, memo_size, output_sink)
+            interpreter.interpret(statements)
+            if interpreter.error is not None:
+                # The last captured line is the "Runtime Error: ..." report
+                output_sink.captured.pop()
+                reply.update(status="error", error=interpreter.error)
+        except RequestTimeout:
+            reply.update(status="timeout", error=self.timeout_message())
+        except Exception as e:
+            reply.update(status="error", error=str(e))
+        finally:
+            with self.lock:
+                del self.running[thread_id]
+                # The watchdog may have stopped the request just as it ended
+                interrupt(thread_id, None)
+        reply["output"] = output_sink.text()
+        reply["ms"] = (time.perf_counter() - start) * 1000
+        return reply
+
+    def timeout_message(self) -> str:
+        if self.timeout:
+            return f"Timed out after {self.timeout:g}s."
+        return "Stopped by the server shutting down."
+
+    def stop_overdue(self, now: Optional[float] = None):
+        """Stop the requests whose deadline is before now (all by default)"""
+        with self.lock:
+            for thread_id, deadline in self.running.items():
+                if deadline is not None and (now is None or deadline < now):
+                    interrupt(thread_id)
+                    self.running[thread_id] = None
+
+    async def watchdog(self):
+        while True:
+            await asyncio.sleep(WATCHDOG_INTERVAL)
+            self.stop_overdue(time.perf_counter())
+
+    def snapshot(self, engine: str) -> Snapshot:
+        snapshot = self.snapshots.get(engine)
+        if snapshot is None:
+            memo_size = DEFAULT_SIZE if "memoize" in pragmas(self.prelude) else 0
+            snapshot = self.snapshots[engine] = Snapshot(self.prelude, engine, memo_size)
+        return snapshot
+
+    def interpreter(self, engine: str, memo_size: int, output_sink: OutputSink) -> Interpreter:
+        if self.prelude is None:
+            return ENGINES[engine](memo_size=memo_size, output_sink=output_sink)
+        interpreter = self.snapshot(engine).clone(output_sink)
+        interpreter.memo_size = memo_size
+        return interpreter
+
+    def record(self, reply: Dict[str, Any]):
+        # Only called on the event loop's thread, so the counts need no lock
+        self.requests += 1
+        if reply["status"] != "ok":
+            self.errors += 1
+        if "ms" in reply:
+            self.latencies.append(reply["ms"])
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "cache": self.programs.stats(),
+            "latency_ms": percentiles(list(self.latencies)),
+        }
+
+    async def answer(self, line: bytes) -> Dict[str, Any]:
+        try:
+            request = json.loads(line)
+        except ValueError:
+            request = None
+        if not isinstance(request, dict):
+            reply = {"id": None, "status": "error", "output": "",
+                     "error": "Request is not a JSON object."}
+        elif request.get("stats"):
+            return self.stats()
+        else:
+            try:
+                reply = await asyncio.get_running_loop().run_in_executor(self.executor, self.run, request)
+            except RequestTimeout:
+                # Stopped after run() had already caught its exceptions
+                reply = {"id": request.get("id"), "status": "timeout", "output": "",
+                         "error": self.timeout_message()}
+        self.record(reply)
+        return reply
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Answer the requests on one connection, in order"""
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    reply = {"id": None, "status": "error",
+                             "error": f"Request is longer than {MAX_REQUEST} bytes."}
+                    writer.write(json.dumps(reply).encode() + b"\n")
+                    break
+                if not line:
+                    break
+                if line.strip():
+                    reply = await self.answer(line)
+                    writer.write(json.dumps(reply).encode() + b"\n")
+                    await writer.drain()
+        except ConnectionError:
+            pass
+        except asyncio.CancelledError:
+            pass  # The server is stopping
+        finally:
+            writer.close()
+
+    async def serve(self, socket_path: Optional[str] = None, host: str = DEFAULT_HOST,
+                    port: int = DEFAULT_PORT):
+        """Listen on the Unix socket if given, else on host:port, until SIGINT or SIGTERM"""
+        if socket_path:
+            # A socket file left behind by a server that didn't exit cleanly
+            if os.path.exists(socket_path) and stat.S_ISSOCK(os.stat(socket_path).st_mode):
+                os.unlink(socket_path)
+            server = await asyncio.start_unix_server(self.handle, socket_path, limit=MAX_REQUEST)
+            where = socket_path
+        else:
+            server = await asyncio.start_server(self.handle, host, port, limit=MAX_REQUEST)
+            where = f"{host}:{port}"
+
+        stopping = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signum, stopping.set)
+            except (NotImplementedError, RuntimeError):
+                pass  # Windows: Ctrl-C still stops asyncio.run()
+        print(f"mrt serve: listening on {where}", file=sys.stderr)
+        watchdog = asyncio.create_task(self.watchdog())
+        try:
+            async with server:
+                await stopping.wait()
+        finally:
+            watchdog.cancel()
+            # Requests still running would keep the interpreter from
+            # exiting, as it joins the executor's threads
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.stop_overdue()
+            if socket_path and os.path.exists(socket_path):
+                os.unlink(socket_path)
+
+def format_stats(stats: Dict[str, Any]) -> str:
+    cache = stats["cache"]
+    latency = stats["latency_ms"]
+    return (f"serve: {stats['requests']} requests, {stats['errors']} errors; "
+            f"program cache {cache['hits']} hits, {cache['misses']} misses "
+            f"({cache['hit_rate']:.1%}), {cache['evictions']} evictions; latency "
+            + ", ".join(f"{name} {ms:.2f} ms" for name, ms in latency.items()))
+
+def main(argv: Optional[List[str]] = None):
+    arg_parser = argparse.ArgumentParser(
+        prog="mrt serve",
+        description="Run MRT programs sent as JSON lines over a Unix socket or local TCP port, "
+                    "keeping parsed programs in memory.")
+    arg_parser.add_argument("--socket", metavar="PATH", help="listen on a Unix socket at PATH")
+    arg_parser.add_argument("--host", default=DEFAULT_HOST,
+                            help=f"TCP address to listen on (default: {DEFAULT_HOST})")
+    arg_parser.add_argument("--port", type=int, default=DEFAULT_PORT,
+                            help=f"TCP port to listen on (default: {DEFAULT_PORT})")
+    arg_parser.add_argument("--engine", choices=sorted(ENGINES), default="tree",
+                            help="engine for requests that don't name one (default: tree)")
+    arg_parser.add_argument("-O", dest="opt_level", type=int, choices=[0, 1, 2], default=0,
+                            help="optimization level (default: 0)")
+    arg_parser.add_argument("--cache-size", type=int, default=DEFAULT_CACHE_SIZE, metavar="N",
+                            help=f"parsed programs kept in memory (default: {DEFAULT_CACHE_SIZE})")
+    arg_parser.add_argument("--threads", type=int, default=DEFAULT_THREADS, metavar="N",
+                            help=f"threads running programs (default: {DEFAULT_THREADS})")
+    arg_parser.add_argument("--prelude", metavar="PATH",
+                            help="library code run once at startup, whose definitions every "
+                                 "program can use (tree, vm and jit engines)")
+    arg_parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, metavar="SECONDS",
+                            help=f"stop a request after this long and answer it with a timeout; "
+                                 f"0 for no limit (default: {DEFAULT_TIMEOUT:g})")
+    args = arg_parser.parse_args(argv)
+
+    prelude = None
+    if args.prelude:
+        with open(args.prelude, 'r') as file:
+            prelude = file.read()
+    try:
+        server = Server(args.engine, args.opt_level, args.cache_size, args.threads, prelude,
+                        args.timeout)
+    except (ValueError, RuntimeError) as e:
+        arg_parser.error(f"--prelude: {e}")
+    try:
+        asyncio.run(server.serve(args.socket, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    print(format_stats(server.stats()), file=sys.stderr)
@@ -0,0 +1,108 @@
+from typing import Any, Callable, Dict, List, Optional, Union
+from .__main__ import ENGINES, parse
+from .arrays import NumberArray
+from .ast import Function, Stmt
+from .closures import CompiledFunction
+from .interpreter import Interpreter, MRTFunction
+from .memo import MemoCache
+from .output import OutputSink
+from .strings import StringBuilder
+from .vm import VMFunction
+
+# Engines whose functions run in whichever interpreter calls them. The
+# closure and python engines compile functions against the globals of
+# the interpreter that defined them, so clones can't share them.
+SNAPSHOT_ENGINES = ("tree", "vm", "jit")
+FUNCTION_TYPES = (MRTFunction, VMFunction, CompiledFunction)
+
+def is_mutable(value: Any) -> bool:
+    """Whether a program could change the value in place: arrays, functions
+    closed over local variables (their frames) and memoized functions
+    (their result caches)"""
+    if isinstance(value, FUNCTION_TYPES):
+        return value.closure is not None or value.memo is not None
+    return isinstance(value, (list, NumberArray))
+
+def copy_value(value: Any, copies: Dict[int, Any],
+               memo_cache: Callable[[Function], Optional[MemoCache]]) -> Any:
+    """A copy of a value sharing nothing mutable with it. Arrays and frames
+    (both lists) are copied deeply; `copies` maps the id of everything
+    copied so far to its copy, so values shared before stay shared.
+    Memoized functions get the cache memo_cache() returns for them."""
+    copy = copies.get(id(value))
+    if copy is not None:
+        return copy
+    kind = type(value)
+    if kind is list:
+        copy = copies[id(value)] = []
+        copy.extend(copy_value(item, copies, memo_cache) for item in value)
+    elif kind is NumberArray:
+        copy = copies[id(value)] = NumberArray()
+        items = value.items
+        copy.items = ([copy_value(item, copies, memo_cache) for item in items]
+                      if type(items) is list else items[:])
+    elif kind is StringBuilder:
+        # Its buffer is shared and appended to by whoever extends it
+        return str(value)
+    elif kind in FUNCTION_TYPES and is_mutable(value):
+        copy = copies[id(value)] = object.__new__(kind)
+        copy.__dict__.update(value.__dict__)
+        if value.closure is not None:
+            copy.closure = copy_value(value.closure, copies, memo_cache)
+        if value.memo is not None:
+            copy.memo = memo_cache(value.proto.declaration if kind is VMFunction else value.declaration)
+    else:
+        return value
+    return copy
+
+class Snapshot:
+    """An interpreter with its builtins registered and a prelude of library
+    code already run, cloned for each program instead of building a new
+    interpreter and running the prelude again.
+
+    clone() makes a shallow copy of the globals, so the prelude's functions,
+    numbers and strings are shared by every clone while definitions and
+    assignments made by a program stay its own. Prelude values a program
+    could change in place (arrays, closures over local variables) are
+    copied for each clone, so clones never see each other's changes.
+    Memoized prelude functions are copied too, each clone caching their
+    results on its own, so clones running on several threads never share
+    a MemoCache.
+    """
+    def __init__(self, prelude: Union[str, List[Stmt]] = "", engine: str = "tree",
+                 memo_size: int = 0):
+        if engine not in SNAPSHOT_ENGINES:
+            raise ValueError(f"Snapshots need the tree, vm or jit engine, not '{engine}'.")
+        statements = parse(prelude) if isinstance(prelude, str) else prelude
+        # A prelude's main() would run in place of a program's top level
+        if any(isinstance(stmt, Function) and stmt.name.lexeme == "main" for stmt in statements):
+            raise ValueError("A prelude can't define main().")
+
+        self.interpreter = ENGINES[engine](memo_size=memo_size,
+                                           output_sink=OutputSink(capture=None, echo=False))
+        self.interpreter.interpret(statements)
+        if self.interpreter.error is not None:
+            raise RuntimeError(f"Prelude failed: {self.interpreter.error}")
+
+        values = self.interpreter.globals.values
+        for name, value in values.items():
+            # Strings built by `+` are appended to in place
+            if type(value) is StringBuilder:
+                values[name] = str(value)
+        # Globals whose values each clone gets its own copy of
+        self.mutable = [name for name, value in values.items() if is_mutable(value)]
+
+    @property
+    def output(self) -> List[str]:
+        """Lines printed by the prelude"""
+        return self.interpreter.output
+
+    def clone(self, output_sink: Optional[OutputSink] = None) -> Interpreter:
+        """A ready-to-use interpreter with the prelude's globals"""
+        interpreter = self.interpreter.clone(output_sink)
+        if self.mutable:
+            values = interpreter.globals.values
+            copies: Dict[int, Any] = {}
+            for name in self.mutable:
+                values[name] = copy_value(values[name], copies, interpreter.memo_cache)
+        return interpreter
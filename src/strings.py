@@ -0,0 +1,93 @@
+from typing import Any, List
+
+# Concatenations shorter than this just build a new str
+BUILDER_THRESHOLD = 256
+# Appended strings are joined in groups of MERGE_PARTS, so a buffer holds
+# few parts however small the appended strings are.
+MERGE_PARTS = 256
+
+class StringBuffer:
+    """Append-only storage shared by the StringBuilders grown from it.
+
+    parts[:joined] are already-joined chunks; the rest were appended one
+    by one since the last merge.
+    """
+    __slots__ = ("parts", "joined", "length")
+
+    def __init__(self, parts: List[str], length: int):
+        self.parts = parts
+        self.joined = 1
+        self.length = length
+
+class StringBuilder:
+    """An MRT string produced by `+` that can be appended to in place.
+
+    `s = s + t` with a plain str copies all of s, making a loop that
+    builds a long string quadratic. A StringBuilder is the first `length`
+    characters of a shared, append-only buffer, so the builder ending
+    where the buffer ends appends without copying. Appending to an older
+    builder (after `t = s + "a"; u = s + "b"`) first copies its text into
+    a new buffer. The text is joined when it is read, by print, a builtin
+    or a comparison, and the joined result replaces the parts.
+    """
+    __slots__ = ("buffer", "length")
+
+    def __init__(self, buffer: StringBuffer, length: int):
+        self.buffer = buffer
+        self.length = length
+
+    def append(self, text: str) -> 'StringBuilder':
+        buffer = self.buffer
+        if buffer.length != self.length:
+            buffer = StringBuffer([str(self)], self.length)
+        parts = buffer.parts
+        parts.append(text)
+        joined = buffer.joined
+        if len(parts) - joined >= MERGE_PARTS:
+            parts[joined:] = ["".join(parts[joined:])]
+            buffer.joined = joined + 1
+        buffer.length += len(text)
+        return StringBuilder(buffer, buffer.length)
+
+    def __str__(self) -> str:
+        buffer = self.buffer
+        parts = buffer.parts
+        if len(parts) > 1:
+            parts[:] = ["".join(parts)]
+            buffer.joined = 1
+        text = parts[0]
+        return text if len(text) == self.length else text[:self.length]
+
+    def __repr__(self) -> str:
+        return repr(str(self))
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, (str, StringBuilder)):
+            return str(self) == str(other)
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash(str(self))
+
+    def __float__(self) -> float:
+        return float(str(self))
+
+TEXT_TYPES = (str, StringBuilder)
+
+def concat(left: Any, right: Any) -> Any:
+    """`left + right` when either operand is a string"""
+    if type(left) is StringBuilder:
+        return left.append(str(right))
+    left = str(left)
+    right = str(right)
+    length = len(left) + len(right)
+    if length < BUILDER_THRESHOLD:
+        return left + right
+    return StringBuilder(StringBuffer([left, right], length), length)
+
+def flatten(args: tuple) -> tuple:
+    """Builtin arguments with every StringBuilder turned into a str"""
+    for arg in args:
+        if type(arg) is StringBuilder:
+            return tuple(str(arg) if type(arg) is StringBuilder else arg for arg in args)
+    return args
@@ -0,0 +1,426 @@
+import operator
+import re
+from typing import Any, Callable, Dict, List, Optional, Set
+from .arrays import ARRAY_TYPES, NumberArray, make_array
+from .ast import *
+from .interpreter import Interpreter
+from .lexer import Token, TokenType
+from .strings import TEXT_TYPES, concat
+
+class TranspileError(Exception):
+    pass
+
+class FunctionContext:
+    """Python-level function being generated"""
+    def __init__(self, parent: Optional['FunctionContext']):
+        self.parent = parent
+        self.locals: Set[str] = set()
+        self.params: List[str] = []
+        self.nonlocals: Set[str] = set()
+        self.globals: Set[str] = set()
+        self.loop_depth = 0
+
+class ScopeInfo:
+    """Generator-side mirror of one resolver frame"""
+    def __init__(self, scope_id: int, function: FunctionContext, in_loop: bool):
+        self.scope_id = scope_id
+        self.function = function
+        self.in_loop = in_loop
+
+# Runtime helpers shared by every generated module. They reproduce the
+# semantics Interpreter.evaluate implements inline.
+def _add(left: Any, right: Any) -> Any:
+    if isinstance(left, TEXT_TYPES) or isinstance(right, TEXT_TYPES):
+        return concat(left, right)
+    return float(left) + float(right)
+
+def _divide(left: Any, right: Any) -> float:
+    if float(right) == 0:
+        raise RuntimeError("Division by zero.")
+    return float(left) / float(right)
+
+def _numeric(symbol: str, left: Any, right: Any) -> Any:
+    # Both operands are evaluated before either is coerced, so an error
+    # in the right one is reported first, as Interpreter.binary does
+    return NUMERIC_OPERATIONS[symbol](float(left), float(right))
+
+def _truthy(value: Any) -> bool:
+    return value is not None and value is not False
+
+def _checked(array: Any, index: Any) -> tuple:
+    if not isinstance(array, ARRAY_TYPES):
+        raise RuntimeError("Can only index into arrays.")
+    if not isinstance(index, (int, float)):
+        raise RuntimeError("Array index must be a number.")
+    index = int(index)
+    if index < 0 or index >= len(array):
+        raise RuntimeError("Array index out of bounds.")
+    return array, index
+
+def _get_index(array: Any, index: Any) -> Any:
+    array, index = _checked(array, index)
+    return array.items[index] if type(array) is NumberArray else array[index]
+
+def _set_index(target: tuple, value: Any) -> Any:
+    target[0][target[1]] = value
+    return value
+
+def _arity(expected: int, got: int):
+    raise RuntimeError(f"Expected {expected} arguments but got {got}.")
+
+def _undefined(name: str, value: Any = None):
+    raise RuntimeError(f"Undefined variable '{name}'.")
+
+HELPERS = {
+    "_add": _add,
+    "_divide": _divide,
+    "_numeric": _numeric,
+    "_truthy": _truthy,
+    "_checked": _checked,
+    "_array": make_array,
+    "_get_index": _get_index,
+    "_set_index": _set_index,
+    "_arity": _arity,
+    "_undefined": _undefined,
+}
+
+COMPARISONS = {
+    TokenType.GREATER: ">",
+    TokenType.GREATER_EQUAL: ">=",
+    TokenType.LESS: "<",
+    TokenType.LESS_EQUAL: "<=",
+}
+
+ARITHMETIC = {
+    TokenType.MINUS: "-",
+    TokenType.MULTIPLY: "*",
+}
+
+NUMERIC_OPERATIONS: Dict[str, Callable] = {
+    "-": operator.sub,
+    "*": operator.mul,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+}
+
+class Transpiler:
+    """Generates Python source from a resolved MRT program.
+
+    MRT functions become Python functions, loops become native while
+    loops and local variables become Python locals named after their
+    declaring scope. Globals keep an "m_" prefix so MRT identifiers never
+    clash with Python keywords or the helpers above.
+    """
+    def __init__(self, global_names: Set[str]):
+        self.global_names = set(global_names)
+        self.lines: List[str] = []
+        self.indent = 0
+        self.scopes: List[ScopeInfo] = []
+        self.scope_counter = 0
+        self.function: FunctionContext = FunctionContext(None)
+        # Pure functions, indexed by the _memoize() calls emitted for them
+        self.memoized: List[Function] = []
+
+    def generate(self, statements: List[Stmt]) -> str:
+        functions = [stmt for stmt in statements if isinstance(stmt, Function)]
+        for stmt in statements:
+            if isinstance(stmt, Var) and stmt.slot is None:
+                self.global_names.add(stmt.name.lexeme)
+        for function in functions:
+            self.global_names.add(function.name.lexeme)
+
+        for function in functions:
+            self.function_definition(function)
+
+        if any(function.name.lexeme == "main" for function in functions):
+            main_token = Token(TokenType.IDENTIFIER, "main", None, 1)
+            body = [Expression(Call(Variable(main_token), None, []))]
+        else:
+            body = [stmt for stmt in statements if not isinstance(stmt, Function)]
+        self.emit_function("_program", [], body, 0)
+        return "\n".join(self.lines) + "\n"
+
+    def line(self, text: str):
+        self.lines.append("    " * self.indent + text)
+
+    # Functions
+
+    def function_definition(self, stmt: Function):
+        name = self.declared_name(stmt.slot, stmt.name.lexeme)
+        self.emit_function(name, [param.lexeme for param in stmt.params], stmt.body,
+                           len(stmt.params))
+        if stmt.pure:
+            self.line(f"{name} = _memoize({name}, {len(self.memoized)})")
+            self.memoized.append(stmt)
+
+    def emit_function(self, name: str, params: List[str], body: List[Stmt], arity: int):
+        context = FunctionContext(self.function)
+        previous_function, previous_lines, previous_indent = self.function, self.lines, self.indent
+        self.function, self.lines, self.indent = context, [], 1
+
+        scope = self.begin_scope(in_loop=False)
+        context.params = [f"{param}_{scope.scope_id}" for param in params]
+        self.block_body(body)
+        self.scopes.pop()
+        body_lines = self.lines
+
+        self.function, self.lines, self.indent = previous_function, previous_lines, previous_indent
+        if name == "_program":
+            self.line("def _program():")
+        else:
+            self.line(f"def {name}(*args):")
+        self.indent += 1
+        if context.globals:
+            self.line(f"global {', '.join(sorted(context.globals))}")
+        if context.nonlocals:
+            self.line(f"nonlocal {', '.join(sorted(context.nonlocals))}")
+        if name != "_program":
+            self.line(f"if len(args) != {arity}:")
+            self.line(f"    _arity({arity}, len(args))")
+            if context.params:
+                self.line(f"{', '.join(context.params)}, = args")
+        local_names = sorted(context.locals - set(context.params))
+        if local_names:
+            self.line(f"{' = '.join(local_names)} = None")
+        self.indent -= 1
+        self.lines.extend("    " * self.indent + text for text in body_lines)
+
+    def begin_scope(self, in_loop: bool) -> ScopeInfo:
+        self.scope_counter += 1
+        scope = ScopeInfo(self.scope_counter, self.function, in_loop)
+        self.scopes.append(scope)
+        return scope
+
+    # Names
+
+    def declared_name(self, slot: Optional[int], lexeme: str) -> str:
+        if slot is None:
+            if self.function.parent is not None:
+                self.function.globals.add(f"m_{lexeme}")
+            return f"m_{lexeme}"
+        name = f"{lexeme}_{self.scopes[-1].scope_id}"
+        self.function.locals.add(name)
+        return name
+
+    def resolved_name(self, depth: Optional[int], lexeme: str, store: bool) -> str:
+        if depth is None:
+            if store and self.function.parent is not None:
+                self.function.globals.add(f"m_{lexeme}")
+            return f"m_{lexeme}"
+        scope = self.scopes[-1 - depth]
+        name = f"{lexeme}_{scope.scope_id}"
+        if scope.function is not self.function:
+            # Python closures share one cell across loop iterations while
+            # MRT allocates a fresh frame per iteration.
+            if scope.in_loop:
+                raise TranspileError(f"'{lexeme}' is captured from a loop body.")
+            if store:
+                self.function.nonlocals.add(name)
+        return name
+
+    # Statements
+
+    def block_body(self, statements: List[Stmt]):
+        start = len(self.lines)
+        for statement in statements:
+            self.statement(statement)
+        if len(self.lines) == start:
+            self.line("pass")
+
+    def statement(self, stmt: Stmt):
+        match stmt:
+            case Block():
+                if stmt.frame_size:
+                    self.begin_scope(in_loop=self.function.loop_depth > 0)
+                    self.block_body(stmt.statements)
+                    self.scopes.pop()
+                else:
+                    self.block_body(stmt.statements)
+            case Expression():
+                self.expression_statement(stmt.expression)
+            case Function():
+                self.function_definition(stmt)
+            case If():
+                self.line(f"if {self.condition(stmt.condition)}:")
+                self.nested(stmt.then_branch)
+                if stmt.else_branch:
+                    self.line("else:")
+                    self.nested(stmt.else_branch)
+            case Print():
+                self.line(f"_print({self.expression(stmt.expression)})")
+            case Return():
+                if stmt.value:
+                    self.line(f"return {self.expression(stmt.value)}")
+                else:
+                    self.line("return None")
+            case Var():
+                value = self.expression(stmt.initializer) if stmt.initializer else "None"
+                self.line(f"{self.declared_name(stmt.slot, stmt.name.lexeme)} = {value}")
+            case While():
+                self.line(f"while {self.condition(stmt.condition)}:")
+                self.function.loop_depth += 1
+                self.nested(stmt.body)
+                self.function.loop_depth -= 1
+            case _:
+                raise TranspileError(f"Cannot transpile statement {type(stmt).__name__}.")
+
+    def nested(self, stmt: Stmt):
+        self.indent += 1
+        self.statement(stmt)
+        self.indent -= 1
+
+    def expression_statement(self, expr: Expr):
+        if isinstance(expr, Assign):
+            value = self.expression(expr.value)
+            if self.is_undefined_global(expr):
+                self.line(f"_undefined({expr.name.lexeme!r}, {value})")
+            else:
+                self.line(f"{self.resolved_name(expr.depth, expr.name.lexeme, True)} = {value}")
+        else:
+            self.line(self.expression(expr))
+
+    def condition(self, expr: Expr) -> str:
+        if self.is_boolean(expr):
+            return self.expression(expr)
+        return f"_truthy({self.expression(expr)})"
+
+    # Expressions
+
+    def expression(self, expr: Expr) -> str:
+        match expr:
+            case Array():
+                return "_array([" + ", ".join(self.expression(element) for element in expr.elements) + "])"
+            case ArrayAccess():
+                return f"_get_index({self.expression(expr.array)}, {self.expression(expr.index)})"
+            case ArrayAssign():
+                return (f"_set_index(_checked({self.expression(expr.array)}, "
+                        f"{self.expression(expr.index)}), {self.expression(expr.value)})")
+            case Assign():
+                value = self.expression(expr.value)
+                if self.is_undefined_global(expr):
+                    return f"_undefined({expr.name.lexeme!r}, {value})"
+                return f"({self.resolved_name(expr.depth, expr.name.lexeme, True)} := {value})"
+            case Binary():
+                return self.binary(expr)
+            case Call():
+                arguments = ", ".join(self.expression(argument) for argument in expr.arguments)
+                return f"{self.expression(expr.callee)}({arguments})"
+            case Grouping():
+                return self.expression(expr.expression)
+            case Literal():
+                return repr(expr.value)
+            case Unary():
+                if expr.operator.type == TokenType.MINUS:
+                    return f"(-{self.number(expr.right)})"
+                raise TranspileError(f"Unsupported operator '{expr.operator.lexeme}'.")
+            case Variable():
+                return self.resolved_name(expr.depth, expr.name.lexeme, False)
+        raise TranspileError(f"Cannot transpile expression {type(expr).__name__}.")
+
+    def binary(self, expr: Binary) -> str:
+        operator = expr.operator.type
+        if operator == TokenType.PLUS:
+            if self.is_number(expr.left) and self.is_number(expr.right):
+                return f"({self.expression(expr.left)} + {self.expression(expr.right)})"
+            return f"_add({self.expression(expr.left)}, {self.expression(expr.right)})"
+        if operator in ARITHMETIC or operator in COMPARISONS:
+            symbol = ARITHMETIC.get(operator) or COMPARISONS[operator]
+            if not self.is_number(expr.left) and self.can_fail(expr.right):
+                return f"_numeric({symbol!r}, {self.expression(expr.left)}, {self.expression(expr.right)})"
+            return f"({self.number(expr.left)} {symbol} {self.number(expr.right)})"
+        if operator == TokenType.DIVIDE:
+            return f"_divide({self.expression(expr.left)}, {self.expression(expr.right)})"
+        if operator == TokenType.EQUALS:
+            return f"({self.expression(expr.left)} == {self.expression(expr.right)})"
+        if operator == TokenType.NOT_EQUALS:
+            return f"({self.expression(expr.left)} != {self.expression(expr.right)})"
+        raise TranspileError(f"Unsupported operator '{expr.operator.lexeme}'.")
+
+    def number(self, expr: Expr) -> str:
+        """Emit expr coerced to float, skipping float() when it already is one"""
+        if self.is_number(expr):
+            return self.expression(expr)
+        return f"float({self.expression(expr)})"
+
+    def is_number(self, expr: Expr) -> bool:
+        match expr:
+            case Literal():
+                return type(expr.value) is float
+            case Grouping():
+                return self.is_number(expr.expression)
+            case Unary():
+                return expr.operator.type == TokenType.MINUS
+            case Binary():
+                if expr.operator.type == TokenType.PLUS:
+                    return self.is_number(expr.left) and self.is_number(expr.right)
+                return expr.operator.type in (TokenType.MINUS, TokenType.MULTIPLY, TokenType.DIVIDE)
+        return False
+
+    def can_fail(self, expr: Expr) -> bool:
+        """Whether evaluating expr could raise: anything but literals, locals
+        and globals the program declares (which only fail when read before
+        their declaration runs)"""
+        match expr:
+            case Literal():
+                return False
+            case Grouping():
+                return self.can_fail(expr.expression)
+            case Variable():
+                return expr.depth is None and expr.name.lexeme not in self.global_names
+        return True
+
+    def is_boolean(self, expr: Expr) -> bool:
+        match expr:
+            case Literal():
+                return type(expr.value) is bool
+            case Grouping():
+                return self.is_boolean(expr.expression)
+            case Binary():
+                return expr.operator.type in COMPARISONS or expr.operator.type in (
+                    TokenType.EQUALS, TokenType.NOT_EQUALS)
+        return False
+
+    def is_undefined_global(self, expr: Assign) -> bool:
+        return expr.depth is None and expr.name.lexeme not in self.global_names
+
+class PythonInterpreter(Interpreter):
+    """Runs MRT programs by transpiling them to Python and exec()ing the result.
+
+    Programs the transpiler can't express faithfully fall back to the
+    tree-walking interpreter.
+    """
+
+    def execute_program(self, statements: List[Stmt]):
+        transpiler = Transpiler(set(self.globals.values))
+        try:
+            source = transpiler.generate(statements)
+        except TranspileError:
+            super().execute_program(statements)
+            return
+
+        def memoize(function: Callable, index: int) -> Callable:
+            memo = self.memo_cache(transpiler.memoized[index])
+            return memo.wrap(function) if memo else function
+
+        namespace: Dict[str, Any] = dict(HELPERS)
+        namespace["_print"] = self.print_function
+        namespace["_memoize"] = memoize
+        for name, value in self.globals.values.items():
+            namespace[f"m_{name}"] = value
+        exec(compile(source, "<mrt>", "exec"), namespace)
+        try:
+            namespace["_program"]()
+        except NameError as e:
+            match = re.search(r"'m_(\w+)'", str(e))
+            if not match:
+                raise
+            raise RuntimeError(f"Undefined variable '{match.group(1)}'.") from None
+        except TypeError as e:
+            if "object is not callable" not in str(e):
+                raise
+            raise RuntimeError("Can only call functions.") from None
+
+    def transpile(self, statements: List[Stmt]) -> str:
+        return Transpiler(set(self.globals.values)).generate(statements)
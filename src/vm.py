@@ -0,0 +1,394 @@
+import sys
+from typing import Any, Callable, List, Optional
+from .arrays import ARRAY_TYPES, NumberArray, make_array
+from .ast import Stmt
+from .compiler import Compiler, FunctionProto, OpCode
+from .interpreter import Frame, Interpreter, new_frame
+from .memo import MemoCache
+from .output import OutputSink
+from .purity import mark_pure_functions
+from .resolver import Resolver
+from .strings import TEXT_TYPES, concat
+
+# Plain ints for the dispatch loop; comparing against IntEnum members is
+# noticeably slower than comparing small ints.
+CONSTANT = OpCode.CONSTANT.value
+NIL = OpCode.NIL.value
+POP = OpCode.POP.value
+GET_GLOBAL = OpCode.GET_GLOBAL.value
+SET_GLOBAL = OpCode.SET_GLOBAL.value
+DEFINE_GLOBAL = OpCode.DEFINE_GLOBAL.value
+GET_LOCAL = OpCode.GET_LOCAL.value
+SET_LOCAL = OpCode.SET_LOCAL.value
+DEFINE_LOCAL = OpCode.DEFINE_LOCAL.value
+GET_OUTER = OpCode.GET_OUTER.value
+SET_OUTER = OpCode.SET_OUTER.value
+PUSH_SCOPE = OpCode.PUSH_SCOPE.value
+POP_SCOPE = OpCode.POP_SCOPE.value
+ADD = OpCode.ADD.value
+SUBTRACT = OpCode.SUBTRACT.value
+MULTIPLY = OpCode.MULTIPLY.value
+DIVIDE = OpCode.DIVIDE.value
+EQUAL = OpCode.EQUAL.value
+NOT_EQUAL = OpCode.NOT_EQUAL.value
+GREATER = OpCode.GREATER.value
+GREATER_EQUAL = OpCode.GREATER_EQUAL.value
+LESS = OpCode.LESS.value
+LESS_EQUAL = OpCode.LESS_EQUAL.value
+NEGATE = OpCode.NEGATE.value
+JUMP = OpCode.JUMP.value
+JUMP_IF_FALSE = OpCode.JUMP_IF_FALSE.value
+CALL = OpCode.CALL.value
+TAIL_CALL = OpCode.TAIL_CALL.value
+RETURN = OpCode.RETURN.value
+CLOSURE = OpCode.CLOSURE.value
+BUILD_ARRAY = OpCode.BUILD_ARRAY.value
+INDEX_GET = OpCode.INDEX_GET.value
+CHECK_INDEX = OpCode.CHECK_INDEX.value
+INDEX_SET = OpCode.INDEX_SET.value
+PRINT = OpCode.PRINT.value
+LOOP = OpCode.LOOP.value
+
+# Budget of a VM that is never suspended: steps run out after ~2**63
+UNLIMITED = sys.maxsize
+# Returned by dispatch() when the budget ran out and its state was saved
+SUSPENDED = object()
+
+class VMFunction:
+    """A compiled function closed over the frame it was declared in"""
+    def __init__(self, proto: FunctionProto, closure: Frame, memo: Optional[MemoCache] = None):
+        self.proto = proto
+        self.closure = closure
+        self.memo = memo
+
+    def __str__(self):
+        return f"<function {self.proto.name}>"
+
+class VM(Interpreter):
+    """Stack-based virtual machine executing bytecode from the Compiler.
+
+    Besides running a program to completion with interpret(), the VM can
+    run one in slices: begin() prepares it and each step(budget) runs it
+    for `budget` more steps, a step being a loop iteration (a LOOP
+    instruction) or a call of an MRT function. When the budget runs out
+    the dispatch loop saves its registers in `suspended` and returns, so
+    the next step() carries on from the same instruction.
+
+    Dispatch loops started from Python (a memoized call, or a callback
+    from a builtin such as map) can't be suspended. When one of those
+    runs out, refill() is asked for more budget instead; it may raise to
+    stop the program.
+    """
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        # Steps left before the dispatch loop suspends or calls refill()
+        self.budget = UNLIMITED
+        # Registers of a program started with begin() that hasn't finished
+        self.suspended: Optional[tuple] = None
+        self.refill: Callable[[], int] = lambda: UNLIMITED
+
+    def clone(self, output_sink: Optional[OutputSink] = None) -> 'VM':
+        clone = super().clone(output_sink)
+        clone.budget = UNLIMITED
+        clone.suspended = None
+        clone.refill = lambda: UNLIMITED
+        return clone
+
+    def begin(self, statements: List[Stmt]):
+        """Prepare a program for step(); like interpret(), errors are
+        reported in the output and `error`"""
+        self.error = None
+        self.suspended = None
+        try:
+            self.clear_output()
+            Resolver().resolve(statements)
+            if self.memo_size:
+                mark_pure_functions(statements)
+            script = Compiler().compile(statements)
+            self.suspended = (script.chunk.code, script.chunk.constants, None, [], [], 0)
+        except Exception as e:
+            self.abort(str(e))
+
+    def step(self, budget: int) -> bool:
+        """Run the program from begin() for `budget` more steps, or until
+        it ends; True once it has ended"""
+        if self.suspended is None:
+            return True
+        self.budget = budget
+        try:
+            if self.dispatch(*self.suspended, True) is not SUSPENDED:
+                self.suspended = None
+                self.output_sink.flush()
+        except Exception as e:
+            self.abort(str(e))
+        return self.suspended is None
+
+    def abort(self, message: str):
+        """End the program from begin() with a runtime error"""
+        self.suspended = None
+        self.error = message
+        self.output_sink.write(f"Runtime Error: {message}")
+        self.output_sink.flush()
+
+    def execute_program(self, statements: List[Stmt]):
+        script = Compiler().compile(statements)
+        self.run(script)
+
+    def execute_top_level(self, statement: Stmt):
+        self.run(Compiler().compile_statements([statement]))
+
+    def function_types(self) -> tuple:
+        return (VMFunction,)
+
+    def call_memoized(self, function: VMFunction, arguments: List[Any]) -> Any:
+        # The result has to be known here to be cached, so a memoized call
+        # runs in a nested dispatch loop instead of pushing a call frame.
+        proto = function.proto
+        frame = new_frame(function.closure, proto.frame_size)
+        frame[1:proto.arity + 1] = arguments
+        return function.memo.call(arguments, lambda: self.run(proto, frame))
+
+    def native_callable(self, value: Any) -> Optional[Callable]:
+        if isinstance(value, VMFunction):
+            def call_vm(*arguments):
+                proto = value.proto
+                if len(arguments) != proto.arity:
+                    raise RuntimeError(f"Expected {proto.arity} arguments but got {len(arguments)}.")
+                if value.memo is not None:
+                    return self.call_memoized(value, list(arguments))
+                frame = new_frame(value.closure, proto.frame_size)
+                frame[1:proto.arity + 1] = arguments
+                return self.run(proto, frame)
+            return call_vm
+        return super().native_callable(value)
+
+    def run(self, script: FunctionProto, frame: Optional[Frame] = None) -> Any:
+        return self.dispatch(script.chunk.code, script.chunk.constants, frame, [], [], 0, False)
+
+    def dispatch(self, code: List[int], constants: List[Any], frame: Optional[Frame],
+                 stack: List[Any], frames: list, ip: int, resumable: bool) -> Any:
+        """Run until the outermost function returns. The budget is spent
+        at LOOP and calls; when it runs out, a resumable loop saves its
+        registers in `suspended` and returns SUSPENDED, others refill it."""
+        globals = self.globals
+        is_truthy = self.is_truthy
+        is_equal = self.is_equal
+        budget = self.budget
+
+        while True:
+            op = code[ip]
+            ip += 1
+
+            if op == GET_LOCAL:
+                stack.append(frame[code[ip]])
+                ip += 1
+            elif op == SET_LOCAL:
+                frame[code[ip]] = stack[-1]
+                ip += 1
+            elif op == GET_GLOBAL:
+                stack.append(globals.get(constants[code[ip]]))
+                ip += 1
+            elif op == CONSTANT:
+                stack.append(constants[code[ip]])
+                ip += 1
+            elif op == JUMP_IF_FALSE:
+                if is_truthy(stack.pop()):
+                    ip += 1
+                else:
+                    ip = code[ip]
+            elif op == LOOP:
+                ip = code[ip]
+                budget -= 1
+                if budget < 0:
+                    if resumable:
+                        self.budget = budget
+                        self.suspended = (code, constants, frame, stack, frames, ip)
+                        return SUSPENDED
+                    budget = self.refill()
+            elif op == JUMP:
+                ip = code[ip]
+            elif op == LESS:
+                right = stack.pop()
+                stack[-1] = float(stack[-1]) < float(right)
+            elif op == ADD:
+                right = stack.pop()
+                left = stack[-1]
+                if isinstance(left, TEXT_TYPES) or isinstance(right, TEXT_TYPES):
+                    stack[-1] = concat(left, right)
+                else:
+                    stack[-1] = float(left) + float(right)
+            elif op == SUBTRACT:
+                right = stack.pop()
+                stack[-1] = float(stack[-1]) - float(right)
+            elif op == GET_OUTER:
+                outer = frame
+                for _ in range(code[ip]):
+                    outer = outer[0]
+                stack.append(outer[code[ip + 1]])
+                ip += 2
+            elif op == SET_OUTER:
+                outer = frame
+                for _ in range(code[ip]):
+                    outer = outer[0]
+                outer[code[ip + 1]] = stack[-1]
+                ip += 2
+            elif op == SET_GLOBAL:
+                globals.assign(constants[code[ip]], stack[-1])
+                ip += 1
+            elif op == POP:
+                stack.pop()
+            elif op == CALL:
+                argc = code[ip]
+                ip += 1
+                callee = stack[-argc - 1]
+                if isinstance(callee, VMFunction):
+                    proto = callee.proto
+                    if argc != proto.arity:
+                        raise RuntimeError(f"Expected {proto.arity} arguments but got {argc}.")
+                    if callee.memo is not None:
+                        arguments = stack[len(stack) - argc:]
+                        del stack[len(stack) - argc - 1:]
+                        self.budget = budget
+                        stack.append(self.call_memoized(callee, arguments))
+                        budget = self.budget
+                        continue
+                    frames.append((code, constants, ip, frame))
+                    frame = new_frame(callee.closure, proto.frame_size)
+                    if argc:
+                        frame[1:argc + 1] = stack[len(stack) - argc:]
+                    del stack[len(stack) - argc - 1:]
+                    code = proto.chunk.code
+                    constants = proto.chunk.constants
+                    ip = 0
+                    budget -= 1
+                    if budget < 0:
+                        if resumable:
+                            self.budget = budget
+                            self.suspended = (code, constants, frame, stack, frames, ip)
+                            return SUSPENDED
+                        budget = self.refill()
+                elif callable(callee):
+                    arguments = stack[len(stack) - argc:]
+                    del stack[len(stack) - argc - 1:]
+                    # A builtin may call back into MRT code (map, filter...)
+                    self.budget = budget
+                    stack.append(callee(*arguments))
+                    budget = self.budget
+                else:
+                    raise RuntimeError("Can only call functions.")
+            elif op == TAIL_CALL:
+                argc = code[ip]
+                ip += 1
+                callee = stack[-argc - 1]
+                if isinstance(callee, VMFunction):
+                    # Same as CALL except the caller's return address is not
+                    # saved: the callee returns straight to our caller.
+                    proto = callee.proto
+                    if argc != proto.arity:
+                        raise RuntimeError(f"Expected {proto.arity} arguments but got {argc}.")
+                    frame = new_frame(callee.closure, proto.frame_size)
+                    if argc:
+                        frame[1:argc + 1] = stack[len(stack) - argc:]
+                    del stack[len(stack) - argc - 1:]
+                    code = proto.chunk.code
+                    constants = proto.chunk.constants
+                    ip = 0
+                    budget -= 1
+                    if budget < 0:
+                        if resumable:
+                            self.budget = budget
+                            self.suspended = (code, constants, frame, stack, frames, ip)
+                            return SUSPENDED
+                        budget = self.refill()
+                elif callable(callee):
+                    arguments = stack[len(stack) - argc:]
+                    del stack[len(stack) - argc - 1:]
+                    self.budget = budget
+                    stack.append(callee(*arguments))
+                    budget = self.budget
+                else:
+                    raise RuntimeError("Can only call functions.")
+            elif op == RETURN:
+                if not frames:
+                    self.budget = budget
+                    return stack.pop() if stack else None
+                code, constants, ip, frame = frames.pop()
+            elif op == DEFINE_LOCAL:
+                frame[code[ip]] = stack.pop()
+                ip += 1
+            elif op == DEFINE_GLOBAL:
+                globals.define(constants[code[ip]].lexeme, stack.pop())
+                ip += 1
+            elif op == PUSH_SCOPE:
+                frame = new_frame(frame, code[ip])
+                ip += 1
+            elif op == POP_SCOPE:
+                frame = frame[0]
+            elif op == MULTIPLY:
+                right = stack.pop()
+                stack[-1] = float(stack[-1]) * float(right)
+            elif op == DIVIDE:
+                right = stack.pop()
+                if float(right) == 0:
+                    raise RuntimeError("Division by zero.")
+                stack[-1] = float(stack[-1]) / float(right)
+            elif op == GREATER:
+                right = stack.pop()
+                stack[-1] = float(stack[-1]) > float(right)
+            elif op == LESS_EQUAL:
+                right = stack.pop()
+                stack[-1] = float(stack[-1]) <= float(right)
+            elif op == GREATER_EQUAL:
+                right = stack.pop()
+                stack[-1] = float(stack[-1]) >= float(right)
+            elif op == EQUAL:
+                right = stack.pop()
+                stack[-1] = is_equal(stack[-1], right)
+            elif op == NOT_EQUAL:
+                right = stack.pop()
+                stack[-1] = not is_equal(stack[-1], right)
+            elif op == NEGATE:
+                stack[-1] = -float(stack[-1])
+            elif op == NIL:
+                stack.append(None)
+            elif op == INDEX_GET:
+                index = stack.pop()
+                array = stack.pop()
+                self.check_index(array, index)
+                if type(array) is NumberArray:
+                    array = array.items
+                stack.append(array[int(index)])
+            elif op == CHECK_INDEX:
+                self.check_index(stack[-2], stack[-1])
+            elif op == INDEX_SET:
+                value = stack.pop()
+                index = stack.pop()
+                array = stack.pop()
+                array[int(index)] = value
+                stack.append(value)
+            elif op == BUILD_ARRAY:
+                count = code[ip]
+                ip += 1
+                if count:
+                    elements = stack[len(stack) - count:]
+                    del stack[len(stack) - count:]
+                else:
+                    elements = []
+                stack.append(make_array(elements))
+            elif op == CLOSURE:
+                proto = constants[code[ip]]
+                stack.append(VMFunction(proto, frame, self.memo_cache(proto.declaration)))
+                ip += 1
+            elif op == PRINT:
+                self.print_function(stack.pop())
+            else:
+                raise RuntimeError(f"Unknown opcode {op}.")
+
+    def check_index(self, array: Any, index: Any):
+        if not isinstance(array, ARRAY_TYPES):
+            raise RuntimeError("Can only index into arrays.")
+        if not isinstance(index, (int, float)):
+            raise RuntimeError("Array index must be a number.")
+        index = int(index)
+        if index < 0 or index >= len(array):
+            raise RuntimeError("Array index out of bounds.")
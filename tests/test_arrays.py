@@ -0,0 +1,56 @@
+from array import array
+import pytest
+from src.__main__ import ENGINES, parse
+from src.arrays import NumberArray, make_array
+from src.output import OutputSink
+
+ALIASING = """
+var a = [1, 2, 3];
+var b = a;
+push(b, 4);
+a[0] = "one";
+print b; print len(b); print a == b;
+print slice(a, 1, 3); print [1, 2] == [1, 2];
+"""
+
+def test_number_arrays_use_a_double_buffer():
+    numbers = make_array([1.0, 2.0])
+    assert type(numbers) is NumberArray
+    assert type(numbers.items) is array
+    mixed = [1.0, "a"]
+    assert make_array(mixed) is mixed
+    assert type(make_array([1.0, True])) is list
+
+def test_storing_a_non_number_converts_in_place():
+    numbers = make_array([1.0, 2.0])
+    alias = numbers
+    numbers[1] = "two"
+    assert alias.items == [1.0, "two"]
+    numbers.append(3.0)
+    assert list(alias) == [1.0, "two", 3.0]
+
+def test_numbers_keep_the_buffer():
+    numbers = make_array([1.0])
+    numbers.append(2.0)
+    numbers[0] = 5.0
+    assert type(numbers.items) is array
+    assert numbers.pop() == 2.0
+    assert numbers.index(5.0) == 0
+
+def test_behaves_like_a_list():
+    numbers = make_array([1.0, 2.0, 3.0])
+    assert numbers == [1.0, 2.0, 3.0]
+    assert [1.0, 2.0, 3.0] == numbers
+    assert numbers != [1.0, 2.0]
+    assert repr(numbers) == "[1.0, 2.0, 3.0]"
+    assert type(numbers[1:]) is NumberArray and numbers[1:] == [2.0, 3.0]
+    with pytest.raises(IndexError):
+        numbers[3]
+    with pytest.raises(TypeError):
+        hash(numbers)
+
+@pytest.mark.parametrize("engine", sorted(ENGINES))
+def test_engines_share_arrays_by_reference(engine):
+    interpreter = ENGINES[engine](output_sink=OutputSink(capture=None, echo=False))
+    interpreter.interpret(parse(ALIASING))
+    assert interpreter.output == ["['one', 2.0, 3.0, 4.0]", "4.0", "True", "[2.0, 3.0]", "True"]
@@ -0,0 +1,48 @@
+import os
+from collections import Counter
+from src.batch import expand, run_batch
+from src.cache import CACHE_DIR
+
+SCRIPTS = {
+    "ok.mrt": "print 1 + 2;",
+    "error.mrt": "print nope;",
+    "syntax.mrt": "print(;\nprint 2;",
+    "loop.mrt": "while (true) {}",
+}
+
+def write_scripts(directory) -> list:
+    paths = []
+    for name, source in SCRIPTS.items():
+        path = directory / name
+        path.write_text(source)
+        paths.append(str(path))
+    return paths
+
+def test_reports_each_script(tmp_path):
+    paths = write_scripts(tmp_path)
+    results = {os.path.basename(result["script"]): result
+               for result in run_batch(paths, workers=2, timeout=0.5)}
+    assert results["ok.mrt"]["status"] == "ok" and results["ok.mrt"]["output"] == "3.0"
+    assert results["error.mrt"]["error"] == "Undefined variable 'nope'."
+    assert results["syntax.mrt"]["status"] == "error"
+    assert results["syntax.mrt"]["error"] == "Error at ;: Expect expression."
+    assert results["loop.mrt"]["status"] == "timeout"
+    assert Counter(result["status"] for result in results.values()) == {
+        "ok": 1, "error": 2, "timeout": 1}
+    # Results keep the index of the script in the list given
+    assert sorted(result["index"] for result in results.values()) == [0, 1, 2, 3]
+
+def test_scripts_with_syntax_errors_are_not_cached(tmp_path):
+    paths = write_scripts(tmp_path)
+    list(run_batch(paths[:3], workers=1))
+    cached = sorted(name.split(".")[0] for name in os.listdir(tmp_path / CACHE_DIR))
+    assert cached == ["error", "ok"]
+
+def test_expand_globs_in_order(tmp_path):
+    write_scripts(tmp_path)
+    (tmp_path / "nested").mkdir()
+    (tmp_path / "nested" / "deep.mrt").write_text("print 1;")
+    paths = expand([str(tmp_path / "**" / "*.mrt"), "given.mrt"])
+    assert paths[-1] == "given.mrt"
+    assert [os.path.relpath(path, tmp_path) for path in paths[:-1]] == [
+        "error.mrt", "loop.mrt", os.path.join("nested", "deep.mrt"), "ok.mrt", "syntax.mrt"]
@@ -0,0 +1,30 @@
+import json
+from benchmarks.suite import DEFAULT_BASELINE, MIN_FLAGGED_MS, PHASES, compare
+
+def results(median_ms: float, peak_bytes: int) -> dict:
+    return {"workloads": {"loop": {"interpret": {"median_ms": median_ms, "peak_bytes": peak_bytes}}}}
+
+def test_changes_within_the_threshold_are_not_flagged():
+    assert compare(results(105.0, 1000), results(100.0, 1000), 0.10) == \
+        {"loop/interpret": "time +5.0%  mem +0.0%"}
+
+def test_regressions_are_flagged():
+    assert compare(results(150.0, 2000), results(100.0, 1000), 0.10) == \
+        {"loop/interpret": "time +50.0%!  mem +100.0%!"}
+
+def test_short_phases_are_never_flagged():
+    short = MIN_FLAGGED_MS / 2
+    assert compare(results(short, 1000), results(short / 4, 1000), 0.10) == \
+        {"loop/interpret": "time +300.0%  mem +0.0%"}
+
+def test_phases_missing_from_the_baseline_are_skipped():
+    assert compare(results(100.0, 1000), {"workloads": {}}, 0.10) == {}
+    assert compare(results(100.0, 1000), results(0.0, 0), 0.10) == {"loop/interpret": ""}
+
+def test_committed_baseline_covers_every_phase():
+    with open(DEFAULT_BASELINE) as file:
+        baseline = json.load(file)
+    assert baseline["engine"] == "tree"
+    assert baseline["workloads"]
+    for phases in baseline["workloads"].values():
+        assert list(phases) == PHASES
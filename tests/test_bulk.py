@@ -0,0 +1,67 @@
+import pytest
+from src.__main__ import ENGINES, parse
+from src.arrays import make_array
+from src import bulk
+from src.output import OutputSink
+
+PROGRAM = """
+func double(x) { return x * 2; }
+func big(x) { return x > 2; }
+func add(a, b) { return a + b; }
+func desc(a, b) { return b - a; }
+var a = [3, 1, 2];
+print map(a, double);
+print filter([1, 4, 2, 5], big);
+print reduce(a, add); print reduce(a, add, 10); print reduce([], add, 0);
+print sum(a); print min(a); print max(a);
+print sort(a); print sort(a, desc); print sort(["b", "a"]); print a;
+print map([[1], [2, 3]], len);
+"""
+
+EXPECTED = [
+    "[6.0, 2.0, 4.0]", "[4.0, 5.0]", "6.0", "16.0", "0.0", "6.0", "1.0", "3.0",
+    "[1.0, 2.0, 3.0]", "[3.0, 2.0, 1.0]", "['a', 'b']", "[3.0, 1.0, 2.0]", "[1.0, 2.0]",
+]
+
+def run(engine: str, source: str):
+    interpreter = ENGINES[engine](output_sink=OutputSink(capture=None, echo=False))
+    interpreter.interpret(parse(source))
+    return interpreter
+
+@pytest.mark.parametrize("engine", sorted(ENGINES))
+def test_builtins_on_every_engine(engine):
+    interpreter = run(engine, PROGRAM)
+    assert interpreter.error is None
+    assert interpreter.output == EXPECTED
+
+@pytest.mark.parametrize("source, message", [
+    ("print map([1], 2);", "Second argument to map() must be a function."),
+    ("func f(x) { return x; } print filter(1, f);", "First argument to filter() must be an array."),
+    ("func f(a, b) { return a; } print reduce([], f);", "reduce() of an empty array needs an initial value."),
+    ('print sum([1, "a"]);', "sum() argument must be an array of numbers."),
+    ("print min([]);", "min() of an empty array."),
+    ('print sort([1, "a"]);', "sort() without a comparison function needs all numbers or all strings."),
+    ('func f(a, b) { return "x"; } print sort([1, 2], f);', "sort() comparison function must return a number."),
+])
+def test_errors(source, message):
+    assert run("tree", source).error == message
+
+def test_callbacks_see_a_snapshot():
+    interpreter = run("tree", """
+        var a = [1, 2];
+        func grow(x) { push(a, x); return x; }
+        print map(a, grow); print a;
+    """)
+    assert interpreter.output == ["[1.0, 2.0]", "[1.0, 2.0, 1.0, 2.0]"]
+
+def test_numpy_gives_the_same_results():
+    pytest.importorskip("numpy")
+    values = [float((i * 7919) % 1000) / 7 for i in range(bulk.NUMPY_THRESHOLD * 3)]
+    numbers = make_array(values)
+    total = 0.0
+    for value in values:
+        total += value
+    assert bulk.BulkBuiltins.sum(numbers) == total
+    assert bulk.BulkBuiltins.min(numbers) == min(values)
+    assert bulk.BulkBuiltins.max(numbers) == max(values)
+    assert list(bulk.BulkBuiltins(None).sort(numbers)) == sorted(values)
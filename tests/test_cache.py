@@ -0,0 +1,68 @@
+import os
+import pytest
+from src import cache
+from src.__main__ import parse
+from src.parser import ParseError
+
+def write_script(tmp_path, source: str) -> str:
+    path = tmp_path / "script.mrt"
+    path.write_text(source)
+    return str(path)
+
+def counting_parse(calls: list):
+    def parse_and_count(source):
+        calls.append(source)
+        return parse(source, strict=True)
+    return parse_and_count
+
+def test_cache_path_sits_next_to_the_script(tmp_path):
+    path = cache.cache_path(str(tmp_path / "script.mrt"))
+    assert path == os.path.join(str(tmp_path), cache.CACHE_DIR, f"script.{cache.TAG}.mrtc")
+
+def test_second_load_is_a_hit(tmp_path):
+    script, calls = write_script(tmp_path, "var a = 1; print a;"), []
+    first = cache.load_program(script, counting_parse(calls))
+    second = cache.load_program(script, counting_parse(calls))
+    assert len(calls) == 1
+    assert type(second[0]) is type(first[0])
+    assert second[0].name.lexeme == "a"
+
+def test_changed_source_is_a_miss(tmp_path):
+    script, calls = write_script(tmp_path, "print 1;"), []
+    cache.load_program(script, counting_parse(calls))
+    write_script(tmp_path, "print 2;")
+    cache.load_program(script, counting_parse(calls))
+    assert len(calls) == 2
+
+def test_header_records_format_and_tag(tmp_path):
+    script = write_script(tmp_path, "print 1;")
+    cache.load_program(script, parse)
+    with open(cache.cache_path(script), "rb") as file:
+        data = file.read()
+    assert data.startswith(cache.header(cache.source_hash("print 1;")))
+    assert data[len(cache.MAGIC)] == cache.FORMAT
+
+@pytest.mark.parametrize("damage", [
+    lambda data: data[:4] + bytes([cache.FORMAT + 1]) + data[5:],
+    lambda data: data[:-10],
+    lambda data: data[:60] + b"garbage" * 4,
+], ids=["format", "truncated", "corrupt"])
+def test_bad_entries_are_misses_and_get_rewritten(tmp_path, damage):
+    script, calls = write_script(tmp_path, "print 1;"), []
+    cache.load_program(script, counting_parse(calls))
+    path = cache.cache_path(script)
+    with open(path, "rb") as file:
+        good = file.read()
+    with open(path, "wb") as file:
+        file.write(damage(good))
+    assert cache.read_cache(path, cache.source_hash("print 1;")) is None
+    cache.load_program(script, counting_parse(calls))
+    assert len(calls) == 2
+    with open(path, "rb") as file:
+        assert file.read() == good
+
+def test_syntax_errors_are_not_cached(tmp_path):
+    script, calls = write_script(tmp_path, "print ;"), []
+    with pytest.raises(ParseError):
+        cache.load_program(script, counting_parse(calls))
+    assert not os.path.exists(cache.cache_path(script))
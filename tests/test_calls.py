@@ -0,0 +1,51 @@
+import pytest
+from src.__main__ import parse
+from src.interpreter import Interpreter
+from src.output import OutputSink
+
+def run(source: str) -> Interpreter:
+    interpreter = Interpreter(output_sink=OutputSink(capture=None, echo=False))
+    interpreter.interpret(parse(source))
+    return interpreter
+
+@pytest.mark.parametrize("source, expected", [
+    ("func f() { } print f();", ["None"]),
+    ("func f() { return; } print f();", ["None"]),
+    ("func f(a) { var b = a * 2; { var c = b + 1; return c; } } print f(2); print f(3);", ["5.0", "7.0"]),
+    ("func f() { var i = 0; while (true) { if (i == 3) { return i; } i = i + 1; } } print f();", ["3.0"]),
+    ("func f(n) { if (n > 0) { return f(n - 1) + 1; } return 0; } print f(50);", ["50.0"]),
+])
+def test_return_unwinds_to_the_caller(source, expected):
+    interpreter = run(source)
+    assert interpreter.error is None
+    assert interpreter.output == expected
+
+def test_arguments_are_evaluated_left_to_right():
+    interpreter = run("""
+        var i = 0;
+        func next() { i = i + 1; return i; }
+        func sub(a, b) { return a - b; }
+        print sub(next(), next());
+    """)
+    assert interpreter.output == ["-1.0"]
+
+def test_locals_start_fresh_on_every_call():
+    interpreter = run("""
+        func f(first) {
+            if (first) { var seen = "set"; }
+            var other;
+            return other;
+        }
+        f(true);
+        print f(false);
+    """)
+    assert interpreter.output == ["None"]
+
+def test_arity_is_checked_after_evaluating_arguments():
+    assert run("func f(a, b) { return a; } print f(1);").error == "Expected 2 arguments but got 1."
+    assert run("func f(a, b) { return a; } print f(nope);").error == "Undefined variable 'nope'."
+
+def test_top_level_return_stops_quietly():
+    interpreter = run("print 1; return; print 2;")
+    assert interpreter.error is None
+    assert interpreter.output == ["1.0"]
@@ -0,0 +1,15 @@
+import subprocess
+import sys
+
+def mrt(*args: str) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, "-m", "src", *args], capture_output=True, text=True)
+
+def test_stats_are_reported_while_streaming(tmp_path):
+    script = tmp_path / "loop.mrt"
+    script.write_text("var i = 0;\nwhile (i < 500) { i = i + 1; }\nprint i;\n")
+    result = mrt("--stream", "--engine", "jit", "--inline-cache-stats", "--memo-stats",
+                 "--jit-stats", str(script))
+    assert result.stdout == "500.0\n"
+    assert "memoize: off while streaming" in result.stderr
+    assert "inline caches: " in result.stderr
+    assert "compiled" in result.stderr
@@ -0,0 +1,33 @@
+from src.__main__ import ENGINES, parse
+from src.closures import CompiledFunction
+from src.output import OutputSink
+
+def run(source: str):
+    interpreter = ENGINES["closure"](output_sink=OutputSink(capture=None, echo=False))
+    interpreter.interpret(parse(source))
+    return interpreter
+
+def test_functions_are_compiled():
+    interpreter = run("func double(n) { return n * 2; } print double(4);")
+    assert interpreter.output == ["8.0"]
+    assert isinstance(interpreter.globals.values["double"], CompiledFunction)
+    assert str(interpreter.globals.values["double"]) == "<function double>"
+
+def test_globals_are_read_when_used():
+    interpreter = run("""
+        func get() { return value; }
+        var value = 1;
+        print get();
+        value = 2;
+        print get();
+    """)
+    assert interpreter.output == ["1.0", "2.0"]
+
+def test_compiled_functions_work_as_callbacks():
+    interpreter = run("func square(x) { return x * x; } print map([1, 2, 3], square);")
+    assert interpreter.output == ["[1.0, 4.0, 9.0]"]
+
+def test_runtime_errors_stop_the_program():
+    interpreter = run("print 1; func f(a) { return a; } print f(); print 2;")
+    assert interpreter.error == "Expected 1 arguments but got 0."
+    assert interpreter.output == ["1.0", "Runtime Error: Expected 1 arguments but got 0."]
@@ -0,0 +1,54 @@
+import pytest
+from src.__main__ import ENGINES, parse
+from src.ast import While, walk
+from src.output import OutputSink
+from src.resolver import Resolver
+
+def counted(source: str) -> list:
+    statements = Resolver().resolve(parse(source))
+    return [node.counted for node in walk(statements) if isinstance(node, While)]
+
+def run(engine: str, source: str) -> list:
+    interpreter = ENGINES[engine](output_sink=OutputSink(capture=None, echo=False))
+    interpreter.interpret(parse(source))
+    return interpreter.output
+
+@pytest.mark.parametrize("source", [
+    "for (var i = 0; i < 10; i = i + 1) { print i; }",
+    "for (var i = 10; i >= 0; i = i - 2) { print i; }",
+    "var n = 3; for (var i = 0; i <= n * 2; i = i + 0.5) { var x = i; print x; }",
+    "func f() { for (var i = 0; i < 3; i = i + 1) { print i; } }",
+])
+def test_canonical_for_loops_are_counted(source):
+    assert counted(source) == [True]
+
+@pytest.mark.parametrize("source", [
+    # The body assigns the counter
+    "for (var i = 0; i < 10; i = i + 1) { i = i + 1; }",
+    # ... or a function declared in it does
+    "for (var i = 0; i < 10; i = i + 1) { func bump() { i = i + 1; } bump(); }",
+    # The step isn't a number literal
+    "var s = 1; for (var i = 0; i < 10; i = i + s) { print i; }",
+    # The condition doesn't test the counter
+    "var j = 0; for (var i = 0; j < 10; i = i + 1) { j = j + 1; }",
+    "var i = 0; while (i < 10) { i = i + 1; }",
+])
+def test_other_loops_are_not_counted(source):
+    assert counted(source) == [False]
+
+@pytest.mark.parametrize("engine", ["tree", "closure"])
+def test_counted_loops_print_what_plain_loops_print(engine):
+    source = """
+        var seen = [];
+        for (var i = 0; i < 5; i = i + 1) { if (i == 3) { push(seen, "three"); } else { push(seen, i); } }
+        print seen;
+        func first(limit) { for (var i = 0; i < 100; i = i + 1) { if (i * i > limit) { return i; } } return -1; }
+        print first(50);
+        var closures = [];
+        for (var i = 0; i < 3; i = i + 1) { func get() { return i; } push(closures, get); }
+        print closures[0]();
+        var limit = 3;
+        for (var i = 0; i < limit; i = i + 1) { limit = 2; print i; }
+        for (var i = "a"; i < 5; i = i + 1) { print i; }
+    """
+    assert run(engine, source) == run("vm", source)
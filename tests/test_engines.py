@@ -0,0 +1,85 @@
+import glob
+import os
+import pytest
+from src.__main__ import ENGINES, parse
+from src.output import OutputSink
+
+# Every engine must print exactly what the tree-walking Interpreter prints
+ENGINES_UNDER_TEST = ["vm", "closure", "python", "jit"]
+
+EXAMPLES = sorted(glob.glob(os.path.join(os.path.dirname(__file__), "..", "examples", "*.mrt")))
+
+PROGRAMS = {
+    "arithmetic": "print 1 + 2 * 3; print 7 / 2; print -(4 - 6); print 0.1 + 0.2;",
+    "zeros": "print 0.0; print -0.0; print -0.0 == 0; var z = -0.0; print z * 2;",
+    "comparisons": "print 1 < 2; print 2 <= 1; print \"a\" == \"a\"; print true == 1; print 1 != 1;",
+    "strings": "var s = \"a\"; s = s + 1; s = s + true; print s; print \"x\" - 1;",
+    "scopes": """
+        var a = "global";
+        { var a = "outer"; { var a = "inner"; print a; } print a; }
+        print a;
+    """,
+    "closures": """
+        func counter() {
+            var count = 0;
+            func increment() { count = count + 1; return count; }
+            return increment;
+        }
+        var first = counter();
+        var second = counter();
+        first(); first();
+        print first(); print second();
+    """,
+    "recursion": "func fib(n) { if (n < 2) { return n; } return fib(n - 1) + fib(n - 2); } print fib(15);",
+    "loops": """
+        var total = 0;
+        for (var i = 0; i < 10; i = i + 1) { if (i == 5) { total = total + 100; } total = total + i; }
+        var j = 10;
+        while (j > 0) { j = j - 3; }
+        print total; print j;
+    """,
+    "early return": """
+        func find(limit) {
+            var i = 0;
+            while (true) { { if (i * i > limit) { return i; } } i = i + 1; }
+        }
+        print find(50);
+    """,
+    "arrays": """
+        var a = [1, 2, 3];
+        push(a, "four");
+        a[0] = a[1] + a[2];
+        print a; print len(a); print a[3];
+    """,
+    "hot loops": """
+        func add(x) { var t = 0; var i = 0; while (i < 100) { t = t + x; i = i + 1; } return t; }
+        print add(1); print add(0.5);
+        var k = 0;
+        while (k < 10) { print add("a"); k = k + 1; }
+    """,
+    "main": "func main() { print \"from main\"; } print \"top level\";",
+    "undefined variable": "print 1; print nope; print 2;",
+    "bad call": "var x = 1; x();",
+    "arity": "func f(a) { return a; } print f(1, 2);",
+    "division by zero": "print 1 / 0;",
+    "index out of bounds": "var a = [1]; print a[1];",
+}
+
+def output(engine: str, source: str) -> list:
+    interpreter = ENGINES[engine](output_sink=OutputSink(capture=None, echo=False))
+    interpreter.interpret(parse(source))
+    return interpreter.output
+
+@pytest.mark.parametrize("engine", ENGINES_UNDER_TEST)
+@pytest.mark.parametrize("path", EXAMPLES, ids=os.path.basename)
+def test_examples_match_tree(engine, path):
+    with open(path, 'r') as file:
+        source = file.read()
+    assert output(engine, source) == output("tree", source)
+
+@pytest.mark.parametrize("engine", ENGINES_UNDER_TEST)
+@pytest.mark.parametrize("name", PROGRAMS)
+def test_programs_match_tree(engine, name):
+    expected = output("tree", PROGRAMS[name])
+    assert expected
+    assert output(engine, PROGRAMS[name]) == expected
@@ -0,0 +1,44 @@
+from src.__main__ import parse
+from src.interpreter import Interpreter
+from src.lexer import Lexer
+from src.output import OutputSink
+from src.parser import Parser
+
+def quiet_interpreter() -> Interpreter:
+    return Interpreter(output_sink=OutputSink(capture=None, echo=False))
+
+def test_streamed_statements_never_share_caches():
+    # Each statement is freed once it has run, so later nodes can be
+    # allocated where earlier ones were
+    lines = []
+    expected = []
+    for i in range(200):
+        operator, result = ("-", i - 1) if i % 2 else ("+", i + 1)
+        lines.append(f"var a{i} = {i};")
+        lines.append(f"print(a{i} {operator} 1);")
+        expected.append(str(float(result)))
+    interpreter = quiet_interpreter()
+    interpreter.interpret_stream(Parser(Lexer("\n".join(lines)).iter_tokens()).declarations())
+    assert interpreter.error is None
+    assert interpreter.output == expected
+
+def test_interpreters_keep_their_own_caches():
+    statements = parse("var i = 0; while (i < 10) { print(i * 2); i = i + 1; }")
+    for _ in range(2):
+        interpreter = quiet_interpreter()
+        interpreter.interpret(statements)
+        caches = list(interpreter.inline_caches.values())
+        assert {cache.site for cache in caches} == {"<", "*", "+"}
+        assert all(cache.state == "monomorphic" for cache in caches)
+
+def test_site_seeing_new_types_goes_polymorphic():
+    interpreter = quiet_interpreter()
+    interpreter.interpret(parse("""
+        func add(a, b) { return a + b; }
+        print(add(1, 2));
+        print(add("a", "b"));
+        print(add(3, 4));
+    """))
+    assert interpreter.output == ["3.0", "ab", "7.0"]
+    plus = next(cache for cache in interpreter.inline_caches.values() if cache.site == "+")
+    assert plus.state == "polymorphic"
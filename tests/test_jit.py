@@ -0,0 +1,63 @@
+from src.__main__ import ENGINES, parse
+from src.jit import HOT_LOOP_ITERATIONS, MAX_GUARD_FAILURES, RECORDED_ITERATIONS, format_jit_stats
+from src.output import OutputSink
+
+def run(source: str):
+    interpreter = ENGINES["jit"](output_sink=OutputSink(capture=None, echo=False))
+    interpreter.interpret(parse(source))
+    assert interpreter.error is None
+    return interpreter
+
+def test_hot_loops_are_compiled_with_guards():
+    interpreter = run("var t = 0; var i = 0; while (i < 200) { t = t + i * 2; i = i + 1; } print t;")
+    assert interpreter.output == ["39800.0"]
+    [loop] = interpreter.jit.stats()
+    assert loop["status"] == "compiled"
+    assert loop["interpreted"] == HOT_LOOP_ITERATIONS + RECORDED_ITERATIONS - 1
+    assert loop["interpreted"] + loop["compiled"] == 200
+    assert loop["guards"] == ["i: number", "t: number"]
+
+def test_cold_loops_stay_interpreted():
+    interpreter = run("var i = 0; while (i < 10) { i = i + 1; } print i;")
+    assert interpreter.jit.stats()[0]["status"] == "interpreted"
+
+def test_loops_declaring_functions_are_not_compiled():
+    interpreter = run("var i = 0; while (i < 200) { i = i + 1; func g() { return i; } } print i;")
+    assert interpreter.output == ["200.0"]
+    assert interpreter.jit.stats()[0]["status"] == "not compiled: it declares a function"
+
+def test_failing_guards_fall_back_then_unspecialize():
+    interpreter = run("""
+        func add(x) { var t = 0; var i = 0; while (i < 100) { t = t + x; i = i + 1; } return t; }
+        print add(1);
+        var k = 0;
+        while (k < 10) { print add("a"); k = k + 1; }
+    """)
+    assert interpreter.output == ["100.0"] + ["0.0" + "a" * 100] * 10
+    loop = interpreter.jit.stats()[0]
+    assert loop["guard_failures"] == MAX_GUARD_FAILURES
+    assert loop["status"] == "compiled, unspecialized"
+    assert loop["guards"] == []
+
+def test_returns_and_errors_inside_compiled_loops():
+    interpreter = run("""
+        func find(limit) { var i = 0; while (true) { if (i * i > limit) { return i; } i = i + 1; } }
+        print find(10000);
+    """)
+    assert interpreter.output == ["101.0"]
+    assert interpreter.jit.stats()[0]["compiled"] > 0
+    failing = ENGINES["jit"](output_sink=OutputSink(capture=None, echo=False))
+    failing.interpret(parse("""
+        var a = []; var i = 0;
+        while (i < 100) { push(a, i); i = i + 1; }
+        var t = 0; i = 0;
+        while (i < 200) { t = t + a[i]; i = i + 1; }
+    """))
+    assert failing.error == "Array index out of bounds."
+    assert failing.jit.stats()[1]["compiled"] > 0
+
+def test_stats_table():
+    interpreter = run("var i = 0; while (i < 200) { i = i + 1; }")
+    header, row = format_jit_stats(interpreter.jit.stats()).splitlines()
+    assert header.split()[:3] == ["line", "entries", "interpreted"]
+    assert row.endswith("compiled  i: number")
@@ -0,0 +1,63 @@
+import glob
+import os
+import pytest
+from src.lexer import Lexer, ReferenceLexer, TokenType, pragmas
+
+EXAMPLES = sorted(glob.glob(os.path.join(os.path.dirname(__file__), "..", "examples", "*.mrt")))
+
+SNIPPETS = [
+    "var x_1 = 12.5 >= 3; x_1 = x_1 != false;",
+    "print 10/2; print 007;",
+    '// comment\nprint "two\nlines"; /* block\n\ncomment */ print 3;',
+    "func f(a, b) { return [a, b][0] <= -b; }",
+    "a==b=c<d>e",
+]
+
+def tokens(lexer_class, source: str) -> list:
+    return [(token.type, token.lexeme, token.literal, token.line)
+            for token in lexer_class(source).scan_tokens()]
+
+def error(lexer_class, source: str) -> str:
+    with pytest.raises(Exception) as info:
+        lexer_class(source).scan_tokens()
+    return str(info.value)
+
+@pytest.mark.parametrize("path", EXAMPLES, ids=os.path.basename)
+def test_examples_match_reference_lexer(path):
+    with open(path, 'r') as file:
+        source = file.read()
+    assert tokens(Lexer, source) == tokens(ReferenceLexer, source)
+
+@pytest.mark.parametrize("source", SNIPPETS)
+def test_snippets_match_reference_lexer(source):
+    assert tokens(Lexer, source) == tokens(ReferenceLexer, source)
+
+def test_literals_and_lines():
+    assert tokens(Lexer, 'var s = "a\nb";\ntrue 2') == [
+        (TokenType.VAR, "var", None, 1),
+        (TokenType.IDENTIFIER, "s", None, 1),
+        (TokenType.ASSIGN, "=", None, 1),
+        (TokenType.STRING, '"a\nb"', "a\nb", 2),
+        (TokenType.SEMICOLON, ";", None, 2),
+        (TokenType.TRUE, "true", True, 3),
+        (TokenType.NUMBER, "2", 2.0, 3),
+        (TokenType.EOF, "", None, 3),
+    ]
+
+def test_identifiers_are_interned():
+    first, second = Lexer("".join(["name", "d"]) + " named").scan_tokens()[:2]
+    assert first.lexeme is second.lexeme
+
+@pytest.mark.parametrize("source", [
+    'print 1;\nprint "open',
+    "print 1; /* never\nclosed\n",
+    "print 1 ! 2;",
+    "print @;",
+    "print 1.;",
+    "var é = 1;",
+])
+def test_errors_match_reference_lexer(source):
+    assert error(Lexer, source) == error(ReferenceLexer, source)
+
+def test_pragmas():
+    assert pragmas("// @memoize\nprint 1; // @not_a_pragma\n  //@jit") == {"memoize", "jit"}
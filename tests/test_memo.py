@@ -0,0 +1,78 @@
+import pytest
+from src.__main__ import ENGINES, parse
+from src.ast import Function, walk
+from src.memo import MemoCache, memo_key
+from src.output import OutputSink
+from src.purity import mark_pure_functions
+from src.resolver import Resolver
+
+FIB = "func fib(n) { if (n < 2) { return n; } return fib(n - 1) + fib(n - 2); } print fib(20);"
+
+def pure_names(source: str) -> set:
+    return {function.name.lexeme for function in mark_pure_functions(Resolver().resolve(parse(source)))}
+
+def run(engine: str, source: str, memo_size: int = 64):
+    interpreter = ENGINES[engine](memo_size=memo_size, output_sink=OutputSink(capture=None, echo=False))
+    interpreter.interpret(parse(source))
+    return interpreter
+
+def test_pure_functions_are_found():
+    assert pure_names("""
+        var limit = 10;
+        func square(x) { return x * x; }
+        func area(w, h) { var a = w * h; return a + square(limit) * 0; }
+        func size(a) { return len(a); }
+    """) == {"square", "area", "size"}
+
+@pytest.mark.parametrize("source", [
+    "func f(x) { print x; return x; }",
+    "var total = 0; func f(x) { total = total + x; return total; }",
+    "var scale = 2; scale = 3; func f(x) { return x * scale; }",
+    "func f(a) { a[0] = 1; return a; }",
+    "func f(a) { push(a, 1); return a; }",
+    "func g(x) { print x; return x; } func f(x) { return g(x); }",
+    "func f(x) { return map(x, f); }",
+])
+def test_impure_functions_are_rejected(source):
+    assert "f" not in pure_names(source)
+
+def test_pure_flag_is_set_on_the_ast():
+    statements = Resolver().resolve(parse("func f(x) { return x; } func g(x) { print x; }"))
+    mark_pure_functions(statements)
+    assert [node.pure for node in walk(statements) if isinstance(node, Function)] == [True, False]
+
+def test_keys_keep_types_and_zeros_apart():
+    assert memo_key([1.0]) != memo_key([True])
+    assert memo_key([0.0]) != memo_key([-0.0])
+    assert memo_key(["a"]) == memo_key(["a"])
+    assert memo_key([[1.0]]) is None
+
+def test_cache_counts_and_evicts():
+    cache = MemoCache("f", max_size=2)
+    for argument in [1.0, 2.0, 1.0, 3.0, 2.0]:
+        assert cache.call([argument], lambda: argument * 10) == argument * 10
+    assert cache.call([[1.0]], lambda: 0) == 0
+    assert cache.stats() == {"function": "f", "hits": 1, "misses": 4, "evictions": 2,
+                             "uncacheable": 1, "size": 2}
+
+def test_arrays_are_never_returned_from_the_cache():
+    cache = MemoCache("f")
+    assert cache.call([1.0], lambda: [1.0]) is not cache.call([1.0], lambda: [1.0])
+    assert cache.stats()["size"] == 0
+
+@pytest.mark.parametrize("engine", sorted(ENGINES))
+def test_memoized_runs_print_the_same(engine):
+    memoized = run(engine, FIB)
+    assert memoized.output == run(engine, FIB, memo_size=0).output == ["6765.0"]
+
+def test_tree_engine_hits_the_cache():
+    interpreter = run("tree", FIB)
+    [cache] = interpreter.memo_caches.values()
+    assert cache.name == "fib"
+    assert cache.misses == 21
+    assert cache.hits > 0
+
+def test_impure_functions_are_not_memoized():
+    interpreter = run("tree", "func f(x) { print x; return x; } f(1); f(1);")
+    assert interpreter.output == ["1.0", "1.0"]
+    assert interpreter.memo_caches == {}
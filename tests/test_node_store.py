@@ -0,0 +1,54 @@
+import glob
+import os
+import pytest
+from src.__main__ import parse
+from src.ast import Binary, Literal, Print, walk
+from src.interpreter import Interpreter
+from src.lexer import Lexer
+from src.node_store import PackedProgram
+from src.optimizer import Optimizer
+from src.output import OutputSink
+from src.resolver import Resolver
+
+EXAMPLES = sorted(glob.glob(os.path.join(os.path.dirname(__file__), "..", "examples", "*.mrt")))
+
+def output(statements: list) -> list:
+    interpreter = Interpreter(output_sink=OutputSink(capture=None, echo=False))
+    interpreter.interpret(statements)
+    return interpreter.output
+
+def test_nodes_and_tokens_have_no_dict():
+    statements = parse("func f(a) { return a + 1; } print f(2);")
+    for node in walk(statements):
+        assert not hasattr(node, "__dict__")
+    assert not hasattr(Lexer("x").scan_tokens()[0], "__dict__")
+
+def test_repeated_names_share_one_string():
+    statements = parse("".join(["var ", "count", " = 1; print ", "co", "unt", ";"]))
+    assert statements[0].name.lexeme is statements[1].expression.name.lexeme
+
+@pytest.mark.parametrize("path", EXAMPLES, ids=os.path.basename)
+def test_unpack_rebuilds_the_resolved_program(path):
+    with open(path, 'r') as file:
+        statements = Resolver().resolve(parse(file.read()))
+    packed = PackedProgram.pack(statements)
+    assert packed.node_count == len(list(walk(statements)))
+    unpacked = packed.unpack()
+    assert unpacked == statements
+    assert output(unpacked) == output(statements)
+
+def test_values_keep_their_type_and_sign():
+    statements = Optimizer().optimize(parse("print 0.0; print -0.0; print 1; print true; print \"1\";"))
+    unpacked = PackedProgram.pack(statements).unpack()
+    values = [statement.expression.value for statement in unpacked]
+    assert [(type(value), str(value)) for value in values] == \
+        [(float, "0.0"), (float, "-0.0"), (float, "1.0"), (bool, "True"), (str, "1")]
+
+def test_tokens_are_stored_once():
+    statements = parse("print 1 + 2;")
+    token = statements[0].expression.operator
+    statements.append(Print(Binary(Literal(3.0), token, Literal(4.0))))
+    packed = PackedProgram.pack(statements)
+    assert len(packed.tokens) // 4 == 1
+    first, second = packed.unpack()
+    assert first.expression.operator is second.expression.operator
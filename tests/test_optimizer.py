@@ -0,0 +1,83 @@
+import pytest
+from src.__main__ import parse
+from src.ast import Binary, If, Literal, Var, While, walk
+from src.interpreter import Interpreter
+from src.optimizer import Optimizer
+from src.output import OutputSink
+from src.resolver import Resolver
+
+def optimize(source: str, level: int = 1):
+    optimizer = Optimizer(level)
+    return optimizer.optimize(parse(source)), optimizer.changes
+
+def output(statements: list) -> list:
+    interpreter = Interpreter(output_sink=OutputSink(capture=None, echo=False))
+    interpreter.interpret(statements)
+    return interpreter.output
+
+def test_constants_are_folded():
+    statements, changes = optimize('print 1 + 2 * 3; print "a" + 1; print -(2);')
+    assert [statement.expression for statement in statements] == \
+        [Literal(7.0), Literal("a1.0"), Literal(-2.0)]
+    assert changes == ["line 1: folded 2.0 * 3.0 to 6.0", "line 1: folded 1.0 + 6.0 to 7.0",
+                       'line 1: folded "a" + 1.0 to "a1.0"']
+
+def test_failing_constants_are_left_for_runtime():
+    statements, changes = optimize('print 1 / 0; print "a" - 1;')
+    assert all(isinstance(statement.expression, Binary) for statement in statements)
+    assert changes == []
+    assert output(statements)[0] == "Runtime Error: Division by zero."
+
+def test_dead_branches_and_loops_are_removed():
+    statements, changes = optimize("""
+        if (1 < 2) { print "yes"; } else { print "no"; }
+        if (false) { print "never"; }
+        while (false) { print "never"; }
+    """)
+    assert not any(isinstance(node, (If, While)) for node in walk(statements))
+    assert output(statements) == ["yes"]
+    assert "line 2: if condition is always true, kept only the then branch" in changes
+    assert "removed while loop whose condition is always false" in changes
+
+def test_code_after_return_is_removed():
+    statements, changes = optimize("func f() { return 1; print 2; print 3; }")
+    assert [type(statement).__name__ for statement in statements[0].body] == ["Return"]
+    assert changes == ["line 1: removed 2 unreachable statement(s) after return"]
+
+def test_level_zero_changes_nothing():
+    source = "print 1 + 2;"
+    statements, changes = optimize(source, level=0)
+    assert statements == parse(source)
+    assert changes == []
+
+def test_invariants_are_hoisted_out_of_loops():
+    source = "var n = 3; var i = 0; while (i < 3) { var x = n * 2; print x + i; i = i + 1; }"
+    statements, changes = optimize(source, level=2)
+    assert changes == ["line 1: hoisted loop-invariant n * 2.0 out of while loop"]
+    hoisted = [node for node in walk(statements) if isinstance(node, Var)
+               and node.name.lexeme.startswith("_inv")]
+    assert len(hoisted) == 1
+    assert output(statements) == output(parse(source))
+
+@pytest.mark.parametrize("source", [
+    # Assigned inside the loop
+    "var n = 1; var i = 0; while (i < 3) { print n * 2; n = n + 1; i = i + 1; }",
+    # Only reached after output, which could be an error
+    "var n = 1; var i = 0; while (i < 3) { print i; print n / 0; i = i + 1; }",
+    # A called function may change it
+    "var n = 1; func bump() { n = n + 1; } var i = 0; while (i < 3) { bump(); print n * 2; i = i + 1; }",
+])
+def test_unsafe_expressions_stay_in_the_loop(source):
+    statements, changes = optimize(source, level=2)
+    assert changes == []
+    assert output(statements) == output(parse(source))
+
+def test_hoisting_keeps_for_loops_counted():
+    statements = Optimizer(2).optimize(parse("""
+        var n = 5;
+        var k = 3;
+        for (var i = 0; i < n * k; i = i + 1) { var x = k * 7; print i + x; }
+    """))
+    Resolver().resolve(statements)
+    loops = [node for node in walk(statements) if isinstance(node, While)]
+    assert [loop.counted for loop in loops] == [True]
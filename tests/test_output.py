@@ -0,0 +1,68 @@
+import contextlib
+import io
+from src.__main__ import parse
+from src.interpreter import Interpreter
+from src.output import DEFAULT_BUFFER, OutputSink
+
+def test_lines_are_echoed_in_chunks():
+    stdout = io.StringIO()
+    sink = OutputSink(buffer_size=10)
+    with contextlib.redirect_stdout(stdout):
+        sink.write("one")
+        sink.write("two")
+        assert stdout.getvalue() == ""
+        sink.write("three")
+        assert stdout.getvalue() == "one\ntwo\nthree\n"
+        sink.write("four")
+        sink.flush()
+    assert stdout.getvalue() == "one\ntwo\nthree\nfour\n"
+
+def test_unbuffered_sinks_write_every_line():
+    stdout = io.StringIO()
+    with contextlib.redirect_stdout(stdout):
+        sink = OutputSink(buffer_size=0)
+        sink.write("one")
+        assert stdout.getvalue() == "one\n"
+
+def test_default_buffer_when_not_a_terminal():
+    stdout = io.StringIO()
+    with contextlib.redirect_stdout(stdout):
+        sink = OutputSink()
+        sink.write("x" * (DEFAULT_BUFFER - 10))
+        assert stdout.getvalue() == ""
+        sink.write("y" * 10)
+    assert stdout.getvalue().endswith("y" * 10 + "\n")
+
+def test_capture_all_some_or_none():
+    for capture, lines, dropped in [(None, ["1", "2", "3"], 0), (2, ["2", "3"], 1), (0, [], 0)]:
+        sink = OutputSink(capture=capture, echo=False)
+        for line in ["1", "2", "3"]:
+            sink.write(line)
+        assert (sink.lines, sink.dropped, sink.text()) == (lines, dropped, "\n".join(lines))
+        sink.clear()
+        assert (sink.lines, sink.dropped) == ([], 0)
+
+def test_subscribers_get_chunks_without_echo():
+    chunks = []
+    stdout = io.StringIO()
+    sink = OutputSink(buffer_size=0, echo=False)
+    sink.subscribe(chunks.append)
+    with contextlib.redirect_stdout(stdout):
+        sink.write("a")
+        sink.unsubscribe(chunks.append)
+        sink.write("b")
+    assert chunks == ["a\n"]
+    assert stdout.getvalue() == ""
+
+def test_interpreter_output_uses_the_sink():
+    sink = OutputSink(capture=1, echo=False)
+    interpreter = Interpreter(output_sink=sink)
+    interpreter.interpret(parse("print 1; print 2; print 3;"))
+    assert interpreter.output == ["3.0"]
+    assert interpreter.get_output() == "3.0"
+    assert sink.dropped == 2
+
+def test_iter_output_streams_while_running():
+    interpreter = Interpreter(output_sink=OutputSink(buffer_size=0, echo=False))
+    chunks = list(interpreter.iter_output(parse("print 1; print 2;")))
+    assert chunks == ["1.0\n", "2.0\n"]
@@ -0,0 +1,61 @@
+import json
+from src.__main__ import profile_file
+from src.output import OutputSink
+from src.profiler import format_profile
+
+SOURCE = """func fib(n) {
+    if (n < 2) { return n; }
+    return fib(n - 1) + fib(n - 2);
+}
+func loop() {
+    var i = 0;
+    while (i < 5) {
+        i = i + 1;
+    }
+    return i;
+}
+print fib(10);
+print loop();
+"""
+
+def profile(tmp_path) -> dict:
+    script = tmp_path / "script.mrt"
+    script.write_text(SOURCE)
+    interpreter = profile_file(str(script), output_sink=OutputSink(capture=None, echo=False))
+    assert interpreter.output == ["55.0", "5.0"]
+    return interpreter.profile()
+
+def test_functions_are_counted(tmp_path):
+    functions = {f["name"]: f for f in profile(tmp_path)["functions"]}
+    assert functions["fib"]["calls"] == 177
+    assert functions["fib"]["line"] == 1
+    assert functions["loop"]["calls"] == 1
+    # Recursive calls are timed once
+    assert functions["fib"]["self_ms"] <= functions["fib"]["total_ms"]
+
+def test_lines_are_counted_with_their_source(tmp_path):
+    lines = {s["line"]: s for s in profile(tmp_path)["lines"]}
+    # The if and, for 89 of the calls, its return
+    assert lines[2]["count"] == 177 + 89
+    assert lines[3]["count"] == 88
+    assert lines[7]["count"] == 1
+    assert lines[7]["iterations"] == 5
+    assert lines[7]["source"] == "while (i < 5) {"
+    assert lines[8]["count"] == 5
+    assert lines[8]["iterations"] is None
+    assert all(s["self_ms"] <= s["total_ms"] + 1e-6 for s in lines.values())
+
+def test_profile_formats_and_serializes(tmp_path):
+    data = profile(tmp_path)
+    assert json.loads(json.dumps(data)) == data
+    text = format_profile(data, limit=1)
+    functions, lines = text.split("\n\n")
+    assert functions.splitlines()[0].split() == ["function", "line", "calls", "total", "ms", "self", "ms"]
+    assert len(functions.splitlines()) == 2
+    assert len(lines.splitlines()) == 2
+
+def test_no_calls(tmp_path):
+    script = tmp_path / "script.mrt"
+    script.write_text("print 1;")
+    interpreter = profile_file(str(script), output_sink=OutputSink(capture=None, echo=False))
+    assert format_profile(interpreter.profile()).startswith("no functions were called")
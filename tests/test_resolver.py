@@ -0,0 +1,73 @@
+from src.__main__ import parse
+from src.ast import Assign, Block, Function, Var, Variable, walk
+from src.interpreter import Interpreter
+from src.output import OutputSink
+from src.resolver import Resolver
+
+def resolve(source: str) -> list:
+    return Resolver().resolve(parse(source))
+
+def variables(statements: list, name: str) -> list:
+    return [(node.depth, node.slot) for node in walk(statements)
+            if isinstance(node, (Variable, Assign)) and node.name.lexeme == name]
+
+def test_globals_stay_unresolved():
+    statements = resolve("var g = 1; g = g + 1; print g;")
+    assert statements[0].slot is None
+    assert variables(statements, "g") == [(None, 0)] * 3
+
+def test_parameters_and_locals_get_slots_after_the_enclosing_frame():
+    statements = resolve("func f(a, b) { var c = a + b; return c; }")
+    function = statements[0]
+    assert function.frame_size == 3
+    assert variables(function.body, "a") == [(0, 1)]
+    assert variables(function.body, "b") == [(0, 2)]
+    assert variables(function.body, "c") == [(0, 3)]
+
+def test_depth_counts_frames_outward():
+    statements = resolve("""
+        func outer(x) {
+            func inner() { { var y = 1; return x + y; } }
+            return inner;
+        }
+    """)
+    inner = next(node for node in walk(statements) if isinstance(node, Function)
+                 and node.name.lexeme == "inner")
+    # inner's frame, then outer's
+    assert variables(inner.body, "y") == [(0, 1)]
+    assert variables(inner.body, "x") == [(2, 1)]
+
+def test_blocks_declaring_nothing_get_no_frame():
+    statements = resolve("func f(a) { { print a; } { var b = a; print b; } }")
+    blocks = [node for node in walk(statements) if isinstance(node, Block)]
+    assert [block.frame_size for block in blocks] == [0, 1]
+    assert variables(statements, "a") == [(0, 1), (1, 1)]
+
+def test_shadowing_and_redeclaration():
+    statements = resolve("func f() { var a = 1; { var a = a + 1; print a; } var a = 3; }")
+    declarations = [node.slot for node in walk(statements) if isinstance(node, Var)]
+    assert declarations == [1, 1, 1]
+    function = statements[0]
+    assert function.frame_size == 1
+
+def test_sibling_functions_call_each_other():
+    interpreter = Interpreter(output_sink=OutputSink(capture=None, echo=False))
+    interpreter.interpret(parse("""
+        func run() {
+            func even(n) { if (n == 0) { return true; } return odd(n - 1); }
+            func odd(n) { if (n == 0) { return false; } return even(n - 1); }
+            return even(10);
+        }
+        print run();
+    """))
+    assert interpreter.output == ["True"]
+
+def test_closures_get_a_frame_per_call():
+    interpreter = Interpreter(output_sink=OutputSink(capture=None, echo=False))
+    interpreter.interpret(parse("""
+        func make(n) { func get() { return n; } return get; }
+        var one = make(1);
+        var two = make(2);
+        print one() + two();
+    """))
+    assert interpreter.output == ["3.0"]
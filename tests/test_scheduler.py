@@ -0,0 +1,58 @@
+from src.__main__ import parse
+from src.output import OutputSink
+from src.scheduler import Scheduler
+from src.vm import VM
+
+def test_spawn_reports_syntax_errors():
+    scheduler = Scheduler()
+    program = scheduler.spawn("print(")
+    assert program.finished
+    assert program.error == "Error at : Expect expression."
+    assert scheduler.done == [program]
+
+def test_spawn_reports_lexer_errors():
+    program = Scheduler().spawn('print "open;')
+    assert program.finished
+    assert program.error.startswith("Unterminated string")
+
+def test_programs_take_turns():
+    scheduler = Scheduler(slice_steps=10)
+    forever = scheduler.spawn("while (true) {}", max_steps=1000)
+    counter = scheduler.spawn("var i = 0; while (i < 50) { i = i + 1; } print(i);")
+    scheduler.run()
+    assert counter.error is None and counter.output == ["50.0"]
+    assert forever.error == "Step quota of 1000 exceeded."
+    assert counter.turns > 1
+
+def test_suspended_programs_print_what_uninterrupted_ones_print():
+    source = """
+        func fib(n) { if (n < 2) { return n; } return fib(n - 1) + fib(n - 2); }
+        var squares = [];
+        for (var i = 0; i < 20; i = i + 1) { push(squares, i * i); }
+        print fib(12); print squares[19]; print sum(squares);
+    """
+    vm = VM(output_sink=OutputSink(capture=None, echo=False))
+    vm.interpret(parse(source))
+    program = Scheduler().spawn(source)
+    while not program.turn(3):
+        pass
+    assert program.output == vm.output
+    assert program.turns > 100
+    assert program.stats()["steps"] >= program.turns
+
+def test_quotas_apply_inside_builtin_callbacks():
+    scheduler = Scheduler(slice_steps=10)
+    program = scheduler.spawn("""
+        func spin(x) { while (true) {} }
+        print map([1], spin);
+    """, max_steps=500)
+    scheduler.run()
+    assert program.error == "Step quota of 500 exceeded."
+
+def test_time_quota():
+    scheduler = Scheduler(slice_steps=100)
+    program = scheduler.spawn("while (true) {}", max_seconds=0.05)
+    scheduler.run()
+    assert program.error == "Time quota of 0.05s exceeded."
+    stats = program.stats()
+    assert stats["finished"] and stats["seconds"] >= 0.05
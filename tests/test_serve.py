@@ -0,0 +1,55 @@
+import asyncio
+import json
+from src.serve import ProgramCache, Server
+
+def ask(server: Server, request) -> dict:
+    line = json.dumps(request).encode()
+    return asyncio.run(server.answer(line))
+
+def test_runs_programs_in_fresh_interpreters():
+    server = Server(threads=1)
+    first = ask(server, {"source": "var g = 1; print g + 2;", "id": 7})
+    assert first == {**first, "id": 7, "status": "ok", "output": "3.0", "cached": False}
+    again = ask(server, {"source": "var g = 1; print g + 2;", "engine": "vm"})
+    assert again["output"] == "3.0" and again["cached"]
+    leaked = ask(server, {"source": "print g;"})
+    assert leaked["status"] == "error" and leaked["error"] == "Undefined variable 'g'."
+
+def test_syntax_errors_are_reported_and_not_cached():
+    server = Server(threads=1)
+    reply = ask(server, {"source": "print("})
+    assert reply["status"] == "error"
+    assert reply["error"] == "Error at : Expect expression."
+    assert server.programs.stats()["size"] == 0
+    assert server.stats()["errors"] == 1
+
+def test_bad_requests():
+    server = Server(threads=1)
+    assert asyncio.run(server.answer(b"not json"))["error"] == "Request is not a JSON object."
+    assert ask(server, {"source": 1})["error"] == "Request has no 'source' string."
+    assert ask(server, {"source": "", "engine": "nope"})["error"] == "Unknown engine 'nope'."
+    assert server.stats()["requests"] == 3
+
+def test_runaway_requests_time_out():
+    server = Server(threads=1, timeout=0.2)
+
+    async def serve_two():
+        watchdog = asyncio.create_task(server.watchdog())
+        try:
+            return [await server.answer(json.dumps({"source": source}).encode())
+                    for source in ("while (true) {}", "print 1;")]
+        finally:
+            watchdog.cancel()
+
+    stuck, after = asyncio.run(serve_two())
+    assert stuck["status"] == "timeout" and stuck["error"] == "Timed out after 0.2s."
+    # The worker thread is free again
+    assert after["status"] == "ok" and after["output"] == "1.0"
+
+def test_program_cache_evicts_least_recently_used():
+    cache = ProgramCache(max_size=2)
+    for source in ("print 1;", "print 2;", "print 1;", "print 3;"):
+        cache.get(source)
+    assert cache.stats() == {**cache.stats(), "size": 2, "hits": 1, "misses": 3, "evictions": 1}
+    assert cache.get("print 1;")[2]
+    assert not cache.get("print 2;")[2]
@@ -0,0 +1,63 @@
+import pytest
+from src.__main__ import parse
+from src.output import OutputSink
+from src.snapshot import SNAPSHOT_ENGINES, Snapshot
+
+PRELUDE = """
+var items = [1, 2];
+var alias = items;
+var greeting = "hi";
+func counter() { var n = 0; func next() { n = n + 1; return n; } return next; }
+var tick = counter();
+func double(x) { return x * 2; }
+print "prelude ran";
+"""
+
+PROGRAM = """
+push(items, 3);
+greeting = "changed";
+print tick(); print tick();
+print len(alias); print double(4);
+print map([1], double);
+"""
+
+def run(snapshot: Snapshot, source: str):
+    interpreter = snapshot.clone(OutputSink(capture=None, echo=False))
+    interpreter.interpret(parse(source))
+    return interpreter
+
+@pytest.mark.parametrize("engine", SNAPSHOT_ENGINES)
+def test_clones_never_see_each_others_changes(engine):
+    snapshot = Snapshot(PRELUDE, engine)
+    assert snapshot.output == ["prelude ran"]
+    for _ in range(2):
+        interpreter = run(snapshot, PROGRAM)
+        assert interpreter.error is None
+        assert interpreter.output == ["1.0", "2.0", "3.0", "8.0", "[2.0]"]
+    assert run(snapshot, "print items; print greeting;").output == ["[1.0, 2.0]", "hi"]
+
+def test_clones_print_to_their_own_sink():
+    snapshot = Snapshot(PRELUDE)
+    first = run(snapshot, 'print "first";')
+    second = run(snapshot, 'print "second";')
+    assert (first.output, second.output) == (["first"], ["second"])
+    assert snapshot.output == ["prelude ran"]
+
+@pytest.mark.parametrize("engine", SNAPSHOT_ENGINES)
+def test_memoized_prelude_functions_cache_per_clone(engine):
+    snapshot = Snapshot("func square(x) { return x * x; }", engine, memo_size=16)
+    first = run(snapshot, "print square(3); print square(3);")
+    second = run(snapshot, "print square(3);")
+    assert first.output == ["9.0", "9.0"] and second.output == ["9.0"]
+    assert [cache.hits for cache in first.memo_caches.values()] == [1]
+    assert [cache.hits for cache in second.memo_caches.values()] == [0]
+
+@pytest.mark.parametrize("prelude, engine, error, message", [
+    ("", "closure", ValueError, "Snapshots need the tree, vm or jit engine, not 'closure'."),
+    ("func main() { }", "tree", ValueError, "A prelude can't define main()."),
+    ("print nope;", "tree", RuntimeError, "Prelude failed: Undefined variable 'nope'."),
+])
+def test_bad_preludes(prelude, engine, error, message):
+    with pytest.raises(error) as info:
+        Snapshot(prelude, engine)
+    assert str(info.value) == message
@@ -0,0 +1,50 @@
+import glob
+import os
+import pytest
+from src.__main__ import ENGINES, run, run_stream
+from src.interpreter import Interpreter
+from src.lexer import Lexer
+from src.output import OutputSink
+from src.parser import Parser
+
+EXAMPLES = sorted(glob.glob(os.path.join(os.path.dirname(__file__), "..", "examples", "*.mrt")))
+
+def quiet_sink() -> OutputSink:
+    return OutputSink(capture=None, echo=False)
+
+@pytest.mark.parametrize("path", EXAMPLES, ids=os.path.basename)
+def test_iter_tokens_matches_scan_tokens(path):
+    with open(path, 'r') as file:
+        source = file.read()
+    assert list(Lexer(source).iter_tokens()) == Lexer(source).scan_tokens()
+
+@pytest.mark.parametrize("engine", sorted(ENGINES))
+@pytest.mark.parametrize("path", EXAMPLES, ids=os.path.basename)
+def test_streamed_run_matches_whole_program_run(engine, path):
+    with open(path, 'r') as file:
+        source = file.read()
+    expected = run(source, engine, output_sink=quiet_sink()).output
+    assert run_stream(path, engine, output_sink=quiet_sink()).output == expected
+
+def test_declarations_are_parsed_lazily():
+    pulled = []
+
+    def tokens():
+        for token in Lexer("print 1; print 2;").iter_tokens():
+            pulled.append(token.lexeme)
+            yield token
+
+    declarations = Parser(tokens()).declarations()
+    next(declarations)
+    assert pulled == ["print", "1", ";", "print"]
+
+def test_statements_run_before_the_rest_is_lexed():
+    interpreter = Interpreter(output_sink=quiet_sink())
+    source = 'print "first"; print "second"; print @;'
+    interpreter.interpret_stream(Parser(Lexer(source).iter_tokens()).declarations())
+    assert interpreter.output == ["first", "second", "Runtime Error: Unexpected character '@' at line 1"]
+
+def test_main_runs_after_the_last_declaration(tmp_path):
+    script = tmp_path / "main.mrt"
+    script.write_text('func main() { print value; } var value = "set later";')
+    assert run_stream(str(script), output_sink=quiet_sink()).output == ["set later"]
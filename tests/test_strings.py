@@ -0,0 +1,56 @@
+import pytest
+from src.__main__ import ENGINES, parse
+from src.output import OutputSink
+from src.strings import BUILDER_THRESHOLD, MERGE_PARTS, StringBuilder, concat, flatten
+
+LONG = "x" * BUILDER_THRESHOLD
+
+def test_short_concatenations_stay_plain_strings():
+    assert concat("a", 1.0) == "a1.0"
+    assert type(concat("a", "b")) is str
+    assert type(concat(LONG, "b")) is StringBuilder
+
+def test_appending_extends_the_shared_buffer():
+    first = concat(LONG, "a")
+    second = concat(first, "b")
+    assert second.buffer is first.buffer
+    assert str(first) == LONG + "a"
+    assert str(second) == LONG + "ab"
+
+def test_older_builders_copy_before_appending():
+    base = concat(LONG, "")
+    left = concat(base, "L")
+    right = concat(base, "R")
+    assert right.buffer is not left.buffer
+    assert (str(base), str(left), str(right)) == (LONG, LONG + "L", LONG + "R")
+
+def test_parts_are_merged():
+    text = concat(LONG, "")
+    for _ in range(MERGE_PARTS * 3):
+        text = concat(text, "y")
+    assert len(text.buffer.parts) <= MERGE_PARTS + 1
+    assert str(text) == LONG + "y" * (MERGE_PARTS * 3)
+
+def test_builders_compare_and_hash_as_strings():
+    text = concat(LONG, "a")
+    assert text == LONG + "a" and LONG + "a" == text
+    assert hash(text) == hash(LONG + "a")
+    assert {text: 1}[LONG + "a"] == 1
+    assert float(concat("1" * BUILDER_THRESHOLD, "")) == float("1" * BUILDER_THRESHOLD)
+    assert flatten((text, 1.0)) == (LONG + "a", 1.0)
+    assert type(flatten((text,))[0]) is str
+
+@pytest.mark.parametrize("engine", sorted(ENGINES))
+def test_long_strings_on_every_engine(engine):
+    interpreter = ENGINES[engine](output_sink=OutputSink(capture=None, echo=False))
+    interpreter.interpret(parse("""
+        var s = "";
+        var i = 0;
+        while (i < 1000) { s = s + "ab"; i = i + 1; }
+        var t = s + "!";
+        var u = s + "?";
+        print len(split(s, "b")); print substring(t, 1998, 2001); print substring(u, 1998, 2001);
+        print s == t; print s + "!" == t;
+    """))
+    assert interpreter.error is None
+    assert interpreter.output == ["1001.0", "ab!", "ab?", "False", "True"]
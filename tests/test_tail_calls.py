@@ -0,0 +1,59 @@
+import sys
+import pytest
+from src.__main__ import ENGINES, parse
+from src.output import OutputSink
+
+# Far below the call depths below, so only tail calls run in place get through
+RECURSION_LIMIT = 500
+DEPTH = 100000
+
+SELF_RECURSION = f"""
+func count(n, total) {{
+    if (n == 0) {{ return total; }}
+    return count(n - 1, total + 1);
+}}
+print(count({DEPTH}, 0));
+"""
+
+MUTUAL_RECURSION = f"""
+func is_even(n) {{
+    if (n == 0) {{ return true; }}
+    return is_odd(n - 1);
+}}
+func is_odd(n) {{
+    if (n == 0) {{ return false; }}
+    return is_even(n - 1);
+}}
+print(is_even({DEPTH}));
+print(is_odd({DEPTH + 1}));
+"""
+
+@pytest.fixture
+def low_recursion_limit():
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(RECURSION_LIMIT)
+    yield
+    sys.setrecursionlimit(limit)
+
+def run(engine: str, source: str):
+    statements = parse(source)
+    interpreter = ENGINES[engine](output_sink=OutputSink(capture=None, echo=False))
+    interpreter.interpret(statements)
+    return interpreter
+
+@pytest.mark.parametrize("engine", ["tree", "closure", "jit", "vm"])
+def test_self_tail_recursion(engine, low_recursion_limit):
+    interpreter = run(engine, SELF_RECURSION)
+    assert interpreter.error is None
+    assert interpreter.output == [f"{float(DEPTH)}"]
+
+@pytest.mark.parametrize("engine", ["tree", "closure", "jit", "vm"])
+def test_mutual_tail_recursion(engine, low_recursion_limit):
+    interpreter = run(engine, MUTUAL_RECURSION)
+    assert interpreter.error is None
+    assert interpreter.output == ["True", "True"]
+
+def test_python_engine_has_no_tail_calls(low_recursion_limit):
+    # Documented limitation: generated Python functions call each other
+    interpreter = run("python", SELF_RECURSION)
+    assert "recursion" in interpreter.error
@@ -0,0 +1,44 @@
+import pytest
+from src.__main__ import parse
+from src.output import OutputSink
+from src.resolver import Resolver
+from src.transpiler import PythonInterpreter, TranspileError, Transpiler
+
+def transpile(source: str) -> str:
+    return Transpiler(set()).generate(Resolver().resolve(parse(source)))
+
+def run(source: str) -> PythonInterpreter:
+    interpreter = PythonInterpreter(output_sink=OutputSink(capture=None, echo=False))
+    interpreter.interpret(parse(source))
+    return interpreter
+
+def test_generates_python_functions_and_loops():
+    source = transpile("func f(n) { var i = 0; while (i < n) { i = i + 1; } return i; } print f(3);")
+    compile(source, "<test>", "exec")
+    assert "def m_f(" in source
+    assert "while " in source
+
+def test_numbers_skip_coercion():
+    source = transpile("func f(n) { return (n + 1) * 2 - 3; }")
+    assert "(float(n_1) + 1.0)" not in source
+    assert "2.0) - 3.0)" in source
+
+def test_loop_captures_cannot_be_transpiled():
+    with pytest.raises(TranspileError):
+        transpile("func f() { while (true) { var x = 1; func g() { return x; } return g; } }")
+
+def test_falls_back_to_the_tree_interpreter():
+    interpreter = run("""
+        var fs = [];
+        var i = 0;
+        while (i < 3) { var x = i; func g() { return x; } push(fs, g); i = i + 1; }
+        print fs[0]() + fs[2]();
+    """)
+    assert interpreter.output == ["2.0"]
+
+def test_errors_match_the_tree_interpreter():
+    assert run("print nope;").error == "Undefined variable 'nope'."
+    assert run("var x = 1; x();").error == "Can only call functions."
+    # The right operand is evaluated before the left one is coerced
+    assert run('var b = "x"; var i = 1; print b - (i - "yy");').error == \
+        "could not convert string to float: 'yy'"
@@ -0,0 +1,36 @@
+from src.__main__ import parse
+from src.compiler import Chunk, Compiler, OpCode
+from src.output import OutputSink
+from src.resolver import Resolver
+from src.vm import VM
+
+def compile_source(source: str):
+    return Compiler().compile(Resolver().resolve(parse(source)))
+
+def test_constants_are_pooled():
+    chunk = Chunk()
+    first = chunk.add_constant(1.5)
+    assert chunk.add_constant(1.5) == first
+    assert chunk.add_constant("1.5") != first
+    assert chunk.add_constant(True) != chunk.add_constant(1.0)
+
+def test_zeros_of_either_sign_get_their_own_slot():
+    chunk = Chunk()
+    assert chunk.add_constant(0.0) != chunk.add_constant(-0.0)
+    assert str(chunk.constants[chunk.add_constant(-0.0)]) == "-0.0"
+
+def test_disassembly_names_the_opcodes():
+    listing = compile_source("var a = 1; print a + 2;").chunk.disassemble()
+    assert OpCode.ADD.name in listing
+    assert OpCode.PRINT.name in listing
+
+def test_functions_are_compiled_once():
+    script = compile_source("func f(n) { return n * 2; } print f(1); print f(2);")
+    protos = [value for value in script.chunk.constants if type(value).__name__ == "FunctionProto"]
+    assert [proto.name for proto in protos] == ["f"]
+
+def test_vm_runs_programs():
+    vm = VM(output_sink=OutputSink(capture=None, echo=False))
+    vm.interpret(parse("func f(n) { if (n < 1) { return 0; } return n + f(n - 1); } print f(100);"))
+    assert vm.error is None
+    assert vm.output == ["5050.0"]